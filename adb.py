@@ -0,0 +1,503 @@
+# adb.py
+import os
+import time
+import uuid
+import socket
+import asyncio
+import selectors
+import subprocess
+import threading
+
+# Path to the adb client binary; override to use a specific install
+ADB = os.environ.get("ADB_PATH", "adb")
+
+# Where the ADB server listens for host-protocol clients
+ADB_SERVER_HOST = os.environ.get("ADB_SERVER_HOST", "127.0.0.1")
+ADB_SERVER_PORT = int(os.environ.get("ADB_SERVER_PORT", "5037"))
+
+# "socket" talks to the ADB server directly; "session" keeps an `adb shell` process per TV
+ADB_TRANSPORT = os.environ.get("ADB_TRANSPORT", "socket").lower()
+
+
+# How long a successful connect/command is trusted before re-running `adb connect`,
+# and how long a failed connect is reported as offline without re-probing
+ADB_CONNECTED_TTL = float(os.environ.get("ADB_CONNECTED_TTL", "60"))
+ADB_OFFLINE_TTL = float(os.environ.get("ADB_OFFLINE_TTL", "10"))
+
+
+class AdbError(Exception):
+    """Raised when an ADB command cannot be delivered to the device"""
+
+
+class AdbBusyError(AdbError):
+    """Raised when a shell session stayed busy with another command for the whole timeout"""
+
+
+class ConnectionState:
+    """
+    Cached connection status of one ADB endpoint: unknown, connected or offline.
+
+    A connected endpoint is not re-connected until its TTL expires or a
+    command fails; an offline result is trusted for ADB_OFFLINE_TTL seconds.
+    """
+
+    UNKNOWN = "unknown"
+    CONNECTED = "connected"
+    OFFLINE = "offline"
+
+    def __init__(self, connected_ttl: float = None, offline_ttl: float = None):
+        self.connected_ttl = ADB_CONNECTED_TTL if connected_ttl is None else connected_ttl
+        self.offline_ttl = ADB_OFFLINE_TTL if offline_ttl is None else offline_ttl
+        self.status = self.UNKNOWN
+        self.changed_at = time.monotonic()
+        self.expires_at = 0.0
+        self.connects = 0
+        self.connect_failures = 0
+        self.connects_skipped = 0
+
+    def _set(self, status, ttl):
+        if status != self.status:
+            self.status = status
+            self.changed_at = time.monotonic()
+        self.expires_at = time.monotonic() + ttl
+
+    def mark_connected(self):
+        self._set(self.CONNECTED, self.connected_ttl)
+
+    def mark_offline(self):
+        self.connect_failures += 1
+        self._set(self.OFFLINE, self.offline_ttl)
+
+    def mark_unknown(self):
+        self._set(self.UNKNOWN, 0)
+
+    def cached(self):
+        """The status if it is still within its TTL, else None"""
+        if self.status != self.UNKNOWN and time.monotonic() < self.expires_at:
+            return self.status
+        return None
+
+    def needs_connect(self) -> bool:
+        if self.cached() == self.CONNECTED:
+            self.connects_skipped += 1
+            return False
+        return True
+
+    def snapshot(self) -> dict:
+        now = time.monotonic()
+        return {
+            "status": self.status,
+            "fresh": self.cached() is not None,
+            "seconds_in_status": round(now - self.changed_at, 1),
+            "connects": self.connects,
+            "connect_failures": self.connect_failures,
+            "connects_skipped": self.connects_skipped,
+        }
+
+
+def _connect_succeeded(message: str) -> bool:
+    # "connected to x" / "already connected to x"; failures say "failed"/"unable"/"cannot"
+    return "connected" in message.lower()
+
+
+class AdbShellSession:
+    """
+    A long-lived interactive `adb -s <serial> shell` process.
+
+    Commands are written to the shell's stdin followed by an echo of a unique
+    sentinel and the command's exit code; output is read up to that sentinel.
+    The process is spawned lazily and respawned after it dies.
+    """
+
+    def __init__(self, serial: str, adb_path: str = None):
+        self.serial = serial
+        self.adb_path = adb_path or ADB
+        self._proc = None
+        self._closed = False
+        self._lock = threading.Lock()
+        self._marker = f"__ADB_DONE_{uuid.uuid4().hex}__"
+        self.spawn_count = 0
+        self.state = ConnectionState()
+
+    def connect(self) -> str:
+        """Run `adb connect` for network serials and return adb's message"""
+        if ":" not in self.serial:
+            return ""
+        self.state.connects += 1
+        try:
+            result = subprocess.run([self.adb_path, "connect", self.serial], capture_output=True, text=True, timeout=5)
+        except Exception:
+            self.state.mark_offline()
+            raise
+        message = result.stdout.strip()
+        if _connect_succeeded(message):
+            self.state.mark_connected()
+        else:
+            self.state.mark_offline()
+        return message
+
+    def _spawn(self):
+        if self.state.needs_connect():
+            self.connect()
+        self._proc = subprocess.Popen(
+            [self.adb_path, "-s", self.serial, "shell"],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT,
+            bufsize=0,
+        )
+        self.spawn_count += 1
+
+    def _read_until_marker(self, timeout: float):
+        fd = self._proc.stdout.fileno()
+        marker = self._marker.encode()
+        buf = b""
+        with selectors.DefaultSelector() as sel:
+            sel.register(fd, selectors.EVENT_READ)
+            deadline = time.monotonic() + timeout
+            while True:
+                idx = buf.find(marker)
+                if idx != -1:
+                    end = buf.find(b"\n", idx)
+                    if end != -1:
+                        output = buf[:idx].decode(errors="replace")
+                        code = buf[idx + len(marker):end].strip()
+                        return int(code or b"1"), output
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise TimeoutError(f"no response from {self.serial} within {timeout}s")
+                if not sel.select(remaining):
+                    continue
+                chunk = os.read(fd, 65536)
+                if not chunk:
+                    raise EOFError("adb shell exited")
+                buf += chunk
+
+    def run(self, command: str, timeout: float = 15) -> tuple[int, str]:
+        """
+        Run a shell command on the device and return (exit_code, output).
+        Raises AdbBusyError if another command holds the session for longer
+        than timeout.
+        """
+        if not self._lock.acquire(timeout=timeout):
+            raise AdbBusyError(f"adb shell to {self.serial} busy for {timeout}s")
+        try:
+            for attempt in range(2):
+                if self._closed:
+                    raise AdbError(f"adb shell to {self.serial} was closed")
+                if self._proc is None or self._proc.poll() is not None:
+                    self._spawn()
+                try:
+                    self._proc.stdin.write(f"{command}\necho {self._marker}$?\n".encode())
+                    result = self._read_until_marker(timeout)
+                    self.state.mark_connected()
+                    return result
+                except TimeoutError:
+                    # Output stream is now out of step with our commands
+                    self._kill()
+                    self.state.mark_unknown()
+                    raise
+                except (BrokenPipeError, EOFError, OSError) as e:
+                    # Session died (device dropped, adb server restarted): respawn once
+                    self._kill()
+                    self.state.mark_unknown()
+                    if attempt:
+                        raise AdbError(f"adb shell to {self.serial} failed: {e}") from e
+        finally:
+            self._lock.release()
+
+    def _kill(self):
+        if self._proc is not None:
+            try:
+                self._proc.kill()
+                self._proc.wait(timeout=1)
+            except Exception:
+                pass
+            self._proc = None
+
+    def busy(self) -> bool:
+        """True while a command holds the session (a new one would wait for it)"""
+        return self._lock.locked()
+
+    def close(self):
+        """
+        Terminate the shell process without waiting for a running command:
+        killing the shell ends that command with an AdbError, and the session
+        is not respawned afterwards.
+        """
+        self._closed = True
+        proc = self._proc
+        if proc is not None:
+            try:
+                proc.kill()
+            except Exception:
+                pass
+        if self._lock.acquire(blocking=False):
+            try:
+                self._kill()
+            finally:
+                self._lock.release()
+
+
+# --- ADB host protocol (smart sockets on the ADB server) ---
+
+def _encode_request(payload: str) -> bytes:
+    data = payload.encode()
+    return b"%04x" % len(data) + data
+
+
+def _shell_command(command: str, marker: str) -> str:
+    # The v1 shell service has no exit status, so echo it after a sentinel
+    return f"shell:{command}; echo {marker}$?"
+
+
+def _parse_shell_output(data: bytes, marker: str) -> tuple[int, str]:
+    idx = data.rfind(marker.encode())
+    if idx == -1:
+        raise AdbError("shell stream closed before the command finished")
+    code = data[idx + len(marker):].strip()
+    return int(code or b"1"), data[:idx].decode(errors="replace")
+
+
+class AdbClient:
+    """
+    In-process client for the ADB server's smart-socket protocol (blocking).
+
+    Every request uses its own TCP connection to the server, so calls from
+    different threads (and to different TVs) run concurrently. TVs use
+    AsyncAdbClient; this client is for scripts and synchronous callers.
+    """
+
+    def __init__(self, host: str = None, port: int = None, timeout: float = 5):
+        self.host = host or ADB_SERVER_HOST
+        self.port = port or ADB_SERVER_PORT
+        self.timeout = timeout
+        self._server_start_attempted = False
+
+    def _open(self) -> socket.socket:
+        try:
+            return socket.create_connection((self.host, self.port), timeout=self.timeout)
+        except ConnectionRefusedError:
+            if self._server_start_attempted:
+                raise
+            # Nothing listening yet: let the adb binary start its server once
+            self._server_start_attempted = True
+            subprocess.run([ADB, "start-server"], capture_output=True, timeout=10)
+            return socket.create_connection((self.host, self.port), timeout=self.timeout)
+
+    @staticmethod
+    def _recv_exact(sock, n) -> bytes:
+        buf = b""
+        while len(buf) < n:
+            chunk = sock.recv(n - len(buf))
+            if not chunk:
+                raise AdbError("ADB server closed the connection")
+            buf += chunk
+        return buf
+
+    def _read_message(self, sock) -> str:
+        length = int(self._recv_exact(sock, 4), 16)
+        return self._recv_exact(sock, length).decode(errors="replace")
+
+    def _request(self, sock, payload: str):
+        sock.sendall(_encode_request(payload))
+        status = self._recv_exact(sock, 4)
+        if status == b"FAIL":
+            raise AdbError(f"{payload}: {self._read_message(sock)}")
+        if status != b"OKAY":
+            raise AdbError(f"{payload}: unexpected reply {status!r}")
+
+    def _host_query(self, payload: str) -> str:
+        with self._open() as sock:
+            self._request(sock, payload)
+            return self._read_message(sock)
+
+    def version(self) -> int:
+        """Protocol version reported by the ADB server"""
+        return int(self._host_query("host:version"), 16)
+
+    def connect_device(self, serial: str) -> str:
+        """host:connect for a network device; returns the server's message"""
+        return self._host_query(f"host:connect:{serial}")
+
+    def _open_service(self, serial: str, service: str, timeout: float) -> socket.socket:
+        sock = self._open()
+        try:
+            sock.settimeout(timeout)
+            self._request(sock, f"host:transport:{serial}")
+            self._request(sock, service)
+        except Exception:
+            sock.close()
+            raise
+        return sock
+
+    def _read_stream(self, sock, timeout: float) -> bytes:
+        chunks = []
+        deadline = time.monotonic() + timeout
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise TimeoutError("ADB stream did not finish in time")
+            sock.settimeout(remaining)
+            chunk = sock.recv(65536)
+            if not chunk:
+                return b"".join(chunks)
+            chunks.append(chunk)
+
+    def exec_out(self, serial: str, command: str, timeout: float = 15) -> bytes:
+        """Run a command with exec-out: raw stdout bytes, no pty"""
+        with self._open_service(serial, f"exec-out:{command}", timeout) as sock:
+            return self._read_stream(sock, timeout)
+
+    def shell(self, serial: str, command: str, timeout: float = 15) -> tuple[int, str]:
+        """Run a shell command on the device and return (exit_code, output)"""
+        marker = f"__ADB_DONE_{uuid.uuid4().hex}__"
+        with self._open_service(serial, _shell_command(command, marker), timeout) as sock:
+            return _parse_shell_output(self._read_stream(sock, timeout), marker)
+
+
+class AsyncAdbClient:
+    """asyncio version of AdbClient; streams to many TVs run concurrently on one loop"""
+
+    def __init__(self, host: str = None, port: int = None, timeout: float = 5):
+        self.host = host or ADB_SERVER_HOST
+        self.port = port or ADB_SERVER_PORT
+        self.timeout = timeout
+        self._server_start_attempted = False
+
+    async def _open(self):
+        try:
+            return await asyncio.wait_for(asyncio.open_connection(self.host, self.port), self.timeout)
+        except ConnectionRefusedError:
+            if self._server_start_attempted:
+                raise
+            self._server_start_attempted = True
+            proc = await asyncio.create_subprocess_exec(
+                ADB, "start-server", stdout=asyncio.subprocess.DEVNULL, stderr=asyncio.subprocess.DEVNULL
+            )
+            await asyncio.wait_for(proc.wait(), 10)
+            return await asyncio.wait_for(asyncio.open_connection(self.host, self.port), self.timeout)
+
+    async def _request(self, reader, writer, payload: str):
+        writer.write(_encode_request(payload))
+        await writer.drain()
+        status = await reader.readexactly(4)
+        if status == b"FAIL":
+            length = int(await reader.readexactly(4), 16)
+            message = (await reader.readexactly(length)).decode(errors="replace")
+            raise AdbError(f"{payload}: {message}")
+        if status != b"OKAY":
+            raise AdbError(f"{payload}: unexpected reply {status!r}")
+
+    async def _host_query(self, payload: str) -> str:
+        reader, writer = await self._open()
+        try:
+            await self._request(reader, writer, payload)
+            length = int(await reader.readexactly(4), 16)
+            return (await reader.readexactly(length)).decode(errors="replace")
+        finally:
+            writer.close()
+
+    async def version(self) -> int:
+        return int(await self._host_query("host:version"), 16)
+
+    async def connect_device(self, serial: str) -> str:
+        return await self._host_query(f"host:connect:{serial}")
+
+    async def _run_service(self, serial: str, service: str) -> bytes:
+        reader, writer = await self._open()
+        try:
+            await self._request(reader, writer, f"host:transport:{serial}")
+            await self._request(reader, writer, service)
+            return await reader.read()
+        finally:
+            writer.close()
+
+    async def exec_out(self, serial: str, command: str, timeout: float = 15) -> bytes:
+        return await asyncio.wait_for(self._run_service(serial, f"exec-out:{command}"), timeout)
+
+    async def shell(self, serial: str, command: str, timeout: float = 15) -> tuple[int, str]:
+        marker = f"__ADB_DONE_{uuid.uuid4().hex}__"
+        data = await asyncio.wait_for(self._run_service(serial, _shell_command(command, marker)), timeout)
+        return _parse_shell_output(data, marker)
+
+
+class AdbSocketTransport:
+    """Per-TV transport that runs commands through the shared AsyncAdbClient"""
+
+    def __init__(self, serial: str, client: "AsyncAdbClient" = None):
+        self.serial = serial
+        self.client = client or default_async_client
+        self.state = ConnectionState()
+
+    async def connect(self) -> str:
+        """host:connect for network serials; returns the server's message"""
+        if ":" not in self.serial:
+            return ""
+        self.state.connects += 1
+        try:
+            message = (await self.client.connect_device(self.serial)).strip()
+        except Exception:
+            self.state.mark_offline()
+            raise
+        if _connect_succeeded(message):
+            self.state.mark_connected()
+        else:
+            self.state.mark_offline()
+        return message
+
+    async def run(self, command: str, timeout: float = 15) -> tuple[int, str]:
+        if ":" in self.serial and self.state.needs_connect():
+            await self.connect()
+        try:
+            result = await self.client.shell(self.serial, command, timeout)
+        except TimeoutError:
+            self.state.mark_unknown()
+            raise
+        except (AdbError, OSError):
+            self.state.mark_unknown()
+            if ":" not in self.serial:
+                raise
+            # The server may have dropped the device: reconnect and retry once
+            await self.connect()
+            result = await self.client.shell(self.serial, command, timeout)
+        self.state.mark_connected()
+        return result
+
+    def busy(self) -> bool:
+        # Each command has its own connection: nothing to wait behind
+        return False
+
+    def close(self):
+        pass
+
+
+class AdbSessionTransport:
+    """Async wrapper running an AdbShellSession's blocking I/O in a worker thread"""
+
+    def __init__(self, serial: str):
+        self.serial = serial
+        self.session = AdbShellSession(serial)
+        self.state = self.session.state
+
+    async def connect(self) -> str:
+        return await asyncio.to_thread(self.session.connect)
+
+    async def run(self, command: str, timeout: float = 15) -> tuple[int, str]:
+        return await asyncio.to_thread(self.session.run, command, timeout)
+
+    def busy(self) -> bool:
+        return self.session.busy()
+
+    def close(self):
+        self.session.close()
+
+
+default_async_client = AsyncAdbClient()
+
+
+def open_transport(serial: str):
+    """Create the per-TV transport selected by ADB_TRANSPORT"""
+    if ADB_TRANSPORT == "session":
+        return AdbSessionTransport(serial)
+    return AdbSocketTransport(serial)
@@ -0,0 +1,209 @@
+# app_drivers.py
+import re
+import time
+import shlex
+import asyncio
+from urllib.parse import quote_plus
+from jobs import report
+
+# Extra time given to a freshly launched app to render its first screen
+APP_SETTLE_SECONDS = 1
+
+# Shell test for the on-screen keyboard being up (search field ready for text)
+KEYBOARD_SHOWN = "dumpsys input_method | grep -q 'mInputShown=true'"
+
+
+class StrategyStats:
+    """
+    Outcomes of one strategy on one TV, as moving averages so the ranking
+    follows app updates: latency is the time an attempt takes (successful or
+    not), seeded with the strategy's estimate so untried strategies keep their
+    declared order; reliability is the recent success rate.
+    """
+
+    SMOOTHING = 0.5
+    MIN_RELIABILITY = 0.05
+
+    def __init__(self, estimate: float):
+        self.attempts = 0
+        self.successes = 0
+        self.latency = estimate
+        self.reliability = 0.9
+
+    def record(self, success: bool, seconds: float):
+        self.attempts += 1
+        if success:
+            self.successes += 1
+        self.latency += self.SMOOTHING * (seconds - self.latency)
+        self.reliability += self.SMOOTHING * ((1.0 if success else 0.0) - self.reliability)
+
+    def expected_cost(self) -> float:
+        """Expected seconds spent per success when this strategy is tried"""
+        return self.latency / max(self.reliability, self.MIN_RELIABILITY)
+
+    def snapshot(self) -> dict:
+        return {
+            "attempts": self.attempts,
+            "successes": self.successes,
+            "avg_seconds": round(self.latency, 2),
+            "reliability": round(self.reliability, 2),
+            "expected_cost": round(self.expected_cost(), 2),
+        }
+
+
+class Strategy:
+    """One way of getting to content in an app: run(tv, query, play) -> bool"""
+
+    def __init__(self, name: str, estimate: float, run):
+        self.name = name
+        self.estimate = estimate
+        self.run = run
+
+
+class AppDriver:
+    """
+    Knows how to open one streaming app and find content in it.
+
+    Subclasses set the class attributes and list their strategies; run() tries
+    them in order of expected cost on the given TV (measured latency divided
+    by success rate) and stops at the first that works.
+    """
+
+    name = ""
+    package = ""
+    fallback_activity = ".MainActivity"
+    # VIEW URI template ({query}) that opens the app on its search results
+    search_uri = None
+    # Steps (see TV.send_key_sequence) that play the first search result
+    play_steps = [APP_SETTLE_SECONDS, "KEYCODE_ENTER"]
+    # Intent data of a playing title that can be reopened directly later
+    content_uri_pattern = None
+
+    def strategies(self) -> list:
+        return [
+            Strategy("deep_link", 2, self.via_deep_link),
+            Strategy("search_key", 6, self.via_search_key),
+        ]
+
+    def type_query(self, query: str, play: bool) -> list:
+        """Steps that type query into the focused search field and submit it"""
+        steps = [("until", KEYBOARD_SHOWN, 2), ("text", query), 2, "KEYCODE_ENTER"]
+        return steps + [3, "KEYCODE_ENTER"] if play else steps
+
+    def paced(self, tv, steps) -> list:
+        """
+        steps with their fixed pauses scaled to how fast tv runs this app (see
+        timing.TimingProfile.pause); "until" waits already end when their test passes.
+        """
+        return [tv.timing.pause(self.package, step) if isinstance(step, (int, float)) else step for step in steps]
+
+    async def open_and_send(self, tv, steps) -> bool:
+        if not await tv.open_app(self.name):
+            return False
+        await asyncio.sleep(tv.timing.pause(self.package, APP_SETTLE_SECONDS))
+        return await tv.send_key_sequence(self.paced(tv, steps))
+
+    async def via_deep_link(self, tv, query: str, play: bool) -> bool:
+        if not self.search_uri:
+            return False
+        if not await tv.open_uri(self.name, self.search_uri.format(query=quote_plus(query))):
+            return False
+        return await tv.send_key_sequence(self.paced(tv, self.play_steps)) if play else True
+
+    async def via_search_key(self, tv, query: str, play: bool) -> bool:
+        return await self.open_and_send(tv, ["KEYCODE_SEARCH"] + self.type_query(query, play))
+
+    def ranked(self, tv, play: bool, only: str = None) -> list:
+        """Strategies best first for tv: lowest expected cost, then declared order"""
+        strategies = [s for s in self.strategies() if only is None or s.name == only]
+        order = {s.name: i for i, s in enumerate(strategies)}
+        return sorted(strategies, key=lambda s: (self.stats(tv, s, play).expected_cost(), order[s.name]))
+
+    def stats(self, tv, strategy: Strategy, play: bool) -> StrategyStats:
+        """Measured stats of strategy on tv (a fresh, unsaved estimate if never tried)"""
+        key = (self.name, "play" if play else "search", strategy.name)
+        return tv.strategy_stats.get(key) or StrategyStats(strategy.estimate)
+
+    def record(self, tv, strategy: Strategy, play: bool, success: bool, seconds: float):
+        key = (self.name, "play" if play else "search", strategy.name)
+        tv.strategy_stats.setdefault(key, StrategyStats(strategy.estimate)).record(success, seconds)
+
+    async def run(self, tv, query: str, play: bool, only: str = None) -> bool:
+        """Reach query's results (and play the first one if play) using the best strategy that works"""
+        for strategy in self.ranked(tv, play, only):
+            report(f"{self.name}: trying {strategy.name}")
+            start = time.monotonic()
+            try:
+                success = await strategy.run(tv, query, play)
+            except Exception as e:
+                print(f"{self.name} {strategy.name} error: {e}")
+                success = False
+            if not success and tv.breaker.is_open():
+                # The TV is gone; that says nothing about the strategy
+                return False
+            self.record(tv, strategy, play, success, time.monotonic() - start)
+            if success:
+                return True
+            print(f"{self.name}: {strategy.name} did not work, trying the next strategy")
+        return False
+
+
+class NetflixDriver(AppDriver):
+    name = "netflix"
+    package = "com.netflix.ninja"
+    search_uri = "https://www.netflix.com/search?q={query}"
+    play_steps = [APP_SETTLE_SECONDS, "KEYCODE_ENTER", 2, "KEYCODE_ENTER"]
+    content_uri_pattern = re.compile(r"^(?:https?|nflx)://(?:www\.)?netflix\.com/(?:watch|title)/\d+")
+
+    def strategies(self) -> list:
+        return super().strategies() + [Strategy("top_menu", 8, self.via_top_menu)]
+
+    async def via_top_menu(self, tv, query: str, play: bool) -> bool:
+        """Search key not handled: reach the search icon from the top menu"""
+        steps = ["KEYCODE_DPAD_UP", "KEYCODE_DPAD_UP", 1, "KEYCODE_ENTER"] + self.type_query(query, play)
+        return await self.open_and_send(tv, steps)
+
+
+class YouTubeDriver(AppDriver):
+    name = "youtube"
+    package = "com.google.android.youtube.tv"
+    search_uri = "https://www.youtube.com/results?search_query={query}"
+    content_uri_pattern = re.compile(r"^https?://(?:www\.youtube\.com/watch\?v=|youtu\.be/)[\w-]+")
+
+    def strategies(self) -> list:
+        return [
+            Strategy("deep_link", 2, self.via_deep_link),
+            Strategy("search_intent", 3, self.via_search_intent),
+            Strategy("search_key", 6, self.via_search_key),
+            Strategy("sidebar", 8, self.via_sidebar),
+        ]
+
+    async def via_search_intent(self, tv, query: str, play: bool) -> bool:
+        command = f"am start -W -a android.intent.action.SEARCH -e query {shlex.quote(query)} {self.package}"
+        output = await tv._adb_output(command, timeout=20)
+        if output is None or "Status: ok" not in output:
+            return False
+        tv._set_state("current_app", self.name)
+        return await tv.send_key_sequence(self.paced(tv, self.play_steps)) if play else True
+
+    async def via_sidebar(self, tv, query: str, play: bool) -> bool:
+        """The search icon at the top of the left sidebar"""
+        steps = ["KEYCODE_DPAD_LEFT"] * 3 + ["KEYCODE_DPAD_UP"] * 2 + [0.5, "KEYCODE_ENTER"]
+        return await self.open_and_send(tv, steps + self.type_query(query, play))
+
+
+# app name -> driver; extended with register_driver()
+DRIVERS = {}
+
+
+def register_driver(driver: AppDriver):
+    """Make an app available to TV.open_app / search_and_play / search_content"""
+    DRIVERS[driver.name] = driver
+
+
+def get_driver(app: str):
+    return DRIVERS.get(app.lower())
+
+
+register_driver(NetflixDriver())
+register_driver(YouTubeDriver())
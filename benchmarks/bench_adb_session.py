@@ -0,0 +1,61 @@
+# benchmarks/bench_adb_session.py
+"""
+Per-command latency: spawning `adb connect` + `adb -s ... shell <cmd>` for
+every command (the old TV._send_adb_command) vs one persistent AdbShellSession.
+
+    python benchmarks/bench_adb_session.py                 # uses fake_adb.py
+    python benchmarks/bench_adb_session.py --adb adb --serial 192.168.1.12:5555
+"""
+import os
+import sys
+import time
+import argparse
+import subprocess
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from adb import AdbShellSession
+
+FAKE_ADB = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fake_adb.py")
+
+
+def per_call(adb, serial, command):
+    subprocess.run(f"{adb} connect {serial}", shell=True, capture_output=True, timeout=5)
+    result = subprocess.run(f"{adb} -s {serial} shell {command}", shell=True, capture_output=True, text=True, timeout=15)
+    return result.returncode == 0
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--adb", default=FAKE_ADB)
+    parser.add_argument("--serial", default="127.0.0.1:5555")
+    parser.add_argument("--command", default="echo test")
+    parser.add_argument("--iterations", type=int, default=50)
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    for _ in range(args.iterations):
+        assert per_call(args.adb, args.serial, args.command)
+    spawn_ms = (time.perf_counter() - start) * 1000 / args.iterations
+
+    session = AdbShellSession(args.serial, adb_path=args.adb)
+    session.run(args.command)  # spawn outside the timed loop
+    start = time.perf_counter()
+    for _ in range(args.iterations):
+        code, _ = session.run(args.command)
+        assert code == 0
+    session_ms = (time.perf_counter() - start) * 1000 / args.iterations
+
+    # Respawn after the shell dies
+    session._proc.kill()
+    session._proc.wait()
+    assert session.run(args.command)[0] == 0
+    session.close()
+
+    print(f"adb={args.adb} serial={args.serial} command={args.command!r}")
+    print(f"spawn per command:  {spawn_ms:8.2f} ms")
+    print(f"persistent session: {session_ms:8.2f} ms (spawns: {session.spawn_count})")
+
+
+if __name__ == "__main__":
+    main()
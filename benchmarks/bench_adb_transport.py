@@ -0,0 +1,85 @@
+# benchmarks/bench_adb_transport.py
+"""
+Per-command latency of the three ways to reach a TV: spawning the adb CLI,
+a persistent `adb shell` session, and the in-process host-protocol client.
+Also runs commands to several TVs concurrently through AsyncAdbClient.
+
+    python benchmarks/bench_adb_transport.py
+"""
+import os
+import sys
+import time
+import asyncio
+import argparse
+import subprocess
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from adb import AdbClient, AsyncAdbClient, AdbShellSession
+from fake_adb_server import FakeAdbServer
+
+FAKE_ADB = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fake_adb.py")
+
+
+def timed(fn, iterations):
+    start = time.perf_counter()
+    for _ in range(iterations):
+        fn()
+    return (time.perf_counter() - start) * 1000 / iterations
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--iterations", type=int, default=50)
+    parser.add_argument("--tvs", type=int, default=10)
+    parser.add_argument("--shell-delay", type=float, default=0.02, help="simulated device round trip (s)")
+    args = parser.parse_args()
+
+    server = FakeAdbServer().start_in_thread()
+    client = AdbClient(port=server.port)
+    serial = "127.0.0.1:5555"
+    print(f"fake ADB server on port {server.port}, protocol version {client.version()}")
+    assert "connected" in client.connect_device(serial)
+
+    assert client.shell(serial, "false")[0] == 1
+    assert client.shell(serial, "echo hi") == (0, "hi\n")
+    assert client.exec_out(serial, "printf raw") == b"raw"
+
+    cli_ms = timed(lambda: subprocess.run(
+        f"{FAKE_ADB} connect {serial}; {FAKE_ADB} -s {serial} shell echo test",
+        shell=True, capture_output=True, timeout=15), args.iterations)
+    session = AdbShellSession(serial, adb_path=FAKE_ADB)
+    session.run("true")
+    session_ms = timed(lambda: session.run("echo test"), args.iterations)
+    session.close()
+    socket_ms = timed(lambda: client.shell(serial, "echo test"), args.iterations)
+
+    print(f"adb CLI per command:       {cli_ms:8.2f} ms")
+    print(f"persistent adb shell:      {session_ms:8.2f} ms")
+    print(f"host-protocol client:      {socket_ms:8.2f} ms")
+
+    # Concurrency across TVs with a simulated device round trip
+    server.shell_delay = args.shell_delay
+    serials = [f"10.0.0.{i}:5555" for i in range(args.tvs)]
+    for s in serials:
+        client.connect_device(s)
+
+    start = time.perf_counter()
+    for s in serials:
+        client.shell(s, "echo test")
+    serial_ms = (time.perf_counter() - start) * 1000
+
+    async def fan_out():
+        aclient = AsyncAdbClient(port=server.port)
+        return await asyncio.gather(*(aclient.shell(s, "echo test") for s in serials))
+
+    start = time.perf_counter()
+    results = asyncio.run(fan_out())
+    concurrent_ms = (time.perf_counter() - start) * 1000
+    assert all(code == 0 for code, _ in results)
+
+    print(f"{args.tvs} TVs, {args.shell_delay * 1000:.0f} ms device RTT: sequential {serial_ms:.1f} ms, asyncio {concurrent_ms:.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+# benchmarks/bench_content_cache.py
+"""
+First play of a title (search, then learn its content URI) versus repeat
+plays straight from the content cache, against the simulated TV in
+benchmarks/fake_device/.
+
+    python benchmarks/bench_content_cache.py --launch 1.0
+"""
+import os
+import sys
+import time
+import asyncio
+import argparse
+import tempfile
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+
+from bench_tv_flows import start_fake_tv
+from content_cache import ContentCache
+
+
+async def play(tv, cache, query, app):
+    """The lookup / learn cycle smart_home_server.play_title runs"""
+    uri = cache.get(app, query)
+    if uri is not None and await tv.play_content_uri(app, uri):
+        return "cached"
+    before = await tv.current_content_uri(app)
+    assert await tv.search_and_play(query, app)
+    uri = await tv.current_content_uri(app)
+    assert uri is not None and uri != before, "no content URI learned"
+    cache.put(app, query, uri)
+    return "searched"
+
+
+async def run(args):
+    with tempfile.TemporaryDirectory() as state_dir:
+        start_fake_tv(args.launch, args.keyboard, state_dir)
+        from devices import TV  # reads ADB_SERVER_PORT at import
+
+        tv = TV("tv", "livingroom", "127.0.0.1")
+        cache = ContentCache(os.path.join(state_dir, "content_cache.json"))
+        for app in ("netflix", "youtube"):
+            for query in ("Breaking Bad", "breaking  bad!", "Breaking Bad"):
+                start = time.perf_counter()
+                how = await play(tv, cache, query, app)
+                print(f"{app:8} {query!r:18} {how:9} {time.perf_counter() - start:6.2f} s")
+        cache.save()
+        reloaded = ContentCache(cache.path)
+        reloaded.load()
+        assert reloaded.get("netflix", "BREAKING BAD") == cache.get("netflix", "breaking bad")
+        print(cache.stats())
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--launch", type=float, default=1.0, help="simulated app launch time (s)")
+    parser.add_argument("--keyboard", type=float, default=0.5, help="simulated search keyboard delay (s)")
+    args = parser.parse_args()
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
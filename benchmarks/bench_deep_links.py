@@ -0,0 +1,68 @@
+# benchmarks/bench_deep_links.py
+"""
+Per-app latency of reaching search results (search_content) and starting
+playback (search_and_play) with each app driver strategy, against the
+simulated TV in benchmarks/fake_device/. A second TV whose apps ignore deep
+links shows the strategy ranking adapting to what works on that TV.
+
+    python benchmarks/bench_deep_links.py --launch 1.0 --keyboard 0.5
+"""
+import os
+import sys
+import time
+import asyncio
+import argparse
+import tempfile
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+
+from bench_tv_flows import start_fake_tv, reset_device
+
+
+async def timed(coro):
+    start = time.perf_counter()
+    assert await coro
+    return time.perf_counter() - start
+
+
+async def run(args):
+    with tempfile.TemporaryDirectory() as state_dir:
+        server = start_fake_tv(args.launch, args.keyboard, state_dir)
+        server.device_env["127.0.0.2:5555"] = {"FAKE_NO_DEEP_LINKS": "1"}
+        import devices  # reads ADB_SERVER_PORT at import
+        from app_drivers import DRIVERS
+
+        tv = devices.TV("tv", "livingroom", "127.0.0.1")
+        print(f"{'':34}{'search_content':>16}{'search_and_play':>17}")
+        for app, driver in DRIVERS.items():
+            for strategy in driver.strategies():
+                results = []
+                for flow in ("search_content", "search_and_play"):
+                    reset_device(state_dir)
+                    results.append(await timed(getattr(tv, flow)("Breaking Bad", app, strategy=strategy.name)))
+                print(f"{app + ' ' + strategy.name:34}{results[0]:14.2f} s{results[1]:15.2f} s")
+
+        print(f"\nnetflix search_and_play, deep links not handled by the TV:")
+        tv = devices.TV("tv", "bedroom", "127.0.0.2")
+        driver = DRIVERS["netflix"]
+        for attempt in range(1, args.rounds + 1):
+            order = [s.name for s in driver.ranked(tv, play=True)]
+            reset_device(state_dir)
+            seconds = await timed(tv.search_and_play("Breaking Bad", "netflix"))
+            print(f"  run {attempt}: {seconds:5.2f} s, order {' > '.join(order)}")
+        for key, stats in tv.strategy_info().items():
+            print(f"  {key:32} {stats}")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--launch", type=float, default=1.0, help="simulated app launch time (s)")
+    parser.add_argument("--keyboard", type=float, default=0.5, help="simulated search keyboard delay (s)")
+    parser.add_argument("--rounds", type=int, default=4, help="adaptive search_and_play runs")
+    args = parser.parse_args()
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+# benchmarks/bench_device_model.py
+"""
+Memory and speed of the device model for a large home (or simulator):
+  - memory per device (tracemalloc) for Light/Fan/AC/Chimney instances
+  - attribute reads (name, version), state reads (dev.state[key]) and, where
+    the model has typed fields, direct field reads
+  - state writes through the setters (no listeners registered)
+  - to_dict() + json.dumps serialization
+
+    python benchmarks/bench_device_model.py --devices 100000
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from devices import Light, Fan, AC, Chimney
+
+DEVICE_TYPES = [(Light, "brightness"), (Fan, "speed"), (AC, "temperature"), (Chimney, "mode")]
+
+
+def build(n):
+    devices = []
+    for i in range(n):
+        cls, _ = DEVICE_TYPES[i % len(DEVICE_TYPES)]
+        devices.append(cls(f"dev{i}", f"room{i // 20}"))
+    return devices
+
+
+def rate(n, seconds) -> str:
+    return f"{n / seconds / 1e6:6.2f} M/s"
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--devices", type=int, default=100000)
+    args = parser.parse_args()
+    n = args.devices
+
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    devices = build(n)
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    # Names and rooms are counted too: they belong to the device either way
+    print(f"{n} devices: {(after - before) / n:.0f} bytes per device "
+          f"(__slots__: {not hasattr(devices[0], '__dict__')})")
+
+    start = time.perf_counter()
+    for dev in devices:
+        dev.name
+        dev.version
+    print(f"attribute reads (name, version):  {rate(2 * n, time.perf_counter() - start)}")
+
+    keys = [DEVICE_TYPES[i % len(DEVICE_TYPES)][1] for i in range(n)]
+    start = time.perf_counter()
+    for dev, key in zip(devices, keys):
+        dev.state["power"]
+        dev.state[key]
+    print(f"state reads (dev.state[key]):     {rate(2 * n, time.perf_counter() - start)}")
+
+    if hasattr(devices[0], "power"):
+        start = time.perf_counter()
+        for dev in devices:
+            dev.power
+        print(f"field reads (dev.power):          {rate(n, time.perf_counter() - start)}")
+
+    start = time.perf_counter()
+    for dev in devices:
+        dev.turn_on()
+        dev.turn_off()
+    print(f"state writes (turn_on/turn_off):  {rate(2 * n, time.perf_counter() - start)}")
+
+    start = time.perf_counter()
+    encoded = [json.dumps(dev.to_dict()) for dev in devices]
+    elapsed = time.perf_counter() - start
+    print(f"to_dict + json.dumps:             {rate(n, elapsed)} ({elapsed * 1000:.0f} ms for all)")
+    print(f"sample: {encoded[0]}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+# benchmarks/bench_discovery.py
+"""
+/24 sweep and end-to-end rediscovery against local stand-in listeners.
+
+A few "TVs" listen on 127.0.0.x:<port> (any 127/8 address is local on
+Linux); the fake ADB server answers getprop for each with its own serial.
+One TV is configured at a dead address and must be found again by serial.
+
+    python benchmarks/bench_discovery.py --tvs 5 --port 15555
+"""
+import os
+import sys
+import time
+import random
+import asyncio
+import argparse
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+
+from fake_adb_server import FakeAdbServer
+
+
+async def start_listeners(hosts, port):
+    async def close_at_once(reader, writer):
+        writer.close()
+
+    return [await asyncio.start_server(close_at_once, host, port) for host in hosts]
+
+
+async def run(args, hosts, serials):
+    from devices import TV  # reads ADB_SERVER_PORT at import
+    from discovery import TVDiscovery, scan, subnets_for
+
+    listeners = await start_listeners(hosts, args.port)
+    networks = subnets_for([], [args.subnet])
+
+    start = time.perf_counter()
+    found = await scan(networks, args.port, args.concurrency, args.timeout)
+    sweep_s = time.perf_counter() - start
+    assert sorted(found) == sorted(hosts), found
+
+    tv = TV("tv", "bench", "127.0.0.254", args.port)
+    tv.device_id = serials[0]
+    discovery = TVDiscovery(port=args.port, subnets=[args.subnet], concurrency=args.concurrency, timeout=args.timeout)
+    start = time.perf_counter()
+    moves = await discovery.rediscover([tv])
+    rediscover_s = time.perf_counter() - start
+    assert moves and tv.ip_address == hosts[0], moves
+
+    start = time.perf_counter()
+    await discovery.rediscover([tv])
+    cached_s = time.perf_counter() - start
+
+    for listener in listeners:
+        listener.close()
+
+    print(f"{args.subnet}, {len(hosts)} listeners, concurrency {args.concurrency}")
+    print(f"port sweep:                 {sweep_s * 1000:8.1f} ms")
+    print(f"rediscover (identify all):  {rediscover_s * 1000:8.1f} ms")
+    print(f"rediscover (ids cached):    {cached_s * 1000:8.1f} ms")
+    print(f"moved {moves[0][1]} -> {moves[0][2]}")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--tvs", type=int, default=5)
+    parser.add_argument("--port", type=int, default=15555)
+    parser.add_argument("--subnet", default="127.0.0.0/24")
+    parser.add_argument("--concurrency", type=int, default=128)
+    parser.add_argument("--timeout", type=float, default=0.3)
+    args = parser.parse_args()
+
+    hosts = [f"127.0.0.{i}" for i in random.sample(range(2, 250), args.tvs)]
+    serials = [f"SERIAL{i:04d}" for i in range(args.tvs)]
+    env = dict(os.environ)
+    env["PATH"] = os.path.join(BENCH_DIR, "fake_device") + os.pathsep + env["PATH"]
+    device_env = {f"{host}:{args.port}": {"FAKE_SERIALNO": serial} for host, serial in zip(hosts, serials)}
+    server = FakeAdbServer(env=env, device_env=device_env).start_in_thread()
+    os.environ["ADB_SERVER_PORT"] = str(server.port)
+    os.environ["ADB_TRANSPORT"] = "socket"
+    asyncio.run(run(args, hosts, serials))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+# benchmarks/bench_mqtt_ingest.py
+"""
+Throughput of MQTT state report ingestion (mqtt_state.StateIngestor):
+  - in process: the indexed fast path versus splitting the topic, JSON
+    decoding every payload and journaling every value
+  - end to end: a publisher floods home/<room>/<device>/state on the local
+    broker stand-in while MqttBridge ingests, with saves batched by the
+    state persister
+
+    python benchmarks/bench_mqtt_ingest.py --messages 200000 --flood 50000
+"""
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import tempfile
+import paho.mqtt.client as mqtt
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+
+from fake_mqtt_broker import FakeMqttBroker
+from registry import DEVICES
+from mqtt_state import StateIngestor, STATE_TOPICS
+from mqtt_bridge import MqttBridge
+from persistence import StatePersister, StateJournal
+
+PAYLOADS = [b"ON", b"OFF", b"BRIGHTNESS:70", b"SPEED:3", b'{"power": "ON", "temperature": 22}']
+
+
+def workload(n):
+    topics = [f"home/{room}/{name}/state" for room, devices in DEVICES.items() for name in devices]
+    return [(random.choice(topics), random.choice(PAYLOADS)) for _ in range(n)]
+
+
+def naive(messages, journal):
+    for topic, payload in messages:
+        _, room, name, _ = topic.split("/")
+        dev = DEVICES.get(room, {}).get(name)
+        if dev is None:
+            continue
+        try:
+            values = json.loads(payload)
+        except ValueError:
+            text = payload.decode()
+            key, _, value = text.partition(":")
+            values = {key.lower(): value} if value else {"power": text}
+        for key, value in values.items():
+            dev.reported[key] = value
+            journal.record(room, name, key, value)
+
+
+def in_process(args, state_dir):
+    messages = workload(args.messages)
+    journal = StateJournal(os.path.join(state_dir, "s.json"), os.path.join(state_dir, "j"), lambda: "{}")
+    start = time.perf_counter()
+    naive(messages, journal)
+    naive_s = time.perf_counter() - start
+
+    ingestor = StateIngestor(DEVICES, os.path.join(state_dir, "reported.json"))
+    start = time.perf_counter()
+    for topic, payload in messages:
+        ingestor.ingest(topic, payload)
+    fast_s = time.perf_counter() - start
+    print(f"in process, {args.messages} reports:")
+    print(f"  split + json + journal:   {args.messages / naive_s:10.0f} msg/s")
+    print(f"  indexed fast path:        {args.messages / fast_s:10.0f} msg/s")
+
+
+def end_to_end(args, state_dir):
+    broker = FakeMqttBroker().start_in_thread()
+    ingestor = StateIngestor(DEVICES, os.path.join(state_dir, "reported.json"))
+    persister = StatePersister(ingestor.save, interval=0.5)
+    persister.start()
+    ingestor.on_change = persister.mark_dirty
+    bridge = MqttBridge("127.0.0.1", broker.port)
+    bridge.subscribe(STATE_TOPICS, ingestor.on_message)
+    bridge.start()
+    while ingestor.received == 0:
+        broker.publish("home/kitchen/light1/state", b"OFF")
+        time.sleep(0.05)
+    received = ingestor.received
+
+    publisher = mqtt.Client(mqtt.CallbackAPIVersion.VERSION2)
+    publisher.connect("127.0.0.1", broker.port)
+    publisher.loop_start()
+    messages = workload(args.flood)
+    start = time.perf_counter()
+    for topic, payload in messages:
+        publisher.publish(topic, payload, qos=0)
+    deadline = time.monotonic() + 60
+    while ingestor.received - received < args.flood and time.monotonic() < deadline:
+        time.sleep(0.01)
+    elapsed = time.perf_counter() - start
+    persister.stop()
+    publisher.loop_stop()
+    bridge.stop()
+    print(f"end to end via broker, {args.flood} reports:")
+    print(f"  ingested {ingestor.received - received} in {elapsed:.2f} s: {(ingestor.received - received) / elapsed:.0f} msg/s")
+    print(f"  state file writes: {ingestor.saves} (batched by the persister)")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--messages", type=int, default=200000)
+    parser.add_argument("--flood", type=int, default=50000)
+    args = parser.parse_args()
+    with tempfile.TemporaryDirectory() as state_dir:
+        in_process(args, state_dir)
+        end_to_end(args, state_dir)
+
+
+if __name__ == "__main__":
+    main()
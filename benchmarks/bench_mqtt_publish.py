@@ -0,0 +1,96 @@
+# benchmarks/bench_mqtt_publish.py
+"""
+MQTT publishing against a local broker stand-in (fake_mqtt_broker.py):
+  - without a network loop (the old setup): publishes are written but acks
+    are never read
+  - one publish at a time, waiting for each ack (blocking the caller)
+  - MqttBridge: paho's loop thread runs in the background and publishes are
+    pipelined, with acks matched to in-flight message ids
+
+    python benchmarks/bench_mqtt_publish.py --messages 2000 --ack-delay 0.005
+"""
+import os
+import sys
+import time
+import argparse
+import paho.mqtt.client as mqtt
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+
+from fake_mqtt_broker import FakeMqttBroker
+from mqtt_bridge import MqttBridge
+
+
+def wait_for(predicate, timeout=30):
+    deadline = time.monotonic() + timeout
+    while not predicate() and time.monotonic() < deadline:
+        time.sleep(0.001)
+    return predicate()
+
+
+def no_loop(port, messages):
+    client = mqtt.Client(mqtt.CallbackAPIVersion.VERSION2)
+    acked = []
+    client.on_publish = lambda *args: acked.append(args[2])
+    client.connect("127.0.0.1", port)
+    for i in range(messages):
+        client.publish(f"home/bench/light{i % 10}/set", "ON", qos=1)
+    time.sleep(1)
+    client.disconnect()
+    return len(acked)
+
+
+def one_at_a_time(port, messages):
+    client = mqtt.Client(mqtt.CallbackAPIVersion.VERSION2)
+    client.connect("127.0.0.1", port)
+    client.loop_start()
+    start = time.perf_counter()
+    for i in range(messages):
+        client.publish(f"home/bench/light{i % 10}/set", "ON", qos=1).wait_for_publish()
+    elapsed = time.perf_counter() - start
+    client.disconnect()
+    client.loop_stop()
+    return elapsed
+
+
+def pipelined(port, messages, interval=0.0):
+    bridge = MqttBridge("127.0.0.1", port)
+    bridge.start()
+    assert wait_for(lambda: bridge.connected)
+    start = time.perf_counter()
+    for i in range(messages):
+        bridge.publish(f"home/bench/light{i % 10}/set", "ON")
+        if interval:
+            time.sleep(interval)
+    queued = time.perf_counter() - start
+    assert wait_for(lambda: bridge.acked == messages)
+    elapsed = time.perf_counter() - start
+    stats = bridge.stats()
+    bridge.stop()
+    return queued, elapsed, stats
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--messages", type=int, default=2000)
+    parser.add_argument("--ack-delay", type=float, default=0.005, help="broker ack latency (s)")
+    args = parser.parse_args()
+    broker = FakeMqttBroker(ack_delay=args.ack_delay).start_in_thread()
+    n = args.messages
+
+    acked = no_loop(broker.port, n)
+    serial_s = one_at_a_time(broker.port, n)
+    queued_s, pipelined_s, stats = pipelined(broker.port, n)
+    _, _, paced_stats = pipelined(broker.port, n // 10, interval=0.001)
+
+    print(f"{n} QoS 1 publishes, broker ack delay {args.ack_delay * 1000:.0f} ms")
+    print(f"no network loop:       {acked} of {n} acked after 1 s")
+    print(f"one at a time:         {serial_s:7.3f} s total, {serial_s / n * 1000:6.2f} ms blocked per publish")
+    print(f"pipelined (bridge):    {pipelined_s:7.3f} s total, {queued_s / n * 1000:6.3f} ms blocked per publish")
+    print(f"publish-to-ack (burst):          {stats['ack_latency_ms']}")
+    print(f"publish-to-ack (1 publish/ms):   {paced_stats['ack_latency_ms']}")
+
+
+if __name__ == "__main__":
+    main()
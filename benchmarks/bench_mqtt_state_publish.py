@@ -0,0 +1,122 @@
+# benchmarks/bench_mqtt_state_publish.py
+"""
+Broker traffic under automation load: scripts that re-send ON to lights that
+are already on and ramp brightness sliders in small steps.
+  - per-command publishing (the old setup): every call publishes on /set
+  - StatePublisher: repeated commands suppressed, and retained state
+    documents published only on change, at most once per topic per
+    MQTT_STATE_MIN_INTERVAL
+
+Counts what the broker received and what a subscriber to home/# was sent.
+
+    python benchmarks/bench_mqtt_state_publish.py --devices 50 --ops 20000 --seconds 4
+"""
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import paho.mqtt.client as mqtt
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+
+from fake_mqtt_broker import FakeMqttBroker
+from devices import Light, state_listeners
+from mqtt_bridge import MqttBridge
+from mqtt_state import StatePublisher
+
+
+def wait_for(predicate, timeout=30):
+    deadline = time.monotonic() + timeout
+    while not predicate() and time.monotonic() < deadline:
+        time.sleep(0.001)
+    return predicate()
+
+
+def automation(devices, ops):
+    """(device, key, value) commands: mostly repeated ON plus brightness ramps"""
+    script = []
+    for i in range(ops):
+        dev = random.choice(devices)
+        if random.random() < 0.5:
+            script.append((dev, "power", "ON"))
+        else:
+            script.append((dev, "brightness", (i // 10) % 100))
+    return script
+
+
+def apply(dev, key, value):
+    if key == "power":
+        dev.turn_on()
+    else:
+        dev.set_brightness(value)
+
+
+def run(args, use_publisher):
+    broker = FakeMqttBroker().start_in_thread()
+    deliveries = []
+    subscriber = mqtt.Client(mqtt.CallbackAPIVersion.VERSION2)
+    subscriber.on_message = lambda client, userdata, message: deliveries.append(message.topic)
+    subscriber.connect("127.0.0.1", broker.port)
+    subscriber.subscribe("home/#")
+    subscriber.loop_start()
+    time.sleep(0.2)
+
+    bridge = MqttBridge("127.0.0.1", broker.port)
+    bridge.start()
+    assert wait_for(lambda: bridge.connected)
+    devices = [Light(f"light{i}", "bench") for i in range(args.devices)]
+    publisher = StatePublisher(bridge)
+    if use_publisher:
+        state_listeners.append(publisher.on_state_change)
+        publisher.publish_all({"bench": {dev.name: dev for dev in devices}})
+
+    script = automation(devices, args.ops)
+    pause = args.seconds / args.ops
+    start = time.perf_counter()
+    for dev, key, value in script:
+        apply(dev, key, value)
+        payload = "ON" if key == "power" else f"BRIGHTNESS:{value}"
+        if use_publisher:
+            publisher.command(dev, key, payload)
+        else:
+            bridge.publish(f"home/bench/{dev.name}/set", payload)
+        time.sleep(pause)
+    elapsed = time.perf_counter() - start
+    time.sleep(publisher.min_interval + 0.5)
+    state_listeners.clear()
+
+    # The broker's retained documents must match the final device state
+    final = {f"home/bench/{dev.name}/state": dev.state for dev in devices}
+    consistent = None
+    if use_publisher:
+        retained = {t: {k: v for k, v in json.loads(p).items() if k != "source"} for t, p in broker.retained.items()}
+        consistent = retained == final
+    bridge.stop()
+    subscriber.loop_stop()
+    return len(broker.received), len(deliveries), elapsed, publisher.stats(), consistent
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--devices", type=int, default=50)
+    parser.add_argument("--ops", type=int, default=20000)
+    parser.add_argument("--seconds", type=float, default=4.0, help="spread the commands over this long")
+    args = parser.parse_args()
+    random.seed(1)
+
+    print(f"{args.ops} automation commands on {args.devices} lights over ~{args.seconds:.0f} s")
+    received, delivered, elapsed, _, _ = run(args, use_publisher=False)
+    print(f"per-command publish:  broker received {received:6d}, subscriber got {delivered:6d}")
+    received, delivered, elapsed, stats, consistent = run(args, use_publisher=True)
+    print(f"state publisher:      broker received {received:6d}, subscriber got {delivered:6d}")
+    print(f"  commands sent {stats['commands_sent']}, suppressed {stats['commands_suppressed']}")
+    print(f"  state documents {stats['published']} for {stats['changes']} changes "
+          f"(unchanged {stats['suppressed_unchanged']}, folded by rate limit {stats['coalesced']})")
+    print(f"  retained documents match final device state: {consistent}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+# benchmarks/bench_persistence.py
+"""
+Per-command write cost and restart time for the journaled state store.
+
+    python benchmarks/bench_persistence.py --devices 10000 --tail 5000
+"""
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from devices import Light, Fan, AC, Chimney, state_listeners
+from persistence import StateJournal, write_json_atomic
+
+DEVICE_TYPES = [Light, Fan, AC, Chimney]
+
+
+def build_home(n_devices, per_room=20):
+    home = {}
+    for i in range(n_devices):
+        room = f"room{i // per_room}"
+        cls = DEVICE_TYPES[i % len(DEVICE_TYPES)]
+        home.setdefault(room, {})[f"dev{i}"] = cls(f"dev{i}", room)
+    return home
+
+
+def state_dict(home):
+    return {room: {name: dev.to_dict() for name, dev in devs.items()} for room, devs in home.items()}
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--devices", type=int, default=10000)
+    parser.add_argument("--tail", type=int, default=5000, help="journal records left after the last snapshot")
+    parser.add_argument("--commands", type=int, default=200)
+    args = parser.parse_args()
+
+    home = build_home(args.devices)
+    all_devices = [dev for devs in home.values() for dev in devs.values()]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        snapshot_path = os.path.join(tmp, "devices.json")
+        journal_path = os.path.join(tmp, "devices.journal")
+
+        # Baseline: rewrite the whole tree on every command
+        start = time.perf_counter()
+        for _ in range(args.commands):
+            random.choice(all_devices).turn_on()
+            write_json_atomic(snapshot_path, state_dict(home))
+        full_ms = (time.perf_counter() - start) * 1000 / args.commands
+
+        # Journal: append one record per command (compaction disabled for the measurement)
+        journal = StateJournal(snapshot_path, journal_path, lambda: json.dumps(state_dict(home), indent=2), compact_every=10**9)
+        state_listeners.append(lambda dev, key, value: journal.record(dev.room, dev.name, key, value))
+        start = time.perf_counter()
+        for _ in range(args.commands):
+            random.choice(all_devices).turn_on()
+            journal.flush()
+        journal_ms = (time.perf_counter() - start) * 1000 / args.commands
+
+        # Restart: snapshot plus a journal tail
+        journal.request_compaction()
+        journal.flush()
+        for _ in range(args.tail):
+            random.choice(all_devices).turn_off()
+        journal.flush()
+        state_listeners.clear()
+
+        fresh = build_home(args.devices)
+        start = time.perf_counter()
+        saved = StateJournal(snapshot_path, journal_path, None).load()
+        for room, devs in saved.items():
+            for name, data in devs.items():
+                dev = fresh.get(room, {}).get(name)
+                if dev is not None:
+                    dev.restore_state(data["state"])
+        restart_ms = (time.perf_counter() - start) * 1000
+
+        assert state_dict(fresh) == state_dict(home)
+
+    print(f"devices={args.devices} journal_tail={args.tail}")
+    print(f"full rewrite per command:   {full_ms:8.2f} ms")
+    print(f"journal append per command: {journal_ms:8.2f} ms")
+    print(f"restart (snapshot + tail):  {restart_ms:8.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
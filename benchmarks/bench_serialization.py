@@ -0,0 +1,53 @@
+# benchmarks/bench_serialization.py
+"""
+Full-state serialization: json.dumps over fresh to_dict() trees vs StateSerializer.
+
+    python benchmarks/bench_serialization.py --devices 500
+"""
+import os
+import sys
+import json
+import time
+import random
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from persistence import StateSerializer
+from bench_persistence import build_home, state_dict
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--devices", type=int, default=500)
+    parser.add_argument("--iterations", type=int, default=200)
+    parser.add_argument("--changes", type=int, default=1, help="devices changed between serializations")
+    args = parser.parse_args()
+
+    home = build_home(args.devices)
+    all_devices = [dev for devs in home.values() for dev in devs.values()]
+    serializer = StateSerializer(home)
+    assert serializer.dumps() == json.dumps(state_dict(home), indent=2)
+
+    start = time.perf_counter()
+    for _ in range(args.iterations):
+        for dev in random.sample(all_devices, args.changes):
+            dev.turn_on()
+        json.dumps(state_dict(home), indent=2)
+    full_ms = (time.perf_counter() - start) * 1000 / args.iterations
+
+    start = time.perf_counter()
+    for _ in range(args.iterations):
+        for dev in random.sample(all_devices, args.changes):
+            dev.turn_off()
+        serializer.dumps()
+    cached_ms = (time.perf_counter() - start) * 1000 / args.iterations
+
+    assert serializer.dumps() == json.dumps(state_dict(home), indent=2)
+    print(f"devices={args.devices} changes/iteration={args.changes}")
+    print(f"json.dumps(to_dict tree): {full_ms:8.3f} ms")
+    print(f"StateSerializer.dumps():  {cached_ms:8.3f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+# benchmarks/bench_tv_flows.py
+"""
+End-to-end latency of TV.search_and_play against a simulated TV: the old
+fixed-sleep flow versus the current one (deep link, UI polling as fallback).
+
+benchmarks/fake_device/ holds shell stand-ins for am, cmd, dumpsys, input and
+monkey; they are put first on the PATH of the fake ADB server. State lives in a
+temp dir, and FAKE_LAUNCH_SECONDS / FAKE_KEYBOARD_SECONDS control how long the
+simulated app launch and search keyboard take.
+
+    python benchmarks/bench_tv_flows.py --launch 1.0 --keyboard 0.5
+"""
+import os
+import sys
+import time
+import asyncio
+import argparse
+import tempfile
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+
+from fake_adb_server import FakeAdbServer
+
+
+async def legacy_search_and_play(tv, query):
+    """The fixed-sleep flow TV.search_and_play used before UI-state polling"""
+    await tv._send_adb_command("monkey -p com.netflix.ninja 1")
+    await asyncio.sleep(3)
+    await asyncio.sleep(4)
+    await tv._send_adb_command("input keyevent KEYCODE_SEARCH")
+    await asyncio.sleep(2)
+    await tv.send_text(query)
+    await asyncio.sleep(2)
+    await tv._send_adb_command("input keyevent KEYCODE_ENTER")
+    await asyncio.sleep(3)
+    await tv._send_adb_command("input keyevent KEYCODE_ENTER")
+
+
+def start_fake_tv(launch_seconds, keyboard_seconds, state_dir):
+    env = dict(os.environ)
+    env["PATH"] = os.path.join(BENCH_DIR, "fake_device") + os.pathsep + env["PATH"]
+    env["FAKE_DEVICE_DIR"] = state_dir
+    env["FAKE_LAUNCH_SECONDS"] = str(launch_seconds)
+    env["FAKE_KEYBOARD_SECONDS"] = str(keyboard_seconds)
+    server = FakeAdbServer(env=env).start_in_thread()
+    os.environ["ADB_SERVER_PORT"] = str(server.port)
+    os.environ["ADB_TRANSPORT"] = "socket"
+    return server
+
+
+def reset_device(state_dir):
+    for name in os.listdir(state_dir):
+        os.remove(os.path.join(state_dir, name))
+
+
+async def run(args):
+    with tempfile.TemporaryDirectory() as state_dir:
+        start_fake_tv(args.launch, args.keyboard, state_dir)
+        from devices import TV  # reads ADB_SERVER_PORT at import
+
+        tv = TV("tv", "livingroom", "127.0.0.1")
+
+        if not args.skip_legacy:
+            start = time.perf_counter()
+            await legacy_search_and_play(tv, "Breaking Bad")
+            legacy_s = time.perf_counter() - start
+            print(f"fixed sleeps:     {legacy_s:6.2f} s")
+            reset_device(state_dir)
+
+        start = time.perf_counter()
+        assert await tv.search_and_play("Breaking Bad", "netflix")
+        polling_s = time.perf_counter() - start
+        print(f"current flow:     {polling_s:6.2f} s")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--launch", type=float, default=1.0, help="simulated app launch time (s)")
+    parser.add_argument("--keyboard", type=float, default=0.5, help="simulated search keyboard delay (s)")
+    parser.add_argument("--skip-legacy", action="store_true")
+    args = parser.parse_args()
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+# benchmarks/bench_tv_health.py
+"""
+Time to report the status of every TV when some of them are unreachable:
+probing each TV in turn (what list_tv_devices used to do), one concurrent
+HealthMonitor cycle, and reading the monitor's cache.
+
+    python benchmarks/bench_tv_health.py --tvs 8 --unreachable 3 --delay 2
+"""
+import os
+import sys
+import time
+import asyncio
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fake_adb_server import FakeAdbServer
+
+
+async def run(args, serials):
+    from devices import TV  # reads ADB_SERVER_PORT at import
+    from health import HealthMonitor
+
+    def make_tvs():
+        return [TV(f"tv{i}", "bench", *serial.split(":")) for i, serial in enumerate(serials)]
+
+    tvs = make_tvs()
+    start = time.perf_counter()
+    serial_status = [await tv.probe(args.timeout) for tv in tvs]
+    serial_s = time.perf_counter() - start
+
+    tvs = make_tvs()
+    monitor = HealthMonitor(lambda: tvs, probe_timeout=args.timeout)
+    start = time.perf_counter()
+    await monitor.probe_due()
+    cycle_s = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for _ in range(1000):
+        cached_status = [monitor.status(tv).status == "online" for tv in tvs]
+    cached_ms = (time.perf_counter() - start) * 1000 / 1000
+
+    assert serial_status == cached_status
+    print(f"{len(tvs)} TVs, {args.unreachable} unreachable")
+    print(f"serial probes:        {serial_s * 1000:9.1f} ms")
+    print(f"monitor cycle:        {cycle_s * 1000:9.1f} ms")
+    print(f"read from cache:      {cached_ms:9.4f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--tvs", type=int, default=8)
+    parser.add_argument("--unreachable", type=int, default=3)
+    parser.add_argument("--delay", type=float, default=2.0, help="simulated connect timeout of an unreachable TV (s)")
+    parser.add_argument("--timeout", type=float, default=5.0, help="probe timeout (s)")
+    args = parser.parse_args()
+
+    serials = [f"10.0.0.{i + 1}:5555" for i in range(args.tvs)]
+    server = FakeAdbServer(unreachable=serials[:args.unreachable], unreachable_delay=args.delay).start_in_thread()
+    os.environ["ADB_SERVER_PORT"] = str(server.port)
+    os.environ["ADB_TRANSPORT"] = "socket"
+    asyncio.run(run(args, serials))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+# benchmarks/bench_tv_jobs.py
+"""
+Background jobs for long TV flows, against the simulated TV: how long the
+caller waits for a blocking search_and_play versus for a job id, how fast
+another TV answers while the job runs, and how quickly a cancelled job
+frees its TV.
+
+    python benchmarks/bench_tv_jobs.py --launch 1.0 --keyboard 0.5
+"""
+import os
+import sys
+import time
+import asyncio
+import argparse
+import tempfile
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+
+from bench_tv_flows import start_fake_tv, reset_device
+
+
+async def run(args, state_dir):
+    from devices import TV  # reads ADB_SERVER_PORT at import
+    from jobs import JobManager
+
+    jobs = JobManager()
+    tv = TV("tv", "livingroom", "127.0.0.1")
+    other = TV("tv", "bedroom", "127.0.0.2")
+    play = lambda: tv.search_and_play("Breaking Bad", "netflix", strategy="search_key")
+
+    start = time.perf_counter()
+    assert await play()
+    blocking_s = time.perf_counter() - start
+
+    reset_device(state_dir)
+    start = time.perf_counter()
+    job = jobs.start("bench", "play", play)
+    returned_s = time.perf_counter() - start
+    await asyncio.sleep(0.5)
+    start = time.perf_counter()
+    assert await other.volume_up()
+    other_s = time.perf_counter() - start
+    await jobs.wait(job)
+    job_s = job.finished - job.created
+    assert job.status == "succeeded", job.snapshot()
+
+    reset_device(state_dir)
+    job = jobs.start("bench", "play", play)
+    await asyncio.sleep(1.5)
+    start = time.perf_counter()
+    jobs.cancel(job.id)
+    await jobs.wait(job)
+    assert await tv.volume_up()
+    cancel_s = time.perf_counter() - start
+
+    print(f"blocking search_and_play returns after:   {blocking_s:6.2f} s")
+    print(f"job id returned after:                    {returned_s * 1000:6.2f} ms (job done in {job_s:.2f} s)")
+    print(f"other TV volume_up during the job:        {other_s * 1000:6.1f} ms")
+    print(f"cancel mid-flow until the TV takes input: {cancel_s * 1000:6.1f} ms ({job.status})")
+    print(f"steps: {[step['message'] for step in job.snapshot()['steps']]}")
+    tv.close()
+    other.close()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--launch", type=float, default=1.0, help="simulated app launch time (s)")
+    parser.add_argument("--keyboard", type=float, default=0.5, help="simulated search keyboard delay (s)")
+    args = parser.parse_args()
+    with tempfile.TemporaryDirectory() as state_dir:
+        start_fake_tv(args.launch, args.keyboard, state_dir)
+        asyncio.run(run(args, state_dir))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+# benchmarks/bench_tv_timing.py
+"""
+Latency of repeated search_and_play runs on simulated TVs of different
+speeds, as each TV's timing profile learns its launch time and the fixed
+pauses in the app flow shrink (or grow) to match.
+
+Each TV is its own serial on the fake ADB server, with its own
+FAKE_LAUNCH_SECONDS and state directory.
+
+    python benchmarks/bench_tv_timing.py --runs 5 --strategy search_key
+"""
+import os
+import sys
+import time
+import asyncio
+import argparse
+import tempfile
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+
+from bench_tv_flows import start_fake_tv, reset_device
+
+TV_LAUNCH_SECONDS = {"127.0.0.1": 0.3, "127.0.0.2": 1.0, "127.0.0.3": 3.0}
+
+
+async def run(args, state_dirs):
+    import devices  # reads ADB_SERVER_PORT at import
+    from app_drivers import get_driver
+
+    for host, launch in TV_LAUNCH_SECONDS.items():
+        tv = devices.TV("tv", host, host)
+        times = []
+        for _ in range(args.runs):
+            reset_device(state_dirs[host])
+            start = time.perf_counter()
+            assert await tv.search_and_play("Breaking Bad", args.app, strategy=args.strategy)
+            times.append(time.perf_counter() - start)
+        package = get_driver(args.app).package
+        runs = "".join(f"{t:7.2f}" for t in times)
+        print(f"launch {launch:3.1f} s:{runs}   (pause scale {tv.timing.speed_factor(package):.2f})")
+        tv.close()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--app", default="netflix")
+    parser.add_argument("--strategy", default="search_key")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as root:
+        state_dirs = {host: os.path.join(root, host) for host in TV_LAUNCH_SECONDS}
+        for path in state_dirs.values():
+            os.makedirs(path)
+        server = start_fake_tv(1.0, 0.5, root)
+        for host, launch in TV_LAUNCH_SECONDS.items():
+            server.device_env[f"{host}:5555"] = {
+                "FAKE_DEVICE_DIR": state_dirs[host],
+                "FAKE_LAUNCH_SECONDS": str(launch),
+                "FAKE_KEYBOARD_SECONDS": str(launch / 2),
+            }
+        print(f"{args.app} search_and_play ({args.strategy}), seconds per run:")
+        asyncio.run(run(args, state_dirs))
+
+
+if __name__ == "__main__":
+    main()
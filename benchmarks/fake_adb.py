@@ -0,0 +1,29 @@
+#!/usr/bin/env python3
+# benchmarks/fake_adb.py
+"""
+Minimal stand-in for the adb client so TV code can be exercised without a device.
+
+    adb connect <serial>          -> prints "connected to <serial>"
+    adb -s <serial> shell         -> interactive /bin/sh on stdin
+    adb -s <serial> shell <cmd>   -> /bin/sh -c <cmd>
+"""
+import os
+import sys
+
+
+def main(argv):
+    if argv[:1] == ["connect"]:
+        print(f"connected to {argv[1]}")
+        return 0
+    if argv[:1] == ["-s"]:
+        argv = argv[2:]
+    if argv[:1] == ["shell"]:
+        if len(argv) == 1:
+            os.execvp("sh", ["sh"])
+        os.execvp("sh", ["sh", "-c", " ".join(argv[1:])])
+    print(f"fake adb: unsupported arguments {argv}", file=sys.stderr)
+    return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
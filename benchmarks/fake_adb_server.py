@@ -0,0 +1,122 @@
+# benchmarks/fake_adb_server.py
+"""
+Stand-in ADB server speaking the host smart-socket protocol on TCP.
+
+Supports host:version, host:connect:<serial>, host:transport:<serial>,
+shell:<cmd> and exec-out:<cmd>. Shell commands run in a local /bin/sh, so
+anything that works in sh works "on the device". Serials listed in
+unreachable behave like powered-off TVs: host:connect stalls for
+unreachable_delay seconds and then fails. device_env maps a serial to extra
+environment variables for its shell commands (e.g. FAKE_SERIALNO for the
+getprop stand-in in fake_device/).
+
+    python benchmarks/fake_adb_server.py --port 5037
+"""
+import os
+import asyncio
+import argparse
+import threading
+
+
+class FakeAdbServer:
+    def __init__(self, host="127.0.0.1", port=0, shell_delay=0.0, env=None, unreachable=(), unreachable_delay=1.0,
+                 device_env=None):
+        self.host = host
+        self.port = port
+        self.shell_delay = shell_delay
+        self.env = env
+        self.unreachable = set(unreachable)
+        self.unreachable_delay = unreachable_delay
+        self.device_env = device_env or {}
+        self.connected = set()
+        self.requests = []
+        self._server = None
+
+    @staticmethod
+    def _reply(payload: str) -> bytes:
+        data = payload.encode()
+        return b"%04x" % len(data) + data
+
+    async def _handle(self, reader, writer):
+        serial = None
+        try:
+            while True:
+                length = int(await reader.readexactly(4), 16)
+                request = (await reader.readexactly(length)).decode()
+                self.requests.append(request)
+                if request == "host:version":
+                    writer.write(b"OKAY" + self._reply("0029"))
+                    break
+                if request.startswith("host:connect:"):
+                    target = request[len("host:connect:"):]
+                    if target in self.unreachable:
+                        await asyncio.sleep(self.unreachable_delay)
+                        writer.write(b"OKAY" + self._reply(f"failed to connect to '{target}': Connection timed out"))
+                        break
+                    self.connected.add(target)
+                    writer.write(b"OKAY" + self._reply(f"connected to {target}"))
+                    break
+                if request.startswith("host:transport:"):
+                    serial = request[len("host:transport:"):]
+                    if serial not in self.connected:
+                        writer.write(b"FAIL" + self._reply(f"device '{serial}' not found"))
+                        break
+                    writer.write(b"OKAY")
+                    continue
+                if serial is not None and request.startswith(("shell:", "exec-out:")):
+                    command = request.split(":", 1)[1]
+                    writer.write(b"OKAY")
+                    if self.shell_delay:
+                        await asyncio.sleep(self.shell_delay)
+                    env = self.env
+                    if serial in self.device_env:
+                        env = dict(self.env or os.environ, **self.device_env[serial])
+                    proc = await asyncio.create_subprocess_exec(
+                        "sh", "-c", command,
+                        stdout=asyncio.subprocess.PIPE,
+                        stderr=asyncio.subprocess.STDOUT,
+                        env=env,
+                    )
+                    out, _ = await proc.communicate()
+                    writer.write(out)
+                    break
+                writer.write(b"FAIL" + self._reply(f"unsupported request: {request}"))
+                break
+            await writer.drain()
+        except asyncio.IncompleteReadError:
+            pass
+        finally:
+            writer.close()
+
+    async def start(self):
+        self._server = await asyncio.start_server(self._handle, self.host, self.port)
+        self.port = self._server.sockets[0].getsockname()[1]
+        return self
+
+    def start_in_thread(self):
+        """Run the server on a background event loop; returns once it is listening"""
+        ready = threading.Event()
+
+        def run():
+            loop = asyncio.new_event_loop()
+            loop.run_until_complete(self.start())
+            ready.set()
+            loop.run_forever()
+
+        threading.Thread(target=run, name="fake-adb-server", daemon=True).start()
+        ready.wait()
+        return self
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--port", type=int, default=5037)
+    parser.add_argument("--shell-delay", type=float, default=0.0, help="simulated device round trip (s)")
+    args = parser.parse_args()
+    server = await FakeAdbServer(port=args.port, shell_delay=args.shell_delay).start()
+    print(f"Fake ADB server listening on {server.host}:{server.port}")
+    await server._server.serve_forever()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,149 @@
+# benchmarks/fake_mqtt_broker.py
+"""
+Minimal MQTT 3.1.1 broker stand-in for benchmarks: accepts CONNECT, acks
+QoS 1/2 PUBLISH (after an optional delay standing in for broker and network
+latency), answers PINGREQ and SUBSCRIBE, and forwards publishes to
+subscribers whose filter matches (+ and # wildcards). Retained messages are
+kept and replayed to new subscribers.
+"""
+import asyncio
+import threading
+
+
+def _encode_length(length: int) -> bytes:
+    out = bytearray()
+    while True:
+        byte, length = length % 128, length // 128
+        out.append(byte | (0x80 if length else 0))
+        if not length:
+            return bytes(out)
+
+
+def _packet(first: int, body: bytes) -> bytes:
+    return bytes([first]) + _encode_length(len(body)) + body
+
+
+def topic_matches(pattern: str, topic: str) -> bool:
+    pattern_parts, topic_parts = pattern.split("/"), topic.split("/")
+    for i, part in enumerate(pattern_parts):
+        if part == "#":
+            return True
+        if i >= len(topic_parts) or (part != "+" and part != topic_parts[i]):
+            return False
+    return len(pattern_parts) == len(topic_parts)
+
+
+class FakeMqttBroker:
+    def __init__(self, host="127.0.0.1", port=0, ack_delay=0.0):
+        self.host = host
+        self.port = port
+        self.ack_delay = ack_delay
+        self.received = []
+        self.retained = {}
+        self._subscribers = []
+        self._server = None
+        self._loop = None
+        self._writers = set()
+
+    async def _read_packet(self, reader):
+        first = (await reader.readexactly(1))[0]
+        length, shift = 0, 0
+        while True:
+            byte = (await reader.readexactly(1))[0]
+            length += (byte & 0x7F) << shift
+            shift += 7
+            if not byte & 0x80:
+                break
+        return first, await reader.readexactly(length)
+
+    def _deliver(self, topic: str, payload: bytes, retain: bool):
+        for writer, pattern in list(self._subscribers):
+            if topic_matches(pattern, topic) and not writer.is_closing():
+                name = topic.encode()
+                writer.write(_packet(0x30 | (0x01 if retain else 0), len(name).to_bytes(2, "big") + name + payload))
+
+    async def _ack_later(self, writer, packet: bytes):
+        await asyncio.sleep(self.ack_delay)
+        if not writer.is_closing():
+            writer.write(packet)
+
+    async def _handle(self, reader, writer):
+        self._writers.add(writer)
+        try:
+            while True:
+                first, body = await self._read_packet(reader)
+                kind = first >> 4
+                if kind == 1:  # CONNECT
+                    writer.write(_packet(0x20, b"\x00\x00"))
+                elif kind == 3:  # PUBLISH
+                    qos = (first >> 1) & 0x03
+                    retain = bool(first & 0x01)
+                    name_len = int.from_bytes(body[:2], "big")
+                    topic = body[2:2 + name_len].decode()
+                    rest = body[2 + name_len:]
+                    mid, payload = (rest[:2], rest[2:]) if qos else (b"", rest)
+                    self.received.append((topic, payload))
+                    if retain:
+                        self.retained[topic] = payload
+                    self._deliver(topic, payload, False)
+                    if qos == 1:
+                        asyncio.ensure_future(self._ack_later(writer, _packet(0x40, mid)))
+                    elif qos == 2:
+                        asyncio.ensure_future(self._ack_later(writer, _packet(0x50, mid)))
+                elif kind == 6:  # PUBREL
+                    writer.write(_packet(0x70, body[:2]))
+                elif kind == 8:  # SUBSCRIBE
+                    mid, rest, granted = body[:2], body[2:], bytearray()
+                    patterns = []
+                    while rest:
+                        length = int.from_bytes(rest[:2], "big")
+                        patterns.append(rest[2:2 + length].decode())
+                        granted.append(min(rest[2 + length], 1))
+                        rest = rest[3 + length:]
+                    writer.write(_packet(0x90, mid + bytes(granted)))
+                    for pattern in patterns:
+                        self._subscribers.append((writer, pattern))
+                        for topic, payload in self.retained.items():
+                            if topic_matches(pattern, topic):
+                                name = topic.encode()
+                                writer.write(_packet(0x31, len(name).to_bytes(2, "big") + name + payload))
+                elif kind == 12:  # PINGREQ
+                    writer.write(_packet(0xD0, b""))
+                elif kind == 14:  # DISCONNECT
+                    break
+                await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            self._subscribers = [(w, p) for w, p in self._subscribers if w is not writer]
+            self._writers.discard(writer)
+            writer.close()
+
+    def publish(self, topic: str, payload: bytes, retain: bool = False):
+        """Publish from the broker side (as another client would), thread-safe"""
+        def send():
+            if retain:
+                self.retained[topic] = payload
+            self._deliver(topic, payload, retain=False)
+        self._loop.call_soon_threadsafe(send)
+
+    def drop_connections(self):
+        """Close every client connection (simulates a broker restart), thread-safe"""
+        def drop():
+            for writer in list(self._writers):
+                writer.transport.abort()
+        self._loop.call_soon_threadsafe(drop)
+
+    def start_in_thread(self):
+        started = threading.Event()
+
+        def run():
+            self._loop = asyncio.new_event_loop()
+            self._server = self._loop.run_until_complete(asyncio.start_server(self._handle, self.host, self.port))
+            self.port = self._server.sockets[0].getsockname()[1]
+            started.set()
+            self._loop.run_forever()
+
+        threading.Thread(target=run, daemon=True).start()
+        started.wait()
+        return self
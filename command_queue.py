@@ -0,0 +1,135 @@
+# command_queue.py
+import asyncio
+import itertools
+import time
+import contextvars
+from contextvars import ContextVar
+
+# Priorities: lower runs first. Interactive single-key commands overtake
+# macros that are still waiting, but never interrupt the one that is running.
+INTERACTIVE = 0
+MACRO = 1
+
+# Queue whose worker is running the current task (for nested submits)
+_running_queue = ContextVar("running_queue", default=None)
+
+
+class CommandQueue:
+    """
+    Serializes the operations sent to one TV.
+
+    submit() enqueues a coroutine factory and waits for its result; a single
+    worker task runs the factories one at a time, ordered by (priority,
+    arrival). Each TV has its own queue and worker, so different TVs still
+    run in parallel. Calls made from inside a running operation (e.g.
+    search_and_play opening the app) run inline instead of queueing behind it.
+
+    Each operation runs in the submitter's context (so context variables such
+    as jobs.current_job carry over), and cancelling the submitter cancels the
+    operation, also when it is already running.
+    """
+
+    def __init__(self, name: str = ""):
+        self.name = name
+        self._queue = None
+        self._worker = None
+        self._loop = None
+        self._seq = itertools.count()
+        self._waiting_macros = 0
+        self.submitted = 0
+        self.started = 0
+        self.completed = 0
+        self.interactive_jumps = 0
+        self.max_depth = 0
+        self.last_wait = 0.0
+        self.max_wait = 0.0
+        self.total_wait = 0.0
+
+    def _ensure_worker(self):
+        loop = asyncio.get_running_loop()
+        if self._worker is None or self._worker.done() or self._loop is not loop:
+            self._loop = loop
+            self._queue = asyncio.PriorityQueue()
+            self._waiting_macros = 0
+            self._worker = loop.create_task(self._run(), name=f"tv-commands-{self.name}")
+
+    async def submit(self, factory, priority: int = MACRO):
+        """Run factory() on this queue's worker and return its result"""
+        if _running_queue.get() is self:
+            return await factory()
+        self._ensure_worker()
+        future = self._loop.create_future()
+        if priority == INTERACTIVE and self._waiting_macros:
+            self.interactive_jumps += 1
+        if priority != INTERACTIVE:
+            self._waiting_macros += 1
+        self.submitted += 1
+        context = contextvars.copy_context()
+        self._queue.put_nowait((priority, next(self._seq), time.monotonic(), factory, future, context))
+        self.max_depth = max(self.max_depth, self._queue.qsize())
+        return await future
+
+    async def _call(self, factory):
+        _running_queue.set(self)
+        return await factory()
+
+    async def _run(self):
+        while True:
+            priority, _, enqueued, factory, future, context = await self._queue.get()
+            if priority != INTERACTIVE:
+                self._waiting_macros -= 1
+            if future.cancelled():
+                continue
+            wait = time.monotonic() - enqueued
+            self.started += 1
+            self.last_wait = wait
+            self.max_wait = max(self.max_wait, wait)
+            self.total_wait += wait
+            operation = self._loop.create_task(self._call(factory), context=context)
+            # The submitter gave up (e.g. its job was cancelled): stop the operation
+            future.add_done_callback(lambda f, operation=operation: f.cancelled() and operation.cancel())
+            try:
+                result = await operation
+            except asyncio.CancelledError:
+                if asyncio.current_task().cancelling():
+                    # close(): the worker itself is stopping
+                    operation.cancel()
+                    if not future.done():
+                        future.cancel()
+                    raise
+                if not future.done():
+                    future.cancel()
+            except Exception as e:
+                if not future.done():
+                    future.set_exception(e)
+            else:
+                if not future.done():
+                    future.set_result(result)
+            self.completed += 1
+
+    def depth(self) -> int:
+        """Operations waiting to run (not counting the one in progress)"""
+        return self._queue.qsize() if self._queue is not None else 0
+
+    def metrics(self) -> dict:
+        return {
+            "depth": self.depth(),
+            "submitted": self.submitted,
+            "completed": self.completed,
+            "interactive_jumps": self.interactive_jumps,
+            "max_depth": self.max_depth,
+            "last_wait_ms": round(self.last_wait * 1000, 1),
+            "avg_wait_ms": round(self.total_wait / self.started * 1000, 1) if self.started else 0.0,
+            "max_wait_ms": round(self.max_wait * 1000, 1),
+        }
+
+    def close(self):
+        """Stop the worker; operations still queued fail with RuntimeError"""
+        if self._worker is not None:
+            self._worker.cancel()
+            self._worker = None
+        while self._queue is not None and not self._queue.empty():
+            future = self._queue.get_nowait()[4]
+            if not future.done():
+                future.set_exception(RuntimeError(f"TV {self.name} was removed"))
+        self._waiting_macros = 0
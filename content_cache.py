@@ -0,0 +1,110 @@
+# content_cache.py
+import os
+import re
+import json
+import time
+import threading
+from collections import OrderedDict
+from persistence import write_json_atomic
+
+
+def normalize_query(query: str) -> str:
+    """Case-, spacing- and punctuation-insensitive form of a search query"""
+    return " ".join(re.sub(r"[^\w\s]", " ", query.lower()).split())
+
+
+class ContentCache:
+    """
+    Maps (app, normalized query) to the content URI that query resolved to,
+    so later plays of the same title open it directly instead of searching.
+
+    Entries are kept in LRU order (at most max_entries) and expire ttl seconds
+    after they were learned. save() writes the cache to path as JSON when it
+    changed; it is loaded back on start.
+    """
+
+    def __init__(self, path, max_entries: int = 500, ttl: float = 30 * 24 * 3600):
+        self.path = path
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._dirty = False
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expired = 0
+
+    def get(self, app: str, query: str):
+        """The cached content URI, or None (counted as a miss)"""
+        key = (app, normalize_query(query))
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and time.time() - entry[1] > self.ttl:
+                del self._entries[key]
+                self._dirty = True
+                self.expired += 1
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, app: str, query: str, uri: str):
+        key = (app, normalize_query(query))
+        with self._lock:
+            self._entries[key] = (uri, time.time())
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+            self._dirty = True
+
+    def forget(self, app: str, query: str):
+        """Drop an entry whose URI no longer plays"""
+        with self._lock:
+            if self._entries.pop((app, normalize_query(query)), None) is not None:
+                self._dirty = True
+
+    def save(self):
+        """Write the cache to disk if it changed since the last save"""
+        with self._lock:
+            if not self._dirty:
+                return
+            entries = [
+                {"app": app, "query": query, "uri": uri, "learned_at": learned_at}
+                for (app, query), (uri, learned_at) in self._entries.items()
+            ]
+            self._dirty = False
+        write_json_atomic(self.path, entries)
+
+    def load(self):
+        if not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, "r") as f:
+                entries = json.load(f)
+        except Exception as e:
+            print(f"Warning: Could not load content cache: {e}")
+            return
+        now = time.time()
+        with self._lock:
+            for entry in entries:
+                if now - entry["learned_at"] <= self.ttl:
+                    self._entries[(entry["app"], entry["query"])] = (entry["uri"], entry["learned_at"])
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else None,
+            "evictions": self.evictions,
+            "expired": self.expired,
+        }
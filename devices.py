@@ -1,20 +1,185 @@
 # devices.py
-import time
-import subprocess
 import re
+import math
+import time
+import asyncio
+import functools
+from adb import AdbBusyError, ConnectionState, open_transport
+from app_drivers import DRIVERS, get_driver
+from command_queue import CommandQueue, INTERACTIVE, MACRO
+from health import CircuitBreaker
+from timing import TimingProfile
+
+class TVUnavailableError(Exception):
+    """Raised instead of contacting a TV whose circuit breaker is open"""
+
+# Callables invoked as listener(device, key, value) after every state change
+state_listeners = []
+
+def _notify_state_change(device, key, value):
+    for listener in state_listeners:
+        listener(device, key, value)
+
+# Remote-control key names accepted by TV.press_key and TV.send_key_sequence
+KEY_CODES = {
+    "enter": "KEYCODE_ENTER",
+    "back": "KEYCODE_BACK",
+    "home": "KEYCODE_HOME", 
+    "up": "KEYCODE_DPAD_UP",
+    "down": "KEYCODE_DPAD_DOWN",
+    "left": "KEYCODE_DPAD_LEFT", 
+    "right": "KEYCODE_DPAD_RIGHT",
+    "menu": "KEYCODE_MENU",
+    "play": "KEYCODE_MEDIA_PLAY",
+    "pause": "KEYCODE_MEDIA_PAUSE",
+    "search": "KEYCODE_SEARCH",
+    "ok": "KEYCODE_ENTER",
+    "select": "KEYCODE_ENTER"
+}
+
+def _keycode(key: str) -> str:
+    if key.upper().startswith("KEYCODE_"):
+        return key.upper()
+    if key.lower() in KEY_CODES:
+        return KEY_CODES[key.lower()]
+    raise ValueError(f"Unknown key: {key}. Available keys: {list(KEY_CODES.keys())}")
+
+# Longest wait for a launched app to reach the foreground
+APP_LAUNCH_TIMEOUT = 15
+
+# Data URI of the intent that started the resumed activity. Other tasks'
+# records carry intents too, so the resumed record's id is looked up first
+# and only the first intent line from that record on is read.
+CURRENT_INTENT_DATA = (
+    "a=$(dumpsys activity activities); "
+    "r=$(echo \"$a\" | grep 'ResumedActivity' | head -n 1 | grep -o 'ActivityRecord{[0-9a-f]*'); "
+    "[ -n \"$r\" ] && echo \"$a\" | sed -n \"/$r/,/[Ii]ntent[ =]{/p\" "
+    "| grep -E '[Ii]ntent[ =][{]' | head -n 1 | grep -o 'dat=[^ }]*'"
+)
+
+def _app_focused(package: str) -> str:
+    return f"dumpsys window | grep -E 'mCurrentFocus|mFocusedApp' | grep -q '{package}/'"
+
+def _wait_command(test: str, timeout: float, interval: float = 0.25) -> str:
+    """
+    Shell snippet polling test on the TV until it passes; exits 1 at a
+    deadline on the device's clock, however long each test takes. date has
+    one-second resolution, so the deadline is one second past timeout
+    rounded up: never early, at most about two seconds late.
+    """
+    seconds = math.ceil(timeout) + 1
+    return (f"( end=$(( $(date +%s) + {seconds} )); "
+            f"until {test}; do [ $(date +%s) -ge $end ] && exit 1; sleep {interval}; done )")
+
+def _launch_seconds(output: str):
+    """Launch time reported by `am start -W` (TotalTime, in ms), in seconds"""
+    match = re.search(r"TotalTime: (\d+)", output or "")
+    return int(match.group(1)) / 1000 if match else None
+
+def _view_command(uri: str, package: str) -> str:
+    """am start for a VIEW intent; -W waits until the target activity is drawn"""
+    return f"am start -W -a android.intent.action.VIEW -d '{uri}' {package}"
+
+def _queued(priority):
+    """Run a TV method through the TV's command queue (see command_queue.CommandQueue)"""
+    def decorate(method):
+        @functools.wraps(method)
+        async def wrapper(self, *args, **kwargs):
+            return await self.commands.submit(lambda: method(self, *args, **kwargs), priority)
+        return wrapper
+    return decorate
+
+def _text_command(text: str) -> str:
+    cleaned_text = text.replace(" ", "%s")
+    cleaned_text = re.sub(r'[^\w%s]', '', cleaned_text)
+    return f"input text '{cleaned_text}'"
+
+def _flag(value) -> bool:
+    """bool from a bool or its text form ("true", "on", "1", ...)"""
+    if isinstance(value, str):
+        return value.strip().lower() in ("1", "true", "on", "yes")
+    return bool(value)
+
+
+class Stateful:
+    """
+    Fixed state layout shared by Device and TV.
+
+    Each state key is a slot named in FIELDS (key -> type the value is
+    converted to), so instances carry no __dict__ and no per-instance state
+    dict. `state` builds the {key: value} dict on demand (subclasses spell
+    it out as a literal, several times faster than the generic loop), so
+    hot paths should read the fields directly. restore_state() loads saved
+    values; apply_report() records what the device reported over MQTT (the
+    dict is only created on the first report).
+    """
+    __slots__ = ("version", "_reported", "reported_at")
+    FIELDS = {}
+
+    def _init_state(self):
+        # Bumped on every change so serializers can reuse cached output
+        self.version = 0
+        # Last state the device itself reported over MQTT (see mqtt_state.py)
+        self._reported = None
+        self.reported_at = None
+
+    @property
+    def state(self) -> dict:
+        return {key: getattr(self, key) for key in self.FIELDS}
+
+    @property
+    def reported(self) -> dict:
+        return self._reported if self._reported is not None else {}
+
+    def _set_state(self, key, value):
+        """Convert value to the field's type (ValueError if it cannot be) and store it"""
+        convert = self.FIELDS[key]
+        if value.__class__ is not convert:
+            value = convert(value)
+        setattr(self, key, value)
+        self.version += 1
+        _notify_state_change(self, key, value)
+
+    def restore_state(self, state: dict):
+        """Load saved values, skipping keys this type does not have or values that do not convert"""
+        for key, value in state.items():
+            convert = self.FIELDS.get(key)
+            if convert is None:
+                continue
+            try:
+                setattr(self, key, convert(value))
+            except (TypeError, ValueError):
+                pass
+        self.version += 1
+
+    def apply_report(self, values: dict, reported_at: float):
+        if self._reported is None:
+            self._reported = {}
+        self._reported.update(values)
+        self.reported_at = reported_at
+
+
+class Device(Stateful):
+    __slots__ = ("name", "type", "room", "power")
+    FIELDS = {"power": str}
 
-class Device:
     def __init__(self, name, device_type, room):
         self.name = name
         self.type = device_type
         self.room = room
-        self.state = {"power": "OFF"}
+        self.power = "OFF"
+        self._init_state()
 
+    # The values are already typed, so these skip _set_state's conversion
     def turn_on(self):
-        self.state["power"] = "ON"
+        self.power = "ON"
+        self.version += 1
+        _notify_state_change(self, "power", "ON")
 
     def turn_off(self):
-        self.state["power"] = "OFF"
+        self.power = "OFF"
+        self.version += 1
+        _notify_state_change(self, "power", "OFF")
 
     def to_dict(self):
         return {
@@ -25,238 +190,377 @@ class Device:
         }
 
 class Light(Device):
+    __slots__ = ("brightness",)
+    FIELDS = {"power": str, "brightness": int}
+
     def __init__(self, name, room):
         super().__init__(name, "light", room)
-        self.state["brightness"] = 0
+        self.brightness = 0
+
+    @property
+    def state(self) -> dict:
+        return {"power": self.power, "brightness": self.brightness}
 
     def set_brightness(self, value):
-        self.state["brightness"] = value
+        self._set_state("brightness", value)
 
 class Fan(Device):
+    __slots__ = ("speed",)
+    FIELDS = {"power": str, "speed": int}
+
     def __init__(self, name, room):
         super().__init__(name, "fan", room)
-        self.state["speed"] = 0
+        self.speed = 0
+
+    @property
+    def state(self) -> dict:
+        return {"power": self.power, "speed": self.speed}
 
     def set_speed(self, value):
-        self.state["speed"] = value
+        self._set_state("speed", value)
 
 class AC(Device):
+    __slots__ = ("temperature",)
+    FIELDS = {"power": str, "temperature": int}
+
     def __init__(self, name, room):
         super().__init__(name, "ac", room)
-        self.state["temperature"] = 24
+        self.temperature = 24
+
+    @property
+    def state(self) -> dict:
+        return {"power": self.power, "temperature": self.temperature}
 
     def set_temperature(self, value):
-        self.state["temperature"] = value
+        self._set_state("temperature", value)
 
 class Chimney(Device):
+    __slots__ = ("mode",)
+    FIELDS = {"power": str, "mode": str}
+
     def __init__(self, name, room):
         super().__init__(name, "chimney", room)
-        self.state["mode"] = "OFF"
+        self.mode = "OFF"
+
+    @property
+    def state(self) -> dict:
+        return {"power": self.power, "mode": self.mode}
 
     def set_mode(self, mode):
-        self.state["mode"] = mode
+        self._set_state("mode", mode)
+
 
+class TV(Stateful):
+    __slots__ = ("name", "type", "room", "ip_address", "port", "power", "volume", "muted", "current_app",
+                 "device_id", "_transport", "commands", "breaker", "strategy_stats", "timing")
+    FIELDS = {"power": str, "volume": int, "muted": _flag, "current_app": str}
 
-class TV:
     def __init__(self, name, room, ip_address, port=5555):
         self.name = name
+        self.type = "tv"
         self.room = room
         self.ip_address = ip_address
         self.port = port
-        self.state = {
-            "power": "off",
-            "volume": 50,
-            "muted": False,
-            "current_app": "home"
-        }
-        self._initialize_connection()
+        self.power = "off"
+        self.volume = 50
+        self.muted = False
+        self.current_app = "home"
+        self._init_state()
+        # Stable identity (ro.serialno) used to find the TV again after its IP
+        # changes; learned on first contact (see discovery.py)
+        self.device_id = None
+        # Connected lazily by the first command (see adb.ConnectionState)
+        self._transport = open_transport(f"{ip_address}:{port}")
+        # Keeps concurrent tool calls from interleaving keyevents on this TV
+        self.commands = CommandQueue(f"{room}/{name}")
+        # Opens after repeated ADB failures so commands fail fast (see health.py)
+        self.breaker = CircuitBreaker()
+        # (app, "play"/"search", strategy) -> app_drivers.StrategyStats
+        self.strategy_stats = {}
+        # Measured launch latencies, used to size waits (see timing.py)
+        self.timing = TimingProfile()
     
-    def _initialize_connection(self):
-        """Initialize ADB connection to TV"""
+    @property
+    def state(self) -> dict:
+        return {"power": self.power, "volume": self.volume, "muted": self.muted, "current_app": self.current_app}
+
+    async def connect(self) -> str:
+        """Connect the ADB server to this TV; returns the server's message"""
         try:
-            connect_cmd = f"adb connect {self.ip_address}:{self.port}"
-            subprocess.run(connect_cmd, shell=True, capture_output=True, timeout=10)
+            return await self._transport.connect()
         except Exception as e:
             print(f"Failed to initialize TV connection: {e}")
+            return f"failed: {e}"
     
-    def _send_adb_command(self, command: str) -> bool:
-        """Helper method to send ADB commands to TV"""
+    async def _run(self, command: str, timeout: float):
+        """Run a shell command through the circuit breaker; returns (returncode, output)"""
+        if not self.breaker.allow():
+            raise TVUnavailableError(f"TV {self.name} is unreachable: {self.breaker.describe()}")
         try:
-            connect_cmd = f"adb connect {self.ip_address}:{self.port}"
-            subprocess.run(connect_cmd, shell=True, capture_output=True, timeout=5)
-            
-            full_command = f"adb -s {self.ip_address}:{self.port} shell {command}"
-            result = subprocess.run(full_command, shell=True, capture_output=True, text=True, timeout=15)
+            result = await self._transport.run(command, timeout=timeout)
+        except Exception as e:
+            self.breaker.record_failure(e)
+            raise
+        except BaseException:
+            # Cancelled (e.g. cancel_tv_job): says nothing about the TV, but a
+            # half-open trial must not leave the breaker half open for good
+            self.breaker.abandon_trial()
+            raise
+        self.breaker.record_success()
+        return result
+    
+    async def _adb_output(self, command: str, timeout: float = 15):
+        """Run an ADB shell command; return its output, or None if it failed"""
+        try:
+            returncode, output = await self._run(command, timeout=timeout)
             
-            if result.returncode == 0:
-                return True
+            if returncode == 0:
+                return output
             else:
-                print(f"ADB command failed: {result.stderr}")
-                return False
+                print(f"ADB command failed: {output}")
+                return None
                 
-        except subprocess.TimeoutExpired:
+        except TVUnavailableError as e:
+            print(e)
+            return None
+        except TimeoutError:
             print("ADB command timed out")
-            return False
+            return None
         except Exception as e:
             print(f"ADB command error: {e}")
-            return False
+            return None
     
-    def check_connection(self) -> bool:
-        """Check if TV is connected and responsive"""
+    async def _send_adb_command(self, command: str, timeout: float = 15) -> bool:
+        """Helper method to send ADB commands to TV"""
+        return await self._adb_output(command, timeout=timeout) is not None
+    
+    async def wait_until(self, test: str, timeout: float, interval: float = 0.25) -> bool:
+        """Poll a shell test on the TV (in one round trip) until it passes or timeout expires"""
+        returncode = None
         try:
-            return self._send_adb_command("echo 'test'")
+            returncode, _ = await self._run(_wait_command(test, timeout, interval), timeout=timeout + 15)
+        except Exception as e:
+            print(f"ADB wait error: {e}")
+        return returncode == 0
+    
+    @_queued(MACRO)
+    async def launch_app(self, package: str, fallback_activity: str = None, timeout: float = APP_LAUNCH_TIMEOUT) -> bool:
+        """Start an app and return once it is in the foreground (or the wait budget expires)"""
+        start = time.monotonic()
+        # am start -W returns only after the launcher activity has drawn its first frame
+        launch = (
+            "am start -W $(cmd package resolve-activity --brief "
+            f"-c android.intent.category.LEANBACK_LAUNCHER {package} | tail -n 1)"
+        )
+        output = await self._adb_output(launch, timeout=timeout + 5)
+        if output is None or "Status: ok" not in output:
+            started = await self._send_adb_command(f"monkey -p {package} 1")
+            if not started and fallback_activity:
+                started = await self._send_adb_command(f"am start -n {package}/{fallback_activity}")
+            if not started:
+                return False
+        await self._wait_for_foreground(package, start, output, timeout)
+        return True
+    
+    async def _wait_for_foreground(self, package: str, start: float, output: str, timeout: float):
+        """
+        Wait until package has focus, for at most this TV's learned budget,
+        and record the launch and focus times (see timing.TimingProfile).
+        """
+        launched = _launch_seconds(output)
+        if launched is not None:
+            self.timing.record(f"launch:{package}", launched)
+        budget = min(timeout, self.timing.budget(f"focus:{package}", timeout))
+        if not await self.wait_until(_app_focused(package), budget):
+            print(f"{package} did not reach the foreground within {budget:.1f}s")
+            return
+        focused = time.monotonic() - start
+        self.timing.record(f"focus:{package}", focused)
+        if launched is None:
+            self.timing.record(f"launch:{package}", focused)
+    
+    async def check_connection(self) -> bool:
+        """Check if TV is connected and responsive (answered from cache within its TTL)"""
+        if self.breaker.is_open():
+            return False
+        cached = self._transport.state.cached()
+        if cached is not None:
+            return cached == ConnectionState.CONNECTED
+        try:
+            return await self._send_adb_command("echo 'test'")
         except:
             return False
     
-    def turn_on(self):
+    async def probe(self, timeout: float = 5):
+        """
+        Round-trip a no-op command, bypassing the connection cache and the
+        circuit breaker (for health checks); a success closes the breaker.
+        Returns None when the TV is busy: the probe would only wait behind a
+        running command, which says nothing about the TV being reachable.
+        """
+        if self._transport.busy():
+            return None
+        try:
+            returncode, _ = await asyncio.wait_for(self._transport.run("echo ok", timeout=timeout), timeout + 1)
+        except AdbBusyError:
+            # A command took the session first and is still running
+            return None
+        except Exception as e:
+            self.breaker.record_failure(e)
+            self._transport.state.mark_offline()
+            return False
+        self.breaker.record_success()
+        return returncode == 0
+    
+    def connection_info(self) -> dict:
+        """Cached connection state and connect counters for this TV"""
+        return self._transport.state.snapshot()
+    
+    @_queued(INTERACTIVE)
+    async def turn_on(self):
         """Turn on TV"""
-        success = self._send_adb_command("input keyevent KEYCODE_POWER")
+        success = await self._send_adb_command("input keyevent KEYCODE_POWER")
         if success:
-            self.state["power"] = "on"
+            self._set_state("power", "on")
         return success
     
-    def turn_off(self):
+    @_queued(INTERACTIVE)
+    async def turn_off(self):
         """Turn off TV"""  
-        success = self._send_adb_command("input keyevent KEYCODE_POWER")
+        success = await self._send_adb_command("input keyevent KEYCODE_POWER")
         if success:
-            self.state["power"] = "off"
+            self._set_state("power", "off")
         return success
     
-    def volume_up(self) -> bool:
+    @_queued(INTERACTIVE)
+    async def volume_up(self) -> bool:
         """Increase volume"""
-        success = self._send_adb_command("input keyevent KEYCODE_VOLUME_UP")
+        success = await self._send_adb_command("input keyevent KEYCODE_VOLUME_UP")
         if success:
-            self.state["volume"] = min(100, self.state["volume"] + 5)
+            self._set_state("volume", min(100, self.volume + 5))
         return success
     
-    def volume_down(self) -> bool:
+    @_queued(INTERACTIVE)
+    async def volume_down(self) -> bool:
         """Decrease volume"""
-        success = self._send_adb_command("input keyevent KEYCODE_VOLUME_DOWN") 
+        success = await self._send_adb_command("input keyevent KEYCODE_VOLUME_DOWN") 
         if success:
-            self.state["volume"] = max(0, self.state["volume"] - 5)
+            self._set_state("volume", max(0, self.volume - 5))
         return success
     
-    def mute(self) -> bool:
+    @_queued(INTERACTIVE)
+    async def mute(self) -> bool:
         """Toggle mute"""
-        success = self._send_adb_command("input keyevent KEYCODE_VOLUME_MUTE")
+        success = await self._send_adb_command("input keyevent KEYCODE_VOLUME_MUTE")
         if success:
-            self.state["muted"] = not self.state["muted"]
+            self._set_state("muted", not self.muted)
         return success
     
-    def home(self) -> bool:
+    @_queued(INTERACTIVE)
+    async def home(self) -> bool:
         """Go to home screen"""
-        success = self._send_adb_command("input keyevent KEYCODE_HOME")
+        success = await self._send_adb_command("input keyevent KEYCODE_HOME")
         if success:
-            self.state["current_app"] = "home"
+            self._set_state("current_app", "home")
         return success
     
-    def back(self) -> bool:
+    @_queued(INTERACTIVE)
+    async def back(self) -> bool:
         """Go back"""
-        return self._send_adb_command("input keyevent KEYCODE_BACK")
+        return await self._send_adb_command("input keyevent KEYCODE_BACK")
     
-    def open_netflix(self) -> bool:
-        """Open Netflix app"""
-        success = self._send_adb_command("monkey -p com.netflix.ninja 1")
-        if not success:
-            success = self._send_adb_command("am start -n com.netflix.ninja/.MainActivity")
+    @_queued(MACRO)
+    async def open_app(self, app: str) -> bool:
+        """Open a registered app (see app_drivers) and wait for it to reach the foreground"""
+        driver = get_driver(app)
+        if driver is None:
+            return False
+        success = await self.launch_app(driver.package, fallback_activity=driver.fallback_activity)
         
         if success:
-            self.state["current_app"] = "netflix"
-            time.sleep(3) 
+            self._set_state("current_app", driver.name)
         return success
     
-    def open_youtube(self) -> bool:
-        """Open YouTube app"""
-        success = self._send_adb_command("monkey -p com.google.android.youtube.tv 1")
-        if not success:
-            # Alternative method
-            success = self._send_adb_command("am start -n com.google.android.youtube.tv/.MainActivity")
-        
-        if success:
-            self.state["current_app"] = "youtube" 
-            time.sleep(3) 
-        return success
+    async def open_netflix(self) -> bool:
+        """Open Netflix app and wait for it to reach the foreground"""
+        return await self.open_app("netflix")
     
-    def search_and_play(self, query: str, app: str = "netflix") -> bool:
-        """Search for and play content on streaming apps"""
-        try:
-            print(f"Searching for '{query}' on {app}...")
-            
-            if app == "netflix":
-                if not self.open_netflix():
-                    print("Failed to open Netflix")
-                    return False
-                time.sleep(4)  
-            elif app == "youtube":
-                if not self.open_youtube():
-                    print("Failed to open YouTube") 
-                    return False
-                time.sleep(4)
-            
-            search_success = False
-            
-            if self._send_adb_command("input keyevent KEYCODE_SEARCH"):
-                search_success = True
-                time.sleep(2)
-            
-            if not search_success and app == "netflix":
-                self._send_adb_command("input keyevent KEYCODE_DPAD_UP")
-                time.sleep(1)
-                self._send_adb_command("input keyevent KEYCODE_DPAD_UP") 
-                time.sleep(1)
-                self._send_adb_command("input keyevent KEYCODE_ENTER")
-                time.sleep(2)
-                search_success = True
-            
-            if search_success:
-                if self.send_text(query):
-                    time.sleep(2)
-                    self._send_adb_command("input keyevent KEYCODE_ENTER")
-                    time.sleep(3)
-                    self._send_adb_command("input keyevent KEYCODE_ENTER")
-                    print(f"Successfully initiated search and play for '{query}'")
-                    return True
-                else:
-                    print("Failed to send search text")
-            else:
-                print("Failed to open search interface")
-                
+    async def open_youtube(self) -> bool:
+        """Open YouTube app and wait for it to reach the foreground"""
+        return await self.open_app("youtube")
+    
+    @_queued(MACRO)
+    async def open_uri(self, app: str, uri: str) -> bool:
+        """Start app on a VIEW intent for uri and wait until it is in the foreground"""
+        driver = get_driver(app)
+        if driver is None:
             return False
-            
-        except Exception as e:
-            print(f"Error in search_and_play: {e}")
+        start = time.monotonic()
+        output = await self._adb_output(_view_command(uri, driver.package), timeout=APP_LAUNCH_TIMEOUT + 5)
+        if output is None or "Status: ok" not in output:
             return False
+        await self._wait_for_foreground(driver.package, start, output, APP_LAUNCH_TIMEOUT)
+        self._set_state("current_app", driver.name)
+        return True
     
-    def search_content(self, query: str, app: str = "netflix") -> bool:
-        """Search for content without automatically playing"""
-        try:
-            if app == "netflix":
-                if not self.open_netflix():
-                    return False
-                time.sleep(4)
-            elif app == "youtube":
-                if not self.open_youtube():
-                    return False 
-                time.sleep(4)
-            
-            if self._send_adb_command("input keyevent KEYCODE_SEARCH"):
-                time.sleep(2)
-                if self.send_text(query):
-                    time.sleep(2)
-                    self._send_adb_command("input keyevent KEYCODE_ENTER")
-                    return True
+    async def play_content_uri(self, app: str, uri: str) -> bool:
+        """Play a title directly from a content URI (see current_content_uri)"""
+        return await self.open_uri(app, uri)
+    
+    async def current_content_uri(self, app: str):
+        """URI of the title app is playing, if the TV exposes one we can reopen"""
+        driver = get_driver(app)
+        if driver is None or driver.content_uri_pattern is None:
+            return None
+        output = await self._adb_output(CURRENT_INTENT_DATA, timeout=10)
+        if not output:
+            return None
+        uri = output.strip()[len("dat="):]
+        return uri if driver.content_uri_pattern.match(uri) else None
+    
+    @_queued(MACRO)
+    async def search_and_play(self, query: str, app: str = "netflix", strategy: str = None) -> bool:
+        """
+        Search for and play content on a streaming app. The app's driver tries
+        its strategies (deep link, search key, menu navigation, ...) best
+        first for this TV; strategy forces a single one.
+        """
+        driver = get_driver(app)
+        if driver is None:
+            print(f"No driver for app '{app}'. Available: {list(DRIVERS)}")
             return False
-        except Exception as e:
-            print(f"Error in search_content: {e}")
+        print(f"Searching for '{query}' on {app}...")
+        if await driver.run(self, query, play=True, only=strategy):
+            print(f"Successfully initiated search and play for '{query}'")
+            return True
+        print("Failed to search and play")
+        return False
+    
+    @_queued(MACRO)
+    async def search_content(self, query: str, app: str = "netflix", strategy: str = None) -> bool:
+        """Search for content without automatically playing"""
+        driver = get_driver(app)
+        if driver is None:
+            print(f"No driver for app '{app}'. Available: {list(DRIVERS)}")
             return False
+        return await driver.run(self, query, play=False, only=strategy)
     
-    def send_text(self, text: str) -> bool:
+    async def open_youtube_and_search(self, query: str) -> bool:
+        """Open YouTube on the search results for query"""
+        return await self.search_content(query, "youtube")
+    
+    def strategy_info(self) -> dict:
+        """Measured attempts, success and latency of each app strategy on this TV"""
+        return {
+            f"{app}/{flow}/{strategy}": stats.snapshot()
+            for (app, flow, strategy), stats in sorted(self.strategy_stats.items())
+        }
+    
+    @_queued(MACRO)
+    async def send_text(self, text: str) -> bool:
         """Send text to TV input field"""
         try:
-            cleaned_text = text.replace(" ", "%s")
-            cleaned_text = re.sub(r'[^\w%s]', '', cleaned_text)
-            
-            success = self._send_adb_command(f"input text '{cleaned_text}'")
+            success = await self._send_adb_command(_text_command(text))
             if success:
                 print(f"Successfully sent text: '{text}'")
             else:
@@ -266,263 +570,79 @@ class TV:
             print(f"Error sending text: {e}")
             return False
     
-    def press_key(self, key: str) -> bool:
+    @_queued(MACRO)
+    async def send_key_sequence(self, steps) -> bool:
+        """
+        Send a sequence of keys, text and pauses in a single ADB round trip.
+        Steps are key names ("up") or KEYCODE_* constants, numbers (seconds to
+        pause on the TV), ("text", value) tuples and ("until", shell_test,
+        max_seconds) tuples, which pause until the test passes. Consecutive
+        keys share one `input keyevent` invocation; the chain stops at the
+        first failure.
+        """
+        commands = []
+        keys = []
+        pause_total = 0
+        for step in steps:
+            if isinstance(step, (int, float, tuple)) and keys:
+                commands.append("input keyevent " + " ".join(keys))
+                keys = []
+            if isinstance(step, (int, float)):
+                commands.append(f"sleep {step}")
+                pause_total += step
+            elif isinstance(step, tuple) and step[0] == "until":
+                # Wait at most step[2] seconds, continuing as soon as the test passes
+                _, test, max_wait = step
+                commands.append(f"{{ {_wait_command(test, max_wait)} || true; }}")
+                pause_total += max_wait
+            elif isinstance(step, tuple):
+                commands.append(_text_command(step[1]))
+            else:
+                keys.append(_keycode(step))
+        if keys:
+            commands.append("input keyevent " + " ".join(keys))
+        if not commands:
+            return True
+        return await self._send_adb_command(" && ".join(commands), timeout=15 + pause_total)
+    
+    @_queued(INTERACTIVE)
+    async def press_key(self, key: str) -> bool:
         """Press specific keys on TV remote"""
-        key_codes = {
-            "enter": "KEYCODE_ENTER",
-            "back": "KEYCODE_BACK",
-            "home": "KEYCODE_HOME", 
-            "up": "KEYCODE_DPAD_UP",
-            "down": "KEYCODE_DPAD_DOWN",
-            "left": "KEYCODE_DPAD_LEFT", 
-            "right": "KEYCODE_DPAD_RIGHT",
-            "menu": "KEYCODE_MENU",
-            "play": "KEYCODE_MEDIA_PLAY",
-            "pause": "KEYCODE_MEDIA_PAUSE",
-            "search": "KEYCODE_SEARCH",
-            "ok": "KEYCODE_ENTER",
-            "select": "KEYCODE_ENTER"
-        }
-        
-        if key.lower() in key_codes:
-            return self._send_adb_command(f"input keyevent {key_codes[key.lower()]}")
+        if key.lower() in KEY_CODES:
+            return await self._send_adb_command(f"input keyevent {KEY_CODES[key.lower()]}")
         else:
-            print(f"Unknown key: {key}. Available keys: {list(key_codes.keys())}")
+            print(f"Unknown key: {key}. Available keys: {list(KEY_CODES.keys())}")
             return False
     
     def update_connection_settings(self, ip_address: str, port: int):
         """Update IP and port for existing TV connection"""
         self.ip_address = ip_address
         self.port = port
-        self._initialize_connection()
+        self.version += 1
+        self.breaker.reset()
+        self._transport.close()
+        self._transport = open_transport(f"{ip_address}:{port}")
+    
+    def breaker_info(self) -> dict:
+        """State and counters of this TV's circuit breaker"""
+        return self.breaker.snapshot()
+    
+    def queue_info(self) -> dict:
+        """Depth and wait-time metrics of this TV's command queue"""
+        return self.commands.metrics()
+    
+    def close(self):
+        """Stop the command queue and release the TV's ADB transport"""
+        self.commands.close()
+        self._transport.close()
     
     def to_dict(self):
         """Convert TV state to dictionary"""
         return {
             "name": self.name,
             "room": self.room,
-            "type": "tv",
+            "type": self.type,
             "ip_address": self.ip_address,
             "port": self.port,
             "state": self.state
         }
-    
-
-def search_and_play(self, query: str, app: str = "netflix") -> bool:
-    """Search for and play content on streaming apps"""
-    try:
-        print(f"Searching for '{query}' on {app}...")
-        
-        if app == "netflix":
-            if not self.open_netflix():
-                print("Failed to open Netflix")
-                return False
-            time.sleep(4)  
-            return self._netflix_search_and_play(query)
-            
-        elif app == "youtube":
-            if not self.open_youtube():
-                print("Failed to open YouTube") 
-                return False
-            time.sleep(4)
-            return self._youtube_search_and_play(query)
-            
-        return False
-        
-    except Exception as e:
-        print(f"Error in search_and_play: {e}")
-        return False
-
-def search_content(self, query: str, app: str = "netflix") -> bool:
-    """Search for content without automatically playing"""
-    try:
-        if app == "netflix":
-            if not self.open_netflix():
-                return False
-            time.sleep(4)
-            return self._netflix_search_only(query)
-            
-        elif app == "youtube":
-            if not self.open_youtube():
-                return False 
-            time.sleep(4)
-            return self._youtube_search_only(query)
-            
-        return False
-    except Exception as e:
-        print(f"Error in search_content: {e}")
-        return False
-
-def _netflix_search_and_play(self, query: str) -> bool:
-    """Netflix-specific search and play"""
-    try:
-        search_success = False
-        if self._send_adb_command("input keyevent KEYCODE_SEARCH"):
-            search_success = True
-            time.sleep(2)
-        
-        if not search_success:
-            for _ in range(3): 
-                self._send_adb_command("input keyevent KEYCODE_DPAD_UP")
-                time.sleep(0.5)
-            
-            self._send_adb_command("input keyevent KEYCODE_ENTER")
-            time.sleep(2)
-            search_success = True
-        
-        if search_success:
-            if self.send_text(query):
-                time.sleep(2)
-                self._send_adb_command("input keyevent KEYCODE_ENTER")
-                time.sleep(3)
-                self._send_adb_command("input keyevent KEYCODE_ENTER")
-                return True
-        
-        return False
-    except Exception as e:
-        print(f"Netflix search error: {e}")
-        return False
-
-def _netflix_search_only(self, query: str) -> bool:
-    """Netflix-specific search without auto-play"""
-    try:
-        if self._send_adb_command("input keyevent KEYCODE_SEARCH"):
-            time.sleep(2)
-            if self.send_text(query):
-                time.sleep(2)
-                self._send_adb_command("input keyevent KEYCODE_ENTER")
-                return True
-        return False
-    except Exception as e:
-        print(f"Netflix search error: {e}")
-        return False
-
-def _youtube_search_and_play(self, query: str) -> bool:
-    """YouTube TV-specific search and play method"""
-    try:
-        # Method 1
-        print("Navigating to YouTube search...")
-        
-        self._send_adb_command("input keyevent KEYCODE_HOME")
-        time.sleep(1)
-        
-        for _ in range(3):
-            self._send_adb_command("input keyevent KEYCODE_DPAD_LEFT")
-            time.sleep(0.5)
-        
-        for _ in range(2):
-            self._send_adb_command("input keyevent KEYCODE_DPAD_UP") 
-            time.sleep(0.5)
-        
-        self._send_adb_command("input keyevent KEYCODE_ENTER")
-        time.sleep(3)
-        
-        success = False
-        
-        # Method 2
-        if self.send_text(query):
-            time.sleep(2)
-            self._send_adb_command("input keyevent KEYCODE_ENTER")
-            time.sleep(3)
-            self._send_adb_command("input keyevent KEYCODE_ENTER")
-            success = True
-        
-        # Method 3
-        if not success:
-            print("Attempting voice search method...")
-            self._send_adb_command("input keyevent KEYCODE_SEARCH")
-            time.sleep(1)
-            self._send_adb_command("input keyevent KEYCODE_BACK")
-            time.sleep(1)
-            
-            for _ in range(5):
-                self._send_adb_command("input keyevent KEYCODE_DPAD_DOWN")
-                time.sleep(0.3)
-            
-            self._send_adb_command("input keyevent KEYCODE_ENTER")
-            success = True
-        
-        return success
-        
-    except Exception as e:
-        print(f"YouTube search error: {e}")
-        return False
-
-def _youtube_search_only(self, query: str) -> bool:
-    """YouTube TV-specific search without auto-play"""
-    try:
-        for _ in range(3):
-            self._send_adb_command("input keyevent KEYCODE_DPAD_LEFT")
-            time.sleep(0.5)
-        
-        for _ in range(2):
-            self._send_adb_command("input keyevent KEYCODE_DPAD_UP")
-            time.sleep(0.5)
-        
-        self._send_adb_command("input keyevent KEYCODE_ENTER")
-        time.sleep(2)
-        
-        if self.send_text(query):
-            time.sleep(2)
-            self._send_adb_command("input keyevent KEYCODE_ENTER")
-            return True
-            
-        return False
-    except Exception as e:
-        print(f"YouTube search error: {e}")
-        return False
-
-def open_youtube_and_search(self, query: str) -> bool:
-    """Open YouTube and search for content with multiple fallback methods"""
-    try:
-        print(f"Opening YouTube and searching for: {query}")
-        
-        if not self.open_youtube():
-            return False
-        time.sleep(5)  
-        # Method 1
-        success = self._youtube_navigate_to_search(query)
-        if success:
-            return True
-        
-        # Method 2
-        youtube_search_intent = f'am start -a android.intent.action.SEARCH -e query "{query}" com.google.android.youtube.tv'
-        if self._send_adb_command(youtube_search_intent):
-            time.sleep(3)
-            return True
-        
-        # Fallback
-        print("Automatic search failed. YouTube is open for manual search.")
-        return False
-        
-    except Exception as e:
-        print(f"YouTube open and search error: {e}")
-        return False
-
-def _youtube_navigate_to_search(self, query: str) -> bool:
-    """Navigate to YouTube search interface"""
-    try:        
-        self._send_adb_command("input keyevent KEYCODE_DPAD_LEFT")
-        time.sleep(1)
-        self._send_adb_command("input keyevent KEYCODE_DPAD_LEFT") 
-        time.sleep(1)
-        
-        for i in range(4):
-            self._send_adb_command("input keyevent KEYCODE_DPAD_UP")
-            time.sleep(0.5)
-        
-        self._send_adb_command("input keyevent KEYCODE_ENTER")
-        time.sleep(2)
-        
-        if self.send_text(query):
-            time.sleep(2)
-            self._send_adb_command("input keyevent KEYCODE_ENTER")
-            time.sleep(2)
-            self._send_adb_command("input keyevent KEYCODE_ENTER")
-            return True
-        
-        return False
-        
-    except Exception as e:
-        print(f"YouTube navigation error: {e}")
-        return False
\ No newline at end of file
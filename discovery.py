@@ -0,0 +1,151 @@
+# discovery.py
+import os
+import time
+import asyncio
+import ipaddress
+from adb import default_async_client
+
+# Subnets to sweep for TVs ("192.168.1.0/24,10.0.0.0/24"); when unset, the
+# /24 around each configured TV address is scanned
+DISCOVERY_SUBNETS = [s.strip() for s in os.environ.get("TV_DISCOVERY_SUBNETS", "").split(",") if s.strip()]
+DISCOVERY_PORT = int(os.environ.get("TV_DISCOVERY_PORT", "5555"))
+DISCOVERY_CONCURRENCY = int(os.environ.get("TV_DISCOVERY_CONCURRENCY", "128"))
+DISCOVERY_CONNECT_TIMEOUT = float(os.environ.get("TV_DISCOVERY_CONNECT_TIMEOUT", "0.3"))
+
+# One round trip; a device's serial is its stable identity across IP changes
+IDENTITY_COMMAND = "getprop ro.serialno; getprop ro.product.manufacturer; getprop ro.product.model"
+
+# Identities of scanned addresses are reused for this long (DHCP may hand the
+# address to a different device eventually)
+IDENTITY_TTL = 600
+
+
+def subnets_for(addresses, configured=None) -> list:
+    """Networks to sweep: the configured ones, else the /24 around each address"""
+    if configured:
+        return [ipaddress.ip_network(subnet, strict=False) for subnet in configured]
+    networks = []
+    for address in addresses:
+        try:
+            network = ipaddress.ip_network(f"{address}/24", strict=False)
+        except ValueError:
+            continue
+        if network not in networks:
+            networks.append(network)
+    return networks
+
+
+async def port_open(host: str, port: int, timeout: float) -> bool:
+    """True if a TCP connection to host:port succeeds within timeout"""
+    try:
+        _, writer = await asyncio.wait_for(asyncio.open_connection(host, port), timeout)
+    except (OSError, asyncio.TimeoutError):
+        return False
+    writer.close()
+    return True
+
+
+async def scan(networks, port: int = DISCOVERY_PORT, concurrency: int = DISCOVERY_CONCURRENCY,
+               timeout: float = DISCOVERY_CONNECT_TIMEOUT) -> list:
+    """Hosts in networks with port open, probing at most concurrency hosts at once"""
+    semaphore = asyncio.Semaphore(concurrency)
+    hosts = list(dict.fromkeys(str(host) for network in networks for host in network.hosts()))
+
+    async def check(host):
+        async with semaphore:
+            return host if await port_open(host, port, timeout) else None
+
+    results = await asyncio.gather(*(check(host) for host in hosts))
+    return [host for host in results if host]
+
+
+def parse_identity(output: str):
+    """{"device_id", "manufacturer", "model"} from IDENTITY_COMMAND output, or None"""
+    lines = [line.strip() for line in output.splitlines()] + ["", "", ""]
+    serialno, manufacturer, model = lines[:3]
+    if not serialno:
+        return None
+    return {"device_id": serialno, "manufacturer": manufacturer, "model": model}
+
+
+class TVDiscovery:
+    """
+    Finds TVs that moved to a new address by sweeping the LAN for open ADB
+    ports and matching each answer's serial against the TVs' saved device_id.
+    """
+
+    def __init__(self, client=None, port: int = DISCOVERY_PORT, subnets=None,
+                 concurrency: int = DISCOVERY_CONCURRENCY, timeout: float = DISCOVERY_CONNECT_TIMEOUT):
+        self.client = client or default_async_client
+        self.port = port
+        self.subnets = subnets if subnets is not None else DISCOVERY_SUBNETS
+        self.concurrency = concurrency
+        self.timeout = timeout
+        self._identities = {}
+        self.scans = 0
+        self.last_scan = None
+        self.last_duration = None
+        self.last_found = []
+
+    async def identify(self, serial: str, refresh: bool = False):
+        """Identity of the device at serial ("ip:port"), cached for IDENTITY_TTL"""
+        cached = self._identities.get(serial)
+        if cached is not None and not refresh and time.monotonic() - cached[0] < IDENTITY_TTL:
+            return cached[1]
+        try:
+            # A failed connect surfaces as an error from the shell request
+            await self.client.connect_device(serial)
+            returncode, output = await self.client.shell(serial, IDENTITY_COMMAND, timeout=5)
+        except Exception as e:
+            print(f"Could not identify {serial}: {e}")
+            return None
+        identity = parse_identity(output) if returncode == 0 else None
+        if identity is not None:
+            self._identities[serial] = (time.monotonic(), identity)
+        return identity
+
+    async def discover(self, addresses) -> dict:
+        """Sweep the subnets; returns {device_id: (host, identity)} for every ADB device found"""
+        start = time.monotonic()
+        networks = subnets_for(addresses, self.subnets)
+        hosts = await scan(networks, self.port, self.concurrency, self.timeout)
+        identities = await asyncio.gather(*(self.identify(f"{host}:{self.port}") for host in hosts))
+        found = {
+            identity["device_id"]: (host, identity)
+            for host, identity in zip(hosts, identities)
+            if identity is not None
+        }
+        self.scans += 1
+        self.last_scan = time.time()
+        self.last_duration = time.monotonic() - start
+        self.last_found = sorted(f"{host}:{self.port}" for host in hosts)
+        return found
+
+    async def rediscover(self, tvs) -> list:
+        """
+        Point TVs whose device_id answers at a different address to that
+        address. Returns [(tv, old_address, new_address)] for every move.
+        """
+        tvs = [tv for tv in tvs if tv.device_id]
+        if not tvs:
+            return []
+        found = await self.discover(tv.ip_address for tv in tvs)
+        moves = []
+        for tv in tvs:
+            match = found.get(tv.device_id)
+            if match is None:
+                continue
+            host = match[0]
+            if (host, self.port) != (tv.ip_address, tv.port):
+                old = f"{tv.ip_address}:{tv.port}"
+                tv.update_connection_settings(host, self.port)
+                moves.append((tv, old, f"{host}:{self.port}"))
+        return moves
+
+    def info(self) -> dict:
+        return {
+            "scans": self.scans,
+            "last_scan": time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(self.last_scan)) if self.last_scan else None,
+            "last_duration_ms": round(self.last_duration * 1000, 1) if self.last_duration is not None else None,
+            "adb_devices_found": self.last_found,
+        }
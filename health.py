@@ -0,0 +1,249 @@
+# health.py
+import os
+import time
+import asyncio
+
+# Probe interval bounds: a TV is re-probed at the minimum interval after a
+# failure, and the interval doubles with each success up to the maximum
+HEALTH_MIN_INTERVAL = float(os.environ.get("TV_HEALTH_MIN_INTERVAL", "5"))
+HEALTH_MAX_INTERVAL = float(os.environ.get("TV_HEALTH_MAX_INTERVAL", "60"))
+HEALTH_PROBE_TIMEOUT = float(os.environ.get("TV_HEALTH_PROBE_TIMEOUT", "5"))
+
+# Consecutive ADB failures that open a TV's circuit breaker, and how long it
+# stays open before one trial command is let through
+BREAKER_FAILURES = int(os.environ.get("TV_BREAKER_FAILURES", "3"))
+BREAKER_RESET_SECONDS = float(os.environ.get("TV_BREAKER_RESET_SECONDS", "30"))
+
+
+def _format_time(timestamp):
+    if timestamp is None:
+        return None
+    return time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(timestamp))
+
+
+class CircuitBreaker:
+    """
+    Fails a TV's commands fast once it has stopped answering.
+
+    After failure_threshold consecutive failures the breaker opens and allow()
+    returns False without touching the network. Background health probes close
+    it again on the first success; without them, a single trial command is let
+    through (half-open) once reset_timeout has passed.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, failure_threshold: int = BREAKER_FAILURES, reset_timeout: float = BREAKER_RESET_SECONDS):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = None
+        self.last_error = None
+        self.trips = 0
+        self.rejected = 0
+
+    def allow(self) -> bool:
+        """Whether a command may be sent now"""
+        if self.state == self.CLOSED:
+            return True
+        if self.state == self.OPEN and time.monotonic() - self.opened_at >= self.reset_timeout:
+            self.state = self.HALF_OPEN
+            return True
+        self.rejected += 1
+        return False
+
+    def is_open(self) -> bool:
+        """True while commands are being rejected (does not start a trial)"""
+        if self.state == self.OPEN:
+            return time.monotonic() - self.opened_at < self.reset_timeout
+        return self.state == self.HALF_OPEN
+
+    def record_success(self):
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = None
+
+    def record_failure(self, error=None):
+        self.failures += 1
+        if error is not None:
+            self.last_error = str(error) or type(error).__name__
+        if self.state == self.HALF_OPEN or (self.state == self.CLOSED and self.failures >= self.failure_threshold):
+            self.state = self.OPEN
+            self.opened_at = time.monotonic()
+            self.trips += 1
+
+    def abandon_trial(self):
+        """The half-open trial command was cancelled: stay open and wait for the next trial"""
+        if self.state == self.HALF_OPEN:
+            self.state = self.OPEN
+            self.opened_at = time.monotonic()
+
+    def reset(self):
+        self.record_success()
+        self.last_error = None
+
+    def describe(self) -> str:
+        message = f"circuit open after {self.failures} consecutive failures"
+        if self.last_error:
+            message += f" (last error: {self.last_error})"
+        return message
+
+    def snapshot(self) -> dict:
+        retry_in = None
+        if self.state == self.OPEN:
+            retry_in = round(max(0.0, self.opened_at + self.reset_timeout - time.monotonic()), 1)
+        return {
+            "state": self.state,
+            "consecutive_failures": self.failures,
+            "trips": self.trips,
+            "rejected": self.rejected,
+            "retry_in": retry_in,
+            "last_error": self.last_error,
+        }
+
+
+class TVHealth:
+    """Result of the latest probes of one TV"""
+
+    UNKNOWN = "unknown"
+    ONLINE = "online"
+    OFFLINE = "offline"
+
+    def __init__(self, interval: float):
+        self.status = self.UNKNOWN
+        self.last_seen = None
+        self.last_probe = None
+        self.latency = None
+        self.failures = 0
+        self.probes = 0
+        self.busy = 0
+        self.interval = interval
+        self.next_probe = 0.0
+
+    def snapshot(self) -> dict:
+        now = time.time()
+        return {
+            "status": self.status,
+            "last_seen": _format_time(self.last_seen),
+            "seconds_since_seen": round(now - self.last_seen, 1) if self.last_seen else None,
+            "last_probe": _format_time(self.last_probe),
+            "latency_ms": round(self.latency * 1000, 1) if self.latency is not None else None,
+            "consecutive_failures": self.failures,
+            "skipped_busy": self.busy,
+            "probe_interval": self.interval,
+        }
+
+
+class HealthMonitor:
+    """
+    Probes every TV in the background so read-only tools can answer from cache.
+
+    devices_fn returns the TVs to watch. Due TVs are probed concurrently, each
+    bounded by probe_timeout, so an unreachable TV never delays the others.
+    """
+
+    def __init__(self, devices_fn, min_interval: float = HEALTH_MIN_INTERVAL,
+                 max_interval: float = HEALTH_MAX_INTERVAL, probe_timeout: float = HEALTH_PROBE_TIMEOUT):
+        self.devices_fn = devices_fn
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.probe_timeout = probe_timeout
+        self._health = {}
+        self._wake = None
+        self._task = None
+
+    def status(self, device):
+        """Latest TVHealth for device, or None if it has not been probed yet"""
+        health = self._health.get(device)
+        if health is None or health.status == TVHealth.UNKNOWN:
+            return None
+        return health
+
+    def forget(self, device):
+        """Drop cached results (e.g. after the TV's address changed) and re-probe soon"""
+        self._health.pop(device, None)
+        self.wake()
+
+    def wake(self):
+        """Probe due TVs now instead of at the end of the current wait"""
+        if self._wake is not None:
+            self._wake.set()
+
+    async def probe(self, device) -> TVHealth:
+        """Probe one TV now and update its cached health"""
+        health = self._health.get(device)
+        if health is None:
+            health = self._health[device] = TVHealth(self.min_interval)
+        start = time.monotonic()
+        ok = await device.probe(self.probe_timeout)
+        if ok is None:
+            # Busy with a command: keep the last status and look again soon
+            health.busy += 1
+            health.next_probe = time.monotonic() + self.min_interval
+            return health
+        now = time.time()
+        health.probes += 1
+        health.last_probe = now
+        if ok:
+            health.latency = time.monotonic() - start
+            health.last_seen = now
+            health.failures = 0
+            if health.status == TVHealth.ONLINE:
+                health.interval = min(self.max_interval, health.interval * 2)
+            else:
+                health.interval = self.min_interval
+            health.status = TVHealth.ONLINE
+        else:
+            health.failures += 1
+            health.interval = self.min_interval
+            health.status = TVHealth.OFFLINE
+        health.next_probe = time.monotonic() + health.interval
+        return health
+
+    async def probe_due(self) -> float:
+        """Probe every TV whose interval has elapsed; return seconds until the next one is due"""
+        devices = list(self.devices_fn())
+        for device in list(self._health):
+            if device not in devices:
+                del self._health[device]
+
+        now = time.monotonic()
+        due = [d for d in devices if d not in self._health or self._health[d].next_probe <= now]
+        if due:
+            await asyncio.gather(*(self.probe(d) for d in due))
+
+        if not self._health:
+            return self.max_interval
+        return max(0.0, min(h.next_probe for h in self._health.values()) - time.monotonic())
+
+    async def run(self):
+        self._wake = asyncio.Event()
+        while True:
+            self._wake.clear()
+            try:
+                delay = await self.probe_due()
+            except Exception as e:
+                print(f"Warning: TV health check failed: {e}")
+                delay = self.min_interval
+            try:
+                await asyncio.wait_for(self._wake.wait(), delay)
+            except asyncio.TimeoutError:
+                pass
+
+    def start(self):
+        """Start probing in a background task on the running event loop"""
+        if self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self.run(), name="tv-health-monitor")
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+            self._wake = None
@@ -0,0 +1,163 @@
+# jobs.py
+import os
+import time
+import asyncio
+import itertools
+from collections import OrderedDict
+from contextvars import ContextVar
+
+# Finished jobs kept for polling (oldest dropped first)
+JOBS_KEEP_FINISHED = int(os.environ.get("JOBS_KEEP_FINISHED", "100"))
+
+# Job whose flow is running in the current task (see report())
+current_job = ContextVar("current_job", default=None)
+
+
+def report(message: str):
+    """Record a progress step on the job this code runs in, if any"""
+    job = current_job.get()
+    if job is not None:
+        job.step(message)
+
+
+class JobFailed(Exception):
+    """Raised by a job's flow to end it as failed with a message for the user"""
+
+
+class Job:
+    """One background flow: its status, progress steps and outcome"""
+
+    PENDING = "pending"
+    RUNNING = "running"
+    SUCCEEDED = "succeeded"
+    FAILED = "failed"
+    CANCELLED = "cancelled"
+
+    def __init__(self, job_id: str, kind: str, description: str):
+        self.id = job_id
+        self.kind = kind
+        self.description = description
+        self.status = self.PENDING
+        self.steps = []
+        self.result = None
+        self.error = None
+        self.created = time.time()
+        self.finished = None
+        self._task = None
+        self._changed = asyncio.Event()
+
+    def step(self, message: str):
+        self.steps.append((time.time(), message))
+        self._notify()
+
+    def _notify(self):
+        # Wake everyone waiting for the next change, then arm a fresh event
+        self._changed.set()
+        self._changed = asyncio.Event()
+
+    def done(self) -> bool:
+        return self.status in (self.SUCCEEDED, self.FAILED, self.CANCELLED)
+
+    async def next_change(self, timeout: float = None):
+        """Return after the next step or the end of the job, or after timeout (None: no limit)"""
+        if self.done():
+            return
+        try:
+            await asyncio.wait_for(self._changed.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+
+    def snapshot(self) -> dict:
+        end = self.finished or time.time()
+        return {
+            "id": self.id,
+            "kind": self.kind,
+            "description": self.description,
+            "status": self.status,
+            "elapsed_s": round(end - self.created, 2),
+            "steps": [
+                {"at_s": round(at - self.created, 2), "message": message} for at, message in self.steps
+            ],
+            "result": self.result,
+            "error": self.error,
+        }
+
+
+class JobManager:
+    """
+    Runs flows as background tasks and keeps them addressable by id, so a
+    tool can return at once and the client polls, waits for or cancels the job.
+    """
+
+    def __init__(self, keep_finished: int = JOBS_KEEP_FINISHED):
+        self.keep_finished = keep_finished
+        self._jobs = OrderedDict()
+        self._ids = itertools.count(1)
+
+    def start(self, kind: str, description: str, factory) -> Job:
+        """Run factory() in the background as a new job"""
+        job = Job(f"job-{next(self._ids)}", kind, description)
+        self._jobs[job.id] = job
+        job._task = asyncio.get_running_loop().create_task(self._run(job, factory), name=job.id)
+        self._prune()
+        return job
+
+    async def _run(self, job: Job, factory):
+        current_job.set(job)
+        job.status = Job.RUNNING
+        try:
+            job.result = await factory()
+            job.status = Job.SUCCEEDED
+        except asyncio.CancelledError:
+            job.status = Job.CANCELLED
+        except JobFailed as e:
+            job.status = Job.FAILED
+            job.error = str(e)
+        except Exception as e:
+            job.status = Job.FAILED
+            job.error = f"Unexpected error: {e}"
+        job.finished = time.time()
+        job._notify()
+
+    def get(self, job_id: str):
+        return self._jobs.get(job_id)
+
+    def cancel(self, job_id: str) -> bool:
+        """Cancel a job that has not finished; False if it is unknown or done"""
+        job = self._jobs.get(job_id)
+        if job is None or job.done():
+            return False
+        job._task.cancel()
+        return True
+
+    async def wait(self, job: Job, timeout: float = None, on_step=None) -> bool:
+        """
+        Wait up to timeout seconds (None: until it ends) for job to finish,
+        awaiting on_step(job) after every new step. Returns whether the job is done.
+        """
+        deadline = time.monotonic() + timeout if timeout is not None else None
+        seen = len(job.steps)
+        while not job.done():
+            remaining = deadline - time.monotonic() if deadline is not None else None
+            if remaining is not None and remaining <= 0:
+                break
+            await job.next_change(remaining)
+            if on_step is not None and len(job.steps) != seen:
+                seen = len(job.steps)
+                await on_step(job)
+        return job.done()
+
+    def jobs(self) -> list:
+        return list(self._jobs.values())
+
+    def _prune(self):
+        finished = [job_id for job_id, job in self._jobs.items() if job.done()]
+        for job_id in finished[:max(0, len(finished) - self.keep_finished)]:
+            del self._jobs[job_id]
+
+    async def stop(self):
+        """Cancel every running job and wait for them to wind down"""
+        tasks = [job._task for job in self._jobs.values() if not job.done()]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
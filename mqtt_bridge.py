@@ -0,0 +1,341 @@
+# mqtt_bridge.py
+import os
+import json
+import time
+import threading
+from collections import deque, OrderedDict
+import paho.mqtt.client as mqtt
+from persistence import write_json_atomic
+
+MQTT_BROKER = os.environ.get("MQTT_BROKER", "localhost")
+MQTT_PORT = int(os.environ.get("MQTT_PORT", "1883"))
+MQTT_KEEPALIVE = int(os.environ.get("MQTT_KEEPALIVE", "60"))
+MQTT_QOS = int(os.environ.get("MQTT_QOS", "1"))
+
+# Publishes allowed on the wire awaiting their ack (paho queues the rest)
+MQTT_MAX_INFLIGHT = int(os.environ.get("MQTT_MAX_INFLIGHT", "100"))
+
+# Reconnect backoff: the delay doubles after each failed attempt, from min to max (s)
+MQTT_RECONNECT_MIN_DELAY = int(os.environ.get("MQTT_RECONNECT_MIN_DELAY", "1"))
+MQTT_RECONNECT_MAX_DELAY = int(os.environ.get("MQTT_RECONNECT_MAX_DELAY", "60"))
+
+# Messages held while the broker is unreachable (oldest dropped beyond this)
+MQTT_OFFLINE_QUEUE_SIZE = int(os.environ.get("MQTT_OFFLINE_QUEUE_SIZE", "1000"))
+
+# If set, the offline queue is kept in this file so it survives a restart
+MQTT_OFFLINE_QUEUE_FILE = os.environ.get("MQTT_OFFLINE_QUEUE_FILE", "")
+
+# Publish-to-ack latencies kept for percentiles
+LATENCY_WINDOW = 1000
+
+
+def _percentile(ordered, q: float) -> float:
+    return ordered[min(len(ordered) - 1, int(len(ordered) * q / 100))]
+
+
+def command_key(topic: str, payload):
+    """
+    What a message sets, for coalescing: None for a full state document (one
+    per topic), otherwise the command's key on a /set topic ("power" for
+    ON/OFF, "brightness" for BRIGHTNESS:70, ...).
+    """
+    if not topic.endswith("/set"):
+        return None
+    if isinstance(payload, (bytes, bytearray)):
+        payload = payload.decode(errors="replace")
+    key, sep, _ = str(payload).partition(":")
+    return key.lower() if sep else "power"
+
+
+class OfflineQueue:
+    """
+    Messages published while the broker is unreachable.
+
+    Only the latest message per (topic, command key) is kept (an older one is
+    replaced and moves to the back), so ON and BRIGHTNESS:70 on one /set
+    topic are both delivered while two brightness values collapse into one.
+    At most max_size messages are held: beyond that the oldest is dropped.
+    put() returns the (topic, key, payload) of a command it replaced or
+    dropped; MqttBridge.publish passes it to on_discard once no lock is held. With a path, save() writes the queue when it changed and load()
+    restores it at startup.
+    """
+
+    def __init__(self, max_size: int = MQTT_OFFLINE_QUEUE_SIZE, path: str = None, on_change=None,
+                 on_discard=None):
+        self.max_size = max_size
+        self.path = path or None
+        self.on_change = on_change
+        self.on_discard = on_discard
+        # (topic, command key) -> (payload, qos, retain, time.time() when queued)
+        self._messages = OrderedDict()
+        self._dirty = False
+        self._lock = threading.Lock()
+        self.queued = 0
+        self.coalesced = 0
+        self.dropped = 0
+
+    def __len__(self):
+        return len(self._messages)
+
+    def put(self, topic: str, payload, qos: int, retain: bool, key: str = None):
+        if isinstance(payload, (bytes, bytearray)):
+            payload = payload.decode()
+        discarded = None
+        with self._lock:
+            self.queued += 1
+            old = self._messages.pop((topic, key), None)
+            if old is not None:
+                self.coalesced += 1
+                discarded = (topic, key, old[0])
+            elif len(self._messages) >= self.max_size:
+                (old_topic, old_key), old = self._messages.popitem(last=False)
+                self.dropped += 1
+                discarded = (old_topic, old_key, old[0])
+            self._messages[(topic, key)] = (payload, qos, retain, time.time())
+            self._changed()
+        if discarded is not None and discarded[1] is not None:
+            return discarded
+        return None
+
+    def take(self) -> list:
+        """Remove and return every queued (topic, payload, qos, retain), oldest first"""
+        with self._lock:
+            messages = [(topic, m[0], m[1], m[2]) for (topic, _), m in self._messages.items()]
+            if messages:
+                self._messages.clear()
+                self._changed()
+            return messages
+
+    def _changed(self):
+        if self.path is not None and not self._dirty:
+            self._dirty = True
+            if self.on_change is not None:
+                self.on_change()
+
+    def save(self):
+        if self.path is None:
+            return
+        with self._lock:
+            if not self._dirty:
+                return
+            self._dirty = False
+            messages = [[topic, key] + list(m) for (topic, key), m in self._messages.items()]
+        write_json_atomic(self.path, messages)
+
+    def load(self):
+        if self.path is None or not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, "r") as f:
+                saved = json.load(f)
+        except Exception as e:
+            print(f"Warning: Could not load MQTT offline queue: {e}")
+            return
+        with self._lock:
+            for topic, key, payload, qos, retain, queued_at in saved[-self.max_size:]:
+                self._messages[(topic, key)] = (payload, qos, retain, queued_at)
+
+
+class MqttBridge:
+    """
+    MQTT client whose network loop runs on paho's background thread
+    (loop_start), so keepalives, acks and reconnects are serviced while the
+    server handles requests.
+
+    publish() only queues the message and returns; its message id is kept in
+    flight until the broker acks it, and the time in between is recorded as
+    publish-to-ack latency. While the broker is unreachable, paho keeps
+    reconnecting with exponential backoff and publishes go to an OfflineQueue,
+    which is sent in one burst as soon as the connection is back.
+    """
+
+    def __init__(self, host: str = MQTT_BROKER, port: int = MQTT_PORT, keepalive: int = MQTT_KEEPALIVE,
+                 qos: int = MQTT_QOS, max_inflight: int = MQTT_MAX_INFLIGHT,
+                 offline_queue: OfflineQueue = None):
+        self.host = host
+        self.port = port
+        self.keepalive = keepalive
+        self.qos = qos
+        self.client = mqtt.Client(mqtt.CallbackAPIVersion.VERSION2)
+        self.client.max_inflight_messages_set(max_inflight)
+        self.client.reconnect_delay_set(min_delay=MQTT_RECONNECT_MIN_DELAY, max_delay=MQTT_RECONNECT_MAX_DELAY)
+        self.client.on_connect = self._on_connect
+        self.client.on_disconnect = self._on_disconnect
+        self.client.on_connect_fail = self._on_connect_fail
+        self.client.on_publish = self._on_publish
+        self.connected = False
+        self._stopping = False
+        # Reentrant: the drain in _on_connect publishes while holding it
+        self._lock = threading.RLock()
+        if offline_queue is None:
+            offline_queue = OfflineQueue(path=MQTT_OFFLINE_QUEUE_FILE)
+        self.offline = offline_queue
+        # mids of the last drain still awaiting their ack
+        self._draining = set()
+        self._drain_started = None
+        # mid -> (topic, monotonic time publish() was called)
+        self._inflight = {}
+        # Acks that arrived before publish() recorded the mid
+        self._early_acks = {}
+        # topic filter -> qos, (re)subscribed on every connect
+        self._subscriptions = {}
+        self._latencies = deque(maxlen=LATENCY_WINDOW)
+        self.published = 0
+        self.acked = 0
+        self.errors = 0
+        self.connects = 0
+        self.connect_failures = 0
+        self.disconnects = 0
+        self.drained = 0
+        self.last_drain_ms = None
+        self.last_error = None
+
+    def start(self):
+        """Connect in the background and start the network loop thread"""
+        self.offline.load()
+        self.client.connect_async(self.host, self.port, self.keepalive)
+        self.client.loop_start()
+
+    def stop(self):
+        self._stopping = True
+        self.client.disconnect()
+        self.client.loop_stop()
+
+    def _on_connect(self, client, userdata, flags, reason_code, properties):
+        if reason_code.is_failure:
+            self.last_error = str(reason_code)
+            print(f"MQTT broker refused connection: {reason_code}")
+            return
+        self.connects += 1
+        print(f"MQTT broker connected ({self.host}:{self.port})")
+        if self._subscriptions:
+            client.subscribe(list(self._subscriptions.items()))
+        # Drain before marking connected, under the lock, so a publish from
+        # another thread can never overtake an older queued value for its topic
+        with self._lock:
+            self._drain(client)
+            self.connected = True
+
+    def _drain(self, client):
+        messages = self.offline.take()
+        if not messages:
+            return
+        now = time.monotonic()
+        self._drain_started = now
+        for topic, payload, qos, retain in messages:
+            info = client.publish(topic, payload, qos=qos, retain=retain)
+            if info.rc not in (mqtt.MQTT_ERR_SUCCESS, mqtt.MQTT_ERR_NO_CONN):
+                self.errors += 1
+                self.last_error = mqtt.error_string(info.rc)
+                continue
+            self.published += 1
+            self.drained += 1
+            self._inflight[info.mid] = (topic, now)
+            self._draining.add(info.mid)
+        print(f"MQTT: sent {len(messages)} message(s) queued while offline")
+
+    def subscribe(self, topic_filter: str, handler, qos: int = 0):
+        """Call handler(client, userdata, message) on the network thread for matching messages"""
+        self.client.message_callback_add(topic_filter, handler)
+        self._subscriptions[topic_filter] = qos
+        if self.connected:
+            self.client.subscribe(topic_filter, qos)
+
+    def _on_connect_fail(self, client, userdata):
+        if self.last_error is None:
+            print(f"MQTT broker not available at {self.host}:{self.port}. Retrying in the background.")
+        self.last_error = "connection failed"
+        self.connect_failures += 1
+
+    def _on_disconnect(self, client, userdata, flags, reason_code, properties):
+        if self.connected and not self._stopping:
+            print(f"MQTT broker disconnected: {reason_code}. Reconnecting in the background.")
+        with self._lock:
+            self.connected = False
+        self.disconnects += 1
+
+    def _on_publish(self, client, userdata, mid, reason_code, properties):
+        now = time.monotonic()
+        with self._lock:
+            sent = self._inflight.pop(mid, None)
+            if sent is None:
+                self._early_acks[mid] = now
+                return
+            self._ack(now - sent[1])
+            if mid in self._draining:
+                self._draining.discard(mid)
+                if not self._draining:
+                    self.last_drain_ms = round((now - self._drain_started) * 1000, 2)
+
+    def _ack(self, latency: float):
+        self.acked += 1
+        self._latencies.append(latency)
+
+    def publish(self, topic: str, payload, qos: int = None, retain: bool = False, key: str = None) -> bool:
+        """
+        Queue a message for the network thread; False if it was not accepted.
+        While offline, key decides which queued messages it replaces (see
+        OfflineQueue); by default it is derived with command_key().
+        """
+        qos = self.qos if qos is None else qos
+        with self._lock:
+            queued = not self.connected
+            if queued:
+                discarded = self.offline.put(topic, payload, qos, retain,
+                                             key if key is not None else command_key(topic, payload))
+        if queued:
+            # Outside the lock: the callback may take its owner's locks
+            if discarded is not None and self.offline.on_discard is not None:
+                self.offline.on_discard(*discarded)
+            return True
+        sent = time.monotonic()
+        info = self.client.publish(topic, payload, qos=qos, retain=retain)
+        if info.rc not in (mqtt.MQTT_ERR_SUCCESS, mqtt.MQTT_ERR_NO_CONN):
+            self.errors += 1
+            self.last_error = mqtt.error_string(info.rc)
+            return False
+        with self._lock:
+            self.published += 1
+            acked = self._early_acks.pop(info.mid, None)
+            if acked is not None:
+                self._ack(acked - sent)
+            else:
+                self._inflight[info.mid] = (topic, sent)
+        return True
+
+    def inflight(self) -> int:
+        return len(self._inflight)
+
+    def stats(self) -> dict:
+        with self._lock:
+            latencies = sorted(self._latencies)
+            inflight = len(self._inflight)
+        stats = {
+            "broker": f"{self.host}:{self.port}",
+            "connected": self.connected,
+            "connects": self.connects,
+            "connect_failures": self.connect_failures,
+            "disconnects": self.disconnects,
+            "published": self.published,
+            "acked": self.acked,
+            "inflight": inflight,
+            "errors": self.errors,
+            "last_error": self.last_error,
+            "offline_queue": {
+                "depth": len(self.offline),
+                "max_size": self.offline.max_size,
+                "queued": self.offline.queued,
+                "coalesced": self.offline.coalesced,
+                "dropped": self.offline.dropped,
+                "drained": self.drained,
+                "last_drain_ms": self.last_drain_ms,
+                "persisted": self.offline.path is not None,
+            },
+        }
+        if latencies:
+            stats["ack_latency_ms"] = {
+                "p50": round(_percentile(latencies, 50) * 1000, 2),
+                "p95": round(_percentile(latencies, 95) * 1000, 2),
+                "max": round(latencies[-1] * 1000, 2),
+            }
+        return stats
@@ -0,0 +1,307 @@
+# mqtt_state.py
+import os
+import json
+import time
+import threading
+from persistence import write_json_atomic
+
+# Topic filter devices report their own state on
+STATE_TOPICS = "home/+/+/state"
+
+# Minimum seconds between two state documents on the same topic; changes in
+# between are folded into one trailing publish
+MQTT_STATE_MIN_INTERVAL = float(os.environ.get("MQTT_STATE_MIN_INTERVAL", "0.5"))
+
+# Marks state documents published by this server, so they are not ingested back
+SERVER_SOURCE = "server"
+
+# Payloads that need no parsing at all
+_POWER = {b"ON": {"power": "ON"}, b"OFF": {"power": "OFF"}, b"on": {"power": "on"}, b"off": {"power": "off"}}
+
+
+def _scalar(raw: bytes):
+    text = raw.decode()
+    if text.isdigit():
+        return int(text)
+    return text
+
+
+def parse_report(payload: bytes):
+    """
+    {key: value} from a state report, or None if it cannot be read. Accepts
+    the same forms the server publishes on /set ("ON", "OFF", "KEY:VALUE")
+    and JSON objects for several keys at once.
+    """
+    fast = _POWER.get(payload)
+    if fast is not None:
+        return fast
+    if payload[:1] == b"{":
+        try:
+            values = json.loads(payload)
+        except ValueError:
+            return None
+        return values if isinstance(values, dict) else None
+    key, sep, value = payload.partition(b":")
+    if not sep or not key:
+        return None
+    try:
+        return {key.decode().lower(): _scalar(value)}
+    except UnicodeDecodeError:
+        return None
+
+
+class StateIngestor:
+    """
+    Applies device state reports from MQTT to the registry's devices.
+
+    Topics are routed through an index of every device's report topic,
+    rebuilt by refresh() when devices are added or removed. Reported values go
+    into device.reported (the commanded state stays in device.state). Saving
+    is batched: on_change() is called once when the first report arrives
+    after a save, and save() writes the latest values of every device.
+    """
+
+    def __init__(self, devices, path, on_change=None):
+        self.devices = devices
+        self.path = path
+        self.on_change = on_change
+        self._index = {}
+        self._dirty = False
+        self._lock = threading.Lock()
+        self.received = 0
+        self.applied = 0
+        self.unknown_topic = 0
+        self.parse_errors = 0
+        self.own_documents = 0
+        self.saves = 0
+        self.refresh()
+
+    def refresh(self):
+        """Rebuild the topic -> device index from the registry"""
+        self._index = {
+            f"home/{room}/{name}/state": dev
+            for room, devices in list(self.devices.items())
+            for name, dev in list(devices.items())
+        }
+
+    def on_message(self, client, userdata, message):
+        self.ingest(message.topic, message.payload)
+
+    def ingest(self, topic: str, payload: bytes) -> bool:
+        self.received += 1
+        dev = self._index.get(topic)
+        if dev is None:
+            self.unknown_topic += 1
+            return False
+        if not payload:
+            # A cleared retained message (the device was removed)
+            return False
+        values = parse_report(payload)
+        if values is None:
+            self.parse_errors += 1
+            return False
+        if values.get("source") == SERVER_SOURCE:
+            self.own_documents += 1
+            return False
+        dev.apply_report(values, time.time())
+        self.applied += 1
+        if not self._dirty:
+            self._dirty = True
+            if self.on_change is not None:
+                self.on_change()
+        return True
+
+    def save(self):
+        """Write every device's reported state if reports arrived since the last save"""
+        with self._lock:
+            if not self._dirty:
+                return
+            self._dirty = False
+            reported = {}
+            for topic, dev in list(self._index.items()):
+                if dev.reported:
+                    reported.setdefault(dev.room, {})[dev.name] = {
+                        "reported": dict(dev.reported),
+                        "reported_at": dev.reported_at,
+                    }
+            write_json_atomic(self.path, reported)
+            self.saves += 1
+
+    def load(self):
+        if not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, "r") as f:
+                saved = json.load(f)
+        except Exception as e:
+            print(f"Warning: Could not load reported device state: {e}")
+            return
+        for room, devices in saved.items():
+            for name, entry in devices.items():
+                dev = self._index.get(f"home/{room}/{name}/state")
+                if dev is not None:
+                    dev.apply_report(entry.get("reported", {}), entry.get("reported_at"))
+
+    def stats(self) -> dict:
+        return {
+            "received": self.received,
+            "applied": self.applied,
+            "unknown_topic": self.unknown_topic,
+            "parse_errors": self.parse_errors,
+            "own_documents_ignored": self.own_documents,
+            "saves": self.saves,
+            "indexed_devices": len(self._index),
+        }
+
+
+class StatePublisher:
+    """
+    Publishes each device's full state as a retained JSON document on
+    home/<room>/<device>/state, only when it changed.
+
+    Registered as a devices.state_listeners callback. A change whose value
+    equals the last one published for that (device, key) is suppressed.
+    Documents on one topic go out at most once per min_interval: changes
+    arriving sooner are held and sent as a single trailing document with the
+    latest state. Documents carry "source": "server" so StateIngestor skips
+    them when they come back on the shared topic filter.
+
+    command() applies the same rule to /set commands: a command equal to the
+    last one sent for that (device, key) is not repeated, unless the device
+    has since reported a different value. A command counts as sent once the
+    bridge accepted it and until the offline queue discards it.
+    """
+
+    def __init__(self, bridge, min_interval: float = MQTT_STATE_MIN_INTERVAL):
+        self.bridge = bridge
+        self.min_interval = min_interval
+        bridge.offline.on_discard = self._forget_command
+        self._lock = threading.Lock()
+        # topic -> last published document
+        self._published = {}
+        # topic -> monotonic time of the last publish
+        self._published_at = {}
+        # topic -> (monotonic due time, device) held back by the rate limit
+        self._pending = {}
+        # (topic, key) -> last /set payload
+        self._commands = {}
+        self._timer = None
+        self.changes = 0
+        self.published = 0
+        self.suppressed = 0
+        self.deferred = 0
+        self.coalesced = 0
+        self.commands_sent = 0
+        self.commands_suppressed = 0
+
+    def on_state_change(self, dev, key, value):
+        topic = f"home/{dev.room}/{dev.name}/state"
+        with self._lock:
+            self.changes += 1
+            if topic in self._pending:
+                self.coalesced += 1
+                return
+            published = self._published.get(topic)
+            if published is not None and key in published and published[key] == value:
+                self.suppressed += 1
+                return
+            due = self._published_at.get(topic, float("-inf")) + self.min_interval
+            now = time.monotonic()
+            if now < due:
+                self.deferred += 1
+                self._pending[topic] = (due, dev)
+                self._schedule(due - now)
+                return
+            message = self._document(topic, dev, now)
+        self._send([message])
+
+    def publish_all(self, devices):
+        """Publish every device whose state differs from its last document (e.g. at startup)"""
+        now = time.monotonic()
+        messages = []
+        with self._lock:
+            for room, room_devices in list(devices.items()):
+                for name, dev in list(room_devices.items()):
+                    topic = f"home/{room}/{name}/state"
+                    if topic not in self._pending and self._published.get(topic) != dev.state:
+                        messages.append(self._document(topic, dev, now))
+        self._send(messages)
+
+    def forget(self, dev):
+        """Clear a removed device's retained document on the broker"""
+        topic = f"home/{dev.room}/{dev.name}/state"
+        with self._lock:
+            self._pending.pop(topic, None)
+            if self._published.pop(topic, None) is None:
+                return
+            self._published_at.pop(topic, None)
+        self.bridge.publish(topic, b"", retain=True)
+
+    def _document(self, topic, dev, now):
+        """Record dev's state as published on topic (call with the lock held); returns (topic, payload)"""
+        document = dict(dev.state)
+        self._published[topic] = document
+        self._published_at[topic] = now
+        self.published += 1
+        return topic, json.dumps(dict(document, source=SERVER_SOURCE))
+
+    def _send(self, messages):
+        # Never under self._lock: publishing can call back into _forget_command
+        for topic, payload in messages:
+            self.bridge.publish(topic, payload, retain=True)
+
+    def _schedule(self, delay):
+        if self._timer is None:
+            self._timer = threading.Timer(max(0.0, delay), self._flush_due)
+            self._timer.daemon = True
+            self._timer.start()
+
+    def _flush_due(self):
+        now = time.monotonic()
+        messages = []
+        with self._lock:
+            self._timer = None
+            for topic, (due, dev) in list(self._pending.items()):
+                if due <= now:
+                    del self._pending[topic]
+                    if self._published.get(topic) != dev.state:
+                        messages.append(self._document(topic, dev, now))
+            if self._pending:
+                self._schedule(min(due for due, _ in self._pending.values()) - now)
+        self._send(messages)
+
+    def command(self, dev, key: str, payload: str) -> bool:
+        """Publish payload on the device's /set topic unless it repeats the last command"""
+        topic = f"home/{dev.room}/{dev.name}/set"
+        with self._lock:
+            last = self._commands.get((topic, key))
+            reported = dev.reported.get(key)
+            if last == payload and (reported is None or str(reported).upper() == str(getattr(dev, key, None)).upper()):
+                self.commands_suppressed += 1
+                return False
+        # Remembered only once the bridge took it, so a rejected command is retried
+        if not self.bridge.publish(topic, payload, key=key):
+            return False
+        with self._lock:
+            self._commands[(topic, key)] = payload
+            self.commands_sent += 1
+        return True
+
+    def _forget_command(self, topic: str, key: str, payload: str):
+        """The offline queue replaced or dropped this command: allow it to be sent again"""
+        with self._lock:
+            if self._commands.get((topic, key)) == payload:
+                del self._commands[(topic, key)]
+
+    def stats(self) -> dict:
+        return {
+            "changes": self.changes,
+            "published": self.published,
+            "suppressed_unchanged": self.suppressed,
+            "deferred_rate_limit": self.deferred,
+            "coalesced": self.coalesced,
+            "pending": len(self._pending),
+            "min_interval_s": self.min_interval,
+            "commands_sent": self.commands_sent,
+            "commands_suppressed": self.commands_suppressed,
+        }
@@ -0,0 +1,215 @@
+# persistence.py
+import os
+import json
+import threading
+import time
+
+
+def write_text_atomic(path, text):
+    """Write text to a temp file next to path and rename it into place"""
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w") as f:
+        f.write(text)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+def write_json_atomic(path, data, indent=2):
+    """Write JSON atomically (see write_text_atomic)"""
+    write_text_atomic(path, json.dumps(data, indent=indent))
+
+
+class StateSerializer:
+    """
+    Serializes the {room: {name: device}} tree to the same text as
+    json.dumps(..., indent=2), re-encoding only devices whose version changed.
+
+    Each device's JSON fragment is cached together with the device object and
+    its version counter; producing the full document is then a string join.
+    """
+
+    def __init__(self, devices):
+        self.devices = devices
+        self._fragments = {}
+
+    def _fragment(self, room, name, dev, cache):
+        key = (room, name)
+        cached = self._fragments.get(key)
+        if cached is not None and cached[0] is dev and cached[1] == dev.version:
+            cache[key] = cached
+            return cached[2]
+        version = dev.version
+        # Indent continuation lines to the device's depth in the document
+        encoded = json.dumps(dev.to_dict(), indent=2).replace("\n", "\n    ")
+        fragment = f"    {json.dumps(name)}: {encoded}"
+        cache[key] = (dev, version, fragment)
+        return fragment
+
+    def dumps(self) -> str:
+        """Return the full state document as indented JSON"""
+        cache = {}
+        rooms = []
+        for room, devices in list(self.devices.items()):
+            items = [self._fragment(room, name, dev, cache) for name, dev in list(devices.items())]
+            body = "{\n" + ",\n".join(items) + "\n  }" if items else "{}"
+            rooms.append(f"  {json.dumps(room)}: {body}")
+        self._fragments = cache
+        return "{\n" + ",\n".join(rooms) + "\n}" if rooms else "{}"
+
+
+class StatePersister:
+    """
+    Write-behind persistence for device state.
+
+    Callers mark the state dirty and return immediately. A background thread
+    waits for the coalescing window to pass, then calls flush_fn once for
+    however many changes arrived in between.
+    """
+
+    def __init__(self, flush_fn, interval: float = 0.5):
+        self.flush_fn = flush_fn
+        self.interval = interval
+        self._cond = threading.Condition()
+        self._io_lock = threading.Lock()
+        self._dirty = False
+        self._stopping = False
+        self._thread = None
+        self.flush_count = 0
+
+    def start(self):
+        """Start the background writer thread"""
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="state-persister", daemon=True)
+            self._thread.start()
+
+    def mark_dirty(self):
+        """Schedule a flush; does not wait for disk I/O"""
+        with self._cond:
+            self._dirty = True
+            self._cond.notify()
+
+    def flush(self):
+        """Write pending state now, on the calling thread"""
+        with self._cond:
+            if not self._dirty:
+                return
+            self._dirty = False
+        self._write()
+
+    def stop(self):
+        """Flush pending state and stop the background thread"""
+        with self._cond:
+            self._stopping = True
+            self._cond.notify()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+        self.flush()
+
+    def _write(self):
+        with self._io_lock:
+            try:
+                self.flush_fn()
+                self.flush_count += 1
+            except Exception as e:
+                print(f"Warning: Could not persist device state: {e}")
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._dirty and not self._stopping:
+                    self._cond.wait()
+                if self._stopping:
+                    return
+                # Coalescing window: later mark_dirty() calls fold into this flush
+                deadline = time.monotonic() + self.interval
+                while not self._stopping:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._cond.wait(remaining)
+                if self._stopping:
+                    return
+                self._dirty = False
+            self._write()
+
+
+class StateJournal:
+    """
+    Append-only log of device state mutations with periodic snapshot compaction.
+
+    Each record is one JSON line: {"ts", "room", "device", "key", "value"}.
+    record() only buffers in memory, so the per-command cost is O(1); flush()
+    appends the buffered lines. Once the journal holds compact_every records
+    (or a compaction is requested), the JSON text returned by snapshot_fn is
+    written to snapshot_path and the journal is truncated.
+    """
+
+    def __init__(self, snapshot_path, journal_path, snapshot_fn, compact_every: int = 1000):
+        self.snapshot_path = snapshot_path
+        self.journal_path = journal_path
+        self.snapshot_fn = snapshot_fn
+        self.compact_every = compact_every
+        self._lock = threading.Lock()
+        self._pending = []
+        self._compact_requested = False
+        self.entries = 0
+
+    def record(self, room, device, key, value):
+        """Buffer one mutation for the next flush"""
+        line = json.dumps({"ts": time.time(), "room": room, "device": device, "key": key, "value": value})
+        with self._lock:
+            self._pending.append(line)
+
+    def request_compaction(self):
+        """Write a full snapshot on the next flush (e.g. after devices are added or removed)"""
+        with self._lock:
+            self._compact_requested = True
+
+    def flush(self):
+        """Append buffered records, compacting into a snapshot when due"""
+        with self._lock:
+            pending, self._pending = self._pending, []
+            compact = self._compact_requested or self.entries + len(pending) >= self.compact_every
+            self._compact_requested = False
+
+        if pending:
+            with open(self.journal_path, "a") as f:
+                f.write("\n".join(pending) + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+            self.entries += len(pending)
+
+        if compact:
+            # Records that arrive while the snapshot is written land in the
+            # fresh journal; replaying them over the snapshot is idempotent.
+            write_text_atomic(self.snapshot_path, self.snapshot_fn())
+            with open(self.journal_path, "w"):
+                pass
+            self.entries = 0
+
+    def load(self) -> dict:
+        """Return the persisted state: the snapshot with the journal tail replayed on top"""
+        state = {}
+        if os.path.exists(self.snapshot_path):
+            try:
+                with open(self.snapshot_path, "r") as f:
+                    state = json.load(f)
+            except Exception as e:
+                print(f"Warning: Could not load state snapshot: {e}")
+
+        entries = 0
+        if os.path.exists(self.journal_path):
+            with open(self.journal_path, "r") as f:
+                for line in f:
+                    try:
+                        rec = json.loads(line)
+                    except ValueError:
+                        # Torn write at the tail of the journal
+                        continue
+                    device = state.setdefault(rec["room"], {}).setdefault(rec["device"], {"state": {}})
+                    device.setdefault("state", {})[rec["key"]] = rec["value"]
+                    entries += 1
+        self.entries = entries
+        return state
@@ -1,19 +1,29 @@
 import os
 import json
-import paho.mqtt.client as mqtt
 from typing import List
 from dotenv import load_dotenv
-from fastmcp import FastMCP
+from fastmcp import FastMCP, Context
 from fastmcp.server.auth.providers.bearer import BearerAuthProvider, RSAKeyPair
 from mcp import ErrorData, McpError
 from mcp.server.auth.provider import AccessToken
 from mcp.types import TextContent, ImageContent, INVALID_PARAMS, INTERNAL_ERROR
-import time
 from registry import DEVICES
-from devices import TV
-import subprocess
+from devices import TV, state_listeners
+import inspect
 import re
+import time
 import asyncio
+import atexit
+from persistence import StatePersister, StateSerializer
+from health import HealthMonitor
+from discovery import TVDiscovery
+from content_cache import ContentCache
+from timing import TimingProfiles
+from jobs import JobManager, JobFailed, Job, report
+from app_drivers import APP_SETTLE_SECONDS, DRIVERS, get_driver
+from mqtt_bridge import MqttBridge
+from mqtt_state import StateIngestor, StatePublisher, STATE_TOPICS
+from storage import JsonStateStore, SqliteStateStore, read_tv_config_file
 
 load_dotenv()
 
@@ -40,17 +50,10 @@ class SimpleBearerAuthProvider(BearerAuthProvider):
             )
         return None
 
-BROKER = "localhost"
-client = mqtt.Client(mqtt.CallbackAPIVersion.VERSION1)
-
-
-try:
-    client.connect(BROKER, timeout=1)
-    mqtt_enabled = True
-    print("MQTT broker connected successfully")
-except Exception as e:
-    mqtt_enabled = False
-    print(f"MQTT broker not available: {e}. Running without MQTT.")
+# Network loop runs on its own thread; publishes never block a tool
+mqtt_bridge = MqttBridge()
+mqtt_bridge.start()
+atexit.register(mqtt_bridge.stop)
 
 mcp = FastMCP(
     "Smart Home MCP Server",
@@ -60,24 +63,133 @@ mcp = FastMCP(
 STATE_DIR = "device_states"
 os.makedirs(STATE_DIR, exist_ok=True)
 
-# --- Configuration Loading ---
+# --- State Storage ---
 CONFIG_FILE = os.path.join(STATE_DIR, "tv_config.json")
 
-def load_tv_config():
-    """Load TV configurations from JSON file if it exists"""
-    if os.path.exists(CONFIG_FILE):
+serializer = StateSerializer(DEVICES)
+
+# "json" (devices.json + journal, tv_config.json) or "sqlite" (one row per device)
+STATE_BACKEND = os.environ.get("STATE_BACKEND", "json").lower()
+if STATE_BACKEND == "sqlite":
+    STATE_DB = os.environ.get("STATE_DB", os.path.join(STATE_DIR, "home.db"))
+    store = SqliteStateStore(STATE_DB, DEVICES, import_dir=STATE_DIR)
+    # Seconds between reads of the device state other server processes wrote to STATE_DB
+    STATE_SYNC_INTERVAL = float(os.environ.get("STATE_SYNC_INTERVAL", "2"))
+else:
+    JOURNAL_COMPACT_EVERY = int(os.environ.get("JOURNAL_COMPACT_EVERY", "1000"))
+    store = JsonStateStore(STATE_DIR, serializer.dumps, compact_every=JOURNAL_COMPACT_EVERY)
+state_listeners.append(store.record)
+
+# --- TV Health Monitor ---
+def all_tvs():
+    return [dev for devices in DEVICES.values() for dev in devices.values() if isinstance(dev, TV)]
+
+health_monitor = HealthMonitor(all_tvs)
+
+async def tv_is_connected(dev) -> bool:
+    """Connection status from the health monitor; probes only if it has no result yet"""
+    if dev.breaker.is_open():
+        return False
+    health = health_monitor.status(dev)
+    if health is not None:
+        return health.status == health.ONLINE
+    return await dev.check_connection()
+
+def cached_tv_status(dev) -> str:
+    """Connection status for display, never touching the network"""
+    if dev.breaker.is_open():
+        return "Unreachable (circuit open)"
+    health = health_monitor.status(dev)
+    if health is not None:
+        return "Connected" if health.status == health.ONLINE else "Not connected"
+    connection = dev.connection_info()
+    if connection["status"] == "unknown" or not connection["fresh"]:
+        return "Unknown (not probed yet)"
+    return "Connected" if connection["status"] == "connected" else "Not connected"
+
+def tv_failure(dev, message: str) -> str:
+    """Failure message for a TV command, saying so when the TV's circuit breaker is open"""
+    if dev.breaker.is_open():
+        return f"{message} TV is unreachable: {dev.breaker.describe()}. It is re-checked in the background."
+    return f"{message} Connection issue."
+
+def tv_health_info(dev):
+    health = health_monitor.status(dev)
+    return health.snapshot() if health is not None else None
+
+# --- TV Rediscovery ---
+# How often the background task checks for TVs that dropped off their address
+DISCOVERY_INTERVAL = float(os.environ.get("TV_DISCOVERY_INTERVAL", "60"))
+
+discovery = TVDiscovery()
+
+def tv_is_offline(dev) -> bool:
+    health = health_monitor.status(dev)
+    return dev.breaker.is_open() or (health is not None and health.status == health.OFFLINE)
+
+async def learn_tv_identity(dev) -> bool:
+    """Fetch and remember a reachable TV's serial; returns True if it was newly learned"""
+    if dev.device_id or tv_is_offline(dev):
+        return False
+    identity = await discovery.identify(f"{dev.ip_address}:{dev.port}")
+    if identity is None:
+        return False
+    dev.device_id = identity["device_id"]
+    mark_tv_config_changed()
+    save_state()
+    print(f"Learned identity of TV {dev.name}: {identity['manufacturer']} {identity['model']} ({dev.device_id})")
+    return True
+
+async def rediscover_moved_tvs(tvs) -> list:
+    """Sweep the LAN for the given TVs and repoint any that changed address"""
+    moves = await discovery.rediscover(tvs)
+    for dev, old, new in moves:
+        print(f"TV {dev.name} in {dev.room} moved from {old} to {new}")
+        health_monitor.forget(dev)
+    if moves:
+        mark_tv_config_changed()
+        save_state(full=True)
+    return moves
+
+async def discovery_loop():
+    """Learn TV identities and rediscover TVs that went offline"""
+    # Let the health monitor's first probes finish so offline TVs are known
+    await asyncio.sleep(health_monitor.probe_timeout + 1)
+    while True:
         try:
-            with open(CONFIG_FILE, "r") as f:
-                return json.load(f)
+            tvs = all_tvs()
+            await asyncio.gather(*(learn_tv_identity(dev) for dev in tvs))
+            lost = [dev for dev in tvs if dev.device_id and tv_is_offline(dev)]
+            if lost:
+                await rediscover_moved_tvs(lost)
         except Exception as e:
-            print(f"Warning: Could not load TV config: {e}")
-    return {}
+            print(f"Warning: TV rediscovery failed: {e}")
+        await asyncio.sleep(DISCOVERY_INTERVAL)
+
+def load_tv_config():
+    """Load TV configurations from the state store"""
+    return store.load_tv_config()
+
+# Bumped by the tools that change TV connection settings; tv_config is only
+# rewritten when this moves past the generation that was last saved.
+tv_config_generation = 0
+saved_tv_config_generation = 0
+saved_tv_configs = None
+
+def mark_tv_config_changed():
+    """Record that TV connection settings changed and need saving"""
+    global tv_config_generation
+    tv_config_generation += 1
 
 def save_tv_config():
-    """Save TV configurations to JSON file"""
+    """Save TV configurations to the state store if they changed since the last save"""
+    global saved_tv_config_generation, saved_tv_configs
+    generation = tv_config_generation
+    if generation == saved_tv_config_generation:
+        return
     tv_configs = {}
-    for room, devices in DEVICES.items():
-        for device_name, device in devices.items():
+    for room, devices in list(DEVICES.items()):
+        for device_name, device in list(devices.items()):
             if hasattr(device, 'ip_address'):  # TV device
                 if room not in tv_configs:
                     tv_configs[room] = {}
@@ -85,23 +197,131 @@ def save_tv_config():
                     "ip_address": device.ip_address,
                     "port": device.port
                 }
+                if device.device_id:
+                    tv_configs[room][device_name]["device_id"] = device.device_id
     
     try:
-        with open(CONFIG_FILE, "w") as f:
-            json.dump(tv_configs, f, indent=2)
+        if tv_configs != saved_tv_configs:
+            store.save_tv_config(tv_configs)
+            saved_tv_configs = tv_configs
+        saved_tv_config_generation = generation
     except Exception as e:
         print(f"Warning: Could not save TV config: {e}")
 
-def save_state():
-    file_path = os.path.join(STATE_DIR, "devices.json")
-    state_dict = {
-        room: {name: dev.to_dict() for name, dev in devices.items()}
-        for room, devices in DEVICES.items()
-    }
-    with open(file_path, "w") as f:
-        json.dump(state_dict, f, indent=2)
+# --- Content Cache ---
+# Resolved content URIs of searched titles, so repeat plays skip the search
+CONTENT_CACHE_SIZE = int(os.environ.get("CONTENT_CACHE_SIZE", "500"))
+CONTENT_CACHE_TTL = float(os.environ.get("CONTENT_CACHE_TTL", str(30 * 24 * 3600)))
+content_cache = ContentCache(os.path.join(STATE_DIR, "content_cache.json"), CONTENT_CACHE_SIZE, CONTENT_CACHE_TTL)
+content_cache.load()
+
+async def play_title(dev, query: str, app: str):
+    """
+    Play query on app: straight from its cached content URI when known,
+    otherwise by searching, learning the URI of whatever starts playing if
+    the search changed it.
+    Returns "cached" or "searched" on success, None on failure.
+    """
+    async def play():
+        uri = content_cache.get(app, query)
+        if uri is not None:
+            report(f"Opening '{query}' from the content cache")
+            if await dev.play_content_uri(app, uri):
+                return "cached"
+            content_cache.forget(app, query)
+        # When the search brings the app forward with a launcher intent, the
+        # task can still show the intent of an earlier title: only a URI that
+        # changed belongs to this query
+        before = await dev.current_content_uri(app)
+        report(f"Searching for '{query}' on {app}")
+        if not await dev.search_and_play(query, app):
+            return None
+        uri = await dev.current_content_uri(app)
+        if uri is not None and uri != before:
+            content_cache.put(app, query, uri)
+        return "searched"
     
+    # One queue entry, so nothing interleaves between playing and reading the URI
+    return await dev.commands.submit(play)
+
+# --- Background Jobs ---
+# Long TV flows run as jobs so their tools return at once (see jobs.py)
+jobs = JobManager()
+
+def job_outcome(job) -> str:
+    if job.status == Job.SUCCEEDED:
+        return job.result
+    if job.status == Job.FAILED:
+        return job.error
+    if job.status == Job.CANCELLED:
+        return f"Job {job.id} was cancelled."
+    last = job.steps[-1][1] if job.steps else "starting"
+    return f"Job {job.id} is still {job.status} ({last}). Use wait_tv_job('{job.id}') to keep waiting."
+
+def progress_reporter(ctx):
+    """on_step callback streaming job steps as MCP progress notifications"""
+    if ctx is None:
+        return None
+    async def on_step(job):
+        await ctx.report_progress(len(job.steps), None, job.steps[-1][1])
+    return on_step
+
+async def run_as_job(kind: str, description: str, flow, wait: bool, ctx) -> str:
+    """Start flow as a background job; return its id at once, or its outcome if wait is set"""
+    job = jobs.start(kind, description, flow)
+    if not wait:
+        return f"Started {job.id}: {description}. Use wait_tv_job('{job.id}') or get_tv_job('{job.id}') to follow it, or cancel_tv_job('{job.id}') to stop it."
+    await jobs.wait(job, on_step=progress_reporter(ctx))
+    return job_outcome(job)
+
+# --- TV Timing Profiles ---
+# Launch and focus latencies measured per TV, sizing each TV's waits
+timing_profiles = TimingProfiles(os.path.join(STATE_DIR, "tv_timing.json"))
+timing_profiles.load()
+
+# --- Reported State ---
+# State reports devices publish on home/<room>/<device>/state, kept next to
+# the commanded state and saved in batches (see mqtt_state.py)
+state_ingestor = StateIngestor(DEVICES, os.path.join(STATE_DIR, "reported_state.json"))
+# Retained, change-only state documents on home/<room>/<device>/state
+state_publisher = StatePublisher(mqtt_bridge)
+state_listeners.append(state_publisher.on_state_change)
+
+def write_state_files():
+    """Flush recorded changes, and TV config if it changed (runs on the persister thread)"""
+    store.flush()
     save_tv_config()
+    content_cache.save()
+    timing_profiles.save()
+    state_ingestor.save()
+    mqtt_bridge.offline.save()
+
+# Changes arriving within this many seconds are folded into a single write
+STATE_FLUSH_INTERVAL = float(os.environ.get("STATE_FLUSH_INTERVAL", "0.5"))
+persister = StatePersister(write_state_files, interval=STATE_FLUSH_INTERVAL)
+persister.start()
+state_ingestor.on_change = persister.mark_dirty
+mqtt_bridge.offline.on_change = persister.mark_dirty
+atexit.register(store.close)
+atexit.register(persister.stop)
+
+def save_state(full: bool = False):
+    """
+    Mark device state dirty; the persister writes it in the background.
+    Pass full=True when devices were added or reconfigured so every device is rewritten.
+    """
+    if full:
+        store.request_full_sync()
+    persister.mark_dirty()
+
+async def shared_state_loop():
+    """Apply the device state other server processes sharing the SQLite database wrote"""
+    while True:
+        await asyncio.sleep(STATE_SYNC_INTERVAL)
+        try:
+            await asyncio.to_thread(store.flush)
+        except Exception as e:
+            print(f"Warning: Could not read shared device state: {e}")
 
 ROOM_ALIASES = {
     "living room": "livingroom",
@@ -122,7 +342,9 @@ def normalize_room_name(room: str) -> str:
 
 def initialize_tv_configs():
     """Load TV configurations from file on server startup"""
+    global saved_tv_configs
     configs = load_tv_config()
+    saved_tv_configs = configs
     if configs:
         print("Loading TV configurations from file...")
         
@@ -139,6 +361,7 @@ def initialize_tv_configs():
                     
                     if device_name not in DEVICES[normalized_room]:
                         new_tv = TV(device_name, normalized_room, ip_address, port)
+                        new_tv.device_id = config.get("device_id")
                         DEVICES[normalized_room][device_name] = new_tv
                         print(f"Loaded TV: {device_name} in {room} ({ip_address}:{port})")
                         
@@ -147,7 +370,27 @@ def initialize_tv_configs():
     else:
         print("No TV configuration file found. Use add_tv_device() to configure TVs.")
 
+def restore_device_states():
+    """Reload persisted device state from the state store onto the registry"""
+    saved = store.load()
+    restored = 0
+    for room, devices in saved.items():
+        for device_name, data in devices.items():
+            dev = DEVICES.get(room, {}).get(device_name)
+            if dev is not None and isinstance(data.get("state"), dict):
+                dev.restore_state(data["state"])
+                restored += 1
+    if restored:
+        print(f"Restored state for {restored} devices from {STATE_BACKEND} storage")
+
 initialize_tv_configs()
+restore_device_states()
+for tv in all_tvs():
+    timing_profiles.attach(tv)
+state_ingestor.refresh()
+state_ingestor.load()
+mqtt_bridge.subscribe(STATE_TOPICS, state_ingestor.on_message)
+state_publisher.publish_all(DEVICES)
 
 # --- Tool: validate (required by Puch) ---
 @mcp.tool
@@ -156,27 +399,27 @@ async def validate() -> str:
     return MY_NUMBER
 
 @mcp.tool()
-def turn_on_device(room: str, device_name: str) -> str:
+async def turn_on_device(room: str, device_name: str) -> str:
     """Turn ON a device in a given room."""
     if room in DEVICES and device_name in DEVICES[room]:
         dev = DEVICES[room][device_name]
-        dev.turn_on()
-        if mqtt_enabled:
-            topic = f"home/{room}/{device_name}/set"
-            client.publish(topic, "ON")
+        result = dev.turn_on()
+        if inspect.isawaitable(result):
+            await result
+        state_publisher.command(dev, "power", "ON")
         save_state()
         return f"{device_name} in {room} is now ON."
     return f"Device {device_name} not found in {room}."
 
 @mcp.tool()
-def turn_off_device(room: str, device_name: str) -> str:
+async def turn_off_device(room: str, device_name: str) -> str:
     """Turn OFF a device in a given room."""
     if room in DEVICES and device_name in DEVICES[room]:
         dev = DEVICES[room][device_name]
-        dev.turn_off()
-        if mqtt_enabled:
-            topic = f"home/{room}/{device_name}/set"
-            client.publish(topic, "OFF")
+        result = dev.turn_off()
+        if inspect.isawaitable(result):
+            await result
+        state_publisher.command(dev, "power", "OFF")
         save_state()
         return f"{device_name} in {room} is now OFF."
     return f"Device {device_name} not found in {room}."
@@ -191,10 +434,12 @@ def set_device_value(room: str, device_name: str, key: str, value: str) -> str:
     if normalized_room in DEVICES and device_name in DEVICES[normalized_room]:
         dev = DEVICES[normalized_room][device_name]
         if hasattr(dev, f"set_{key}"):
-            getattr(dev, f"set_{key}")(value)
-            if mqtt_enabled:
-                topic = f"home/{normalized_room}/{device_name}/set"
-                client.publish(topic, f"{key.upper()}:{value}")
+            try:
+                getattr(dev, f"set_{key}")(value)
+            except ValueError:
+                return f"Invalid {key} for {device_name}: {value}"
+            value = getattr(dev, key)
+            state_publisher.command(dev, key, f"{key.upper()}:{value}")
             save_state()
             return f"{key} for {device_name} in {room} set to {value}."
         return f"Device {device_name} does not support {key}."
@@ -205,103 +450,103 @@ def get_device_state(room: str, device_name: str) -> str:
     """Get the current state of a specific device."""
     normalized_room = normalize_room_name(room)
     if normalized_room in DEVICES and device_name in DEVICES[normalized_room]:
-        return json.dumps(DEVICES[normalized_room][device_name].to_dict(), indent=2)
+        dev = DEVICES[normalized_room][device_name]
+        info = dev.to_dict()
+        if dev.reported:
+            info["reported"] = dev.reported
+            info["reported_at"] = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(dev.reported_at))
+        return json.dumps(info, indent=2)
     return f"Device {device_name} not found in {room}."
 
 @mcp.tool()
 def get_all_states() -> str:
     """Get the state of all devices in the smart home."""
-    state_dict = {
-        room: {name: dev.to_dict() for name, dev in devices.items()}
-        for room, devices in DEVICES.items()
-    }
-    return json.dumps(state_dict, indent=2)
+    return serializer.dumps()
 
 # --- TV Control Tools ---
 @mcp.tool()
-def tv_volume_up(room: str, device_name: str) -> str:
+async def tv_volume_up(room: str, device_name: str) -> str:
     """Increase TV volume."""
     normalized_room = normalize_room_name(room)
     if normalized_room in DEVICES and device_name in DEVICES[normalized_room]:
         dev = DEVICES[normalized_room][device_name]
         if hasattr(dev, 'volume_up'):
-            success = dev.volume_up()
+            success = await dev.volume_up()
             if success:
                 save_state()
-                return f"TV volume increased. Current volume: {dev.state['volume']}"
+                return f"TV volume increased. Current volume: {dev.volume}"
             else:
-                return f"Failed to increase TV volume. Connection issue."
+                return tv_failure(dev, f"Failed to increase TV volume.")
         return f"Device {device_name} is not a TV."
     return f"Device {device_name} not found in {room}."
 
 @mcp.tool()
-def tv_volume_down(room: str, device_name: str) -> str:
+async def tv_volume_down(room: str, device_name: str) -> str:
     """Decrease TV volume."""
     normalized_room = normalize_room_name(room)
     if normalized_room in DEVICES and device_name in DEVICES[normalized_room]:
         dev = DEVICES[normalized_room][device_name]
         if hasattr(dev, 'volume_down'):
-            success = dev.volume_down()
+            success = await dev.volume_down()
             if success:
                 save_state()
-                return f"TV volume decreased. Current volume: {dev.state['volume']}"
+                return f"TV volume decreased. Current volume: {dev.volume}"
             else:
-                return f"Failed to decrease TV volume. Connection issue."
+                return tv_failure(dev, f"Failed to decrease TV volume.")
         return f"Device {device_name} is not a TV."
     return f"Device {device_name} not found in {room}."
 
 @mcp.tool()
-def tv_mute(room: str, device_name: str) -> str:
+async def tv_mute(room: str, device_name: str) -> str:
     """Mute/unmute TV."""
     normalized_room = normalize_room_name(room)
     if normalized_room in DEVICES and device_name in DEVICES[normalized_room]:
         dev = DEVICES[normalized_room][device_name]
         if hasattr(dev, 'mute'):
-            success = dev.mute()
+            success = await dev.mute()
             if success:
                 save_state()
-                mute_status = "muted" if dev.state['muted'] else "unmuted"
+                mute_status = "muted" if dev.muted else "unmuted"
                 return f"TV is now {mute_status}."
             else:
-                return f"Failed to mute/unmute TV. Connection issue."
+                return tv_failure(dev, f"Failed to mute/unmute TV.")
         return f"Device {device_name} is not a TV."
     return f"Device {device_name} not found in {room}."
 
+APP_EMOJIS = {"netflix": "📺", "youtube": "▶️"}
+
 @mcp.tool()
-def tv_open_app(room: str, device_name: str, app: str) -> str:
-    """Open an app on TV (netflix, youtube, home)."""
+async def tv_open_app(room: str, device_name: str, app: str) -> str:
+    """Open an app on TV (netflix, youtube, any other registered app, or home)."""
     normalized_room = normalize_room_name(room)
     if normalized_room in DEVICES and device_name in DEVICES[normalized_room]:
         dev = DEVICES[normalized_room][device_name]
-        if app.lower() == 'netflix' and hasattr(dev, 'open_netflix'):
-            success = dev.open_netflix()
-            app_emoji = "📺"
-        elif app.lower() == 'youtube' and hasattr(dev, 'open_youtube'):
-            success = dev.open_youtube()
-            app_emoji = "▶️"
-        elif app.lower() == 'home' and hasattr(dev, 'home'):
-            success = dev.home()
+        if app.lower() == 'home' and hasattr(dev, 'home'):
+            success = await dev.home()
             app_emoji = "🏠"
+        elif get_driver(app) is not None and hasattr(dev, 'open_app'):
+            success = await dev.open_app(app)
+            app_emoji = APP_EMOJIS.get(app.lower(), "📱")
         else:
-            return f"App '{app}' not supported. Available: netflix, youtube, home"
+            return f"App '{app}' not supported. Available: {', '.join(list(DRIVERS) + ['home'])}"
         
         if success:
             save_state()
             return f"{app_emoji} Opened {app} on TV."
         else:
-            return f"Failed to open {app} on TV. Connection issue."
+            return tv_failure(dev, f"Failed to open {app} on TV.")
     return f"Device {device_name} not found in {room}."
 
 @mcp.tool()
-def tv_navigate(room: str, device_name: str, direction: str) -> str:
+async def tv_navigate(room: str, device_name: str, direction: str) -> str:
     """Navigate TV (back, home)."""
     normalized_room = normalize_room_name(room)
     if normalized_room in DEVICES and device_name in DEVICES[normalized_room]:
         dev = DEVICES[normalized_room][device_name]
         if direction.lower() == 'back' and hasattr(dev, 'back'):
-            success = dev.back()
+            success = await dev.back()
         elif direction.lower() == 'home' and hasattr(dev, 'home'):
-            success = dev.home()
+            success = await dev.home()
         else:
             return f"Navigation command '{direction}' not supported. Available: back, home"
         
@@ -309,19 +554,22 @@ def tv_navigate(room: str, device_name: str, direction: str) -> str:
             save_state()
             return f"TV navigation: {direction} command sent."
         else:
-            return f"Failed to send {direction} command to TV."
+            return tv_failure(dev, f"Failed to send {direction} command to TV.")
     return f"Device {device_name} not found in {room}."
 
 @mcp.tool()
-def check_tv_connection(room: str, device_name: str) -> str:
+async def check_tv_connection(room: str, device_name: str) -> str:
     """Check if TV is connected and available."""
     normalized_room = normalize_room_name(room)
     if normalized_room in DEVICES and device_name in DEVICES[normalized_room]:
         dev = DEVICES[normalized_room][device_name]
         if hasattr(dev, 'check_connection'):
-            is_connected = dev.check_connection()
+            is_connected = await tv_is_connected(dev)
             if is_connected:
-                return f"TV connection is active. Status: {json.dumps(dev.state, indent=2)}"
+                status = dict(dev.state, health=tv_health_info(dev), connection=dev.connection_info(), breaker=dev.breaker_info(), queue=dev.queue_info(), timing=dev.timing.snapshot())
+                return f"TV connection is active. Status: {json.dumps(status, indent=2)}"
+            elif dev.breaker.is_open():
+                return f"TV is unreachable: {dev.breaker.describe()}. It is re-checked in the background."
             else:
                 return f"TV is not connected. Make sure TV is on, ADB is enabled, and IP is correct."
         return f"Device {device_name} is not a TV."
@@ -329,7 +577,7 @@ def check_tv_connection(room: str, device_name: str) -> str:
 
 # --- TV Configuration Tools ---
 @mcp.tool()
-def add_tv_device(room: str, device_name: str, ip_address: str, port: int = 5555) -> str:
+async def add_tv_device(room: str, device_name: str, ip_address: str, port: int = 5555) -> str:
     """
     Add a new TV device with specified IP address and port.
     This allows users to configure their own TV connections.
@@ -352,17 +600,24 @@ def add_tv_device(room: str, device_name: str, ip_address: str, port: int = 5555
     
     try:
         new_tv = TV(device_name, normalized_room, ip_address, port)
+        timing_profiles.attach(new_tv)
         DEVICES[normalized_room][device_name] = new_tv
-        save_state()
+        state_ingestor.refresh()
+        mark_tv_config_changed()
+        save_state(full=True)
         
-        connection_status = "Connected" if new_tv.check_connection() else "Not connected"
+        connected = await new_tv.check_connection()
+        connection_status = "Connected" if connected else "Not connected"
+        health_monitor.forget(new_tv)
+        if connected:
+            await learn_tv_identity(new_tv)
         
         return f"TV '{device_name}' added to {room} with IP {ip_address}:{port}. Status: {connection_status}"
     except Exception as e:
         return f"Failed to add TV device: {str(e)}"
 
 @mcp.tool()
-def update_tv_config(room: str, device_name: str, ip_address: str, port: int = 5555) -> str:
+async def update_tv_config(room: str, device_name: str, ip_address: str, port: int = 5555) -> str:
     """
     Update the IP address and port for an existing TV device.
     This allows users to reconfigure TV connections.
@@ -386,13 +641,17 @@ def update_tv_config(room: str, device_name: str, ip_address: str, port: int = 5
             return f"Device {device_name} is not a TV device."
         
         old_config = f"{existing_tv.ip_address}:{existing_tv.port}"
-        existing_tv.ip_address = ip_address
-        existing_tv.port = port
+        existing_tv.update_connection_settings(ip_address, port)
+        # The address may now belong to a different TV; relearn its identity
+        existing_tv.device_id = None
+        mark_tv_config_changed()
+        save_state(full=True)
         
-        existing_tv._initialize_connection()
-        save_state()
-        
-        connection_status = "Connected" if existing_tv.check_connection() else "Not connected"
+        connected = await existing_tv.check_connection()
+        connection_status = "Connected" if connected else "Not connected"
+        health_monitor.forget(existing_tv)
+        if connected:
+            await learn_tv_identity(existing_tv)
         
         return f"TV '{device_name}' updated from {old_config} to {ip_address}:{port}. Status: {connection_status}"
     except Exception as e:
@@ -414,6 +673,12 @@ def remove_tv_device(room: str, device_name: str) -> str:
     
     try:
         del DEVICES[normalized_room][device_name]
+        device.close()
+        timing_profiles.forget(device)
+        state_ingestor.refresh()
+        state_publisher.forget(device)
+        store.forget_device(normalized_room, device_name)
+        mark_tv_config_changed()
         save_state()
         return f"TV device '{device_name}' removed from {room}."
     except Exception as e:
@@ -424,23 +689,26 @@ def list_tv_devices() -> str:
     """
     List all TV devices with their configurations and connection status.
     """
+    # Answered from the health monitor's cache; no TV is contacted here
     tv_devices = []
-    
     for room, devices in DEVICES.items():
         for device_name, device in devices.items():
-            if hasattr(device, 'ip_address'):  # TV device
-                connection_status = "Connected" if device.check_connection() else "Not connected"
-                tv_info = {
-                    "room": room,
-                    "name": device_name,
-                    "ip_address": device.ip_address,
-                    "port": device.port,
-                    "status": connection_status,
-                    "current_app": device.state.get("current_app", "unknown"),
-                    "volume": device.state.get("volume", 0),
-                    "muted": device.state.get("muted", False)
-                }
-                tv_devices.append(tv_info)
+            if not hasattr(device, 'ip_address'):  # not a TV device
+                continue
+            tv_devices.append({
+                "room": room,
+                "name": device_name,
+                "ip_address": device.ip_address,
+                "port": device.port,
+                "status": cached_tv_status(device),
+                "current_app": device.state.get("current_app", "unknown"),
+                "volume": device.state.get("volume", 0),
+                "muted": device.state.get("muted", False),
+                "health": tv_health_info(device),
+                "connection": device.connection_info(),
+                "breaker": device.breaker_info(),
+                "queue": device.queue_info()
+            })
     
     if not tv_devices:
         return "No TV devices configured. Use add_tv_device to add one."
@@ -448,6 +716,38 @@ def list_tv_devices() -> str:
     
     return f"TV Devices:\n{json.dumps(tv_devices, indent=2)}"
 
+@mcp.tool()
+async def rediscover_tvs() -> str:
+    """
+    Scan the local network for TVs whose IP address changed (e.g. after a
+    restart) and update their configuration automatically.
+    """
+    tvs = all_tvs()
+    if not tvs:
+        return "No TV devices configured. Use add_tv_device to add one."
+    await asyncio.gather(*(learn_tv_identity(dev) for dev in tvs))
+    unknown = [dev.name for dev in tvs if not dev.device_id]
+    try:
+        moves = await rediscover_moved_tvs(tvs)
+    except Exception as e:
+        return f"TV rediscovery failed: {str(e)}"
+    
+    scan = discovery.info()
+    if scan["last_duration_ms"] is None:
+        result = "No scan run yet: no TV has been identified.\n"
+    else:
+        result = (
+            f"Scanned in {scan['last_duration_ms']:.0f} ms at {scan['last_scan']} (scan #{scan['scans']}); "
+            f"ADB devices found: {scan['adb_devices_found'] or 'none'}\n"
+        )
+    if moves:
+        result += "\n".join(f"Updated {dev.name} in {dev.room}: {old} -> {new}" for dev, old, new in moves)
+    else:
+        result += "No TV changed address."
+    if unknown:
+        result += f"\nNot yet identified (connect them once at their current IP with update_tv_config): {unknown}"
+    return result
+
 @mcp.tool()
 def load_tv_configs_from_file() -> str:
     """
@@ -465,7 +765,7 @@ def load_tv_configs_from_file() -> str:
     }
     """
     try:
-        configs = load_tv_config()
+        configs = read_tv_config_file(CONFIG_FILE)
         if not configs:
             return f"No TV configuration file found at {CONFIG_FILE}. Use add_tv_device to create TVs or manually create the config file."
         
@@ -488,18 +788,23 @@ def load_tv_configs_from_file() -> str:
                         existing_tv = DEVICES[normalized_room][device_name]
                         if hasattr(existing_tv, 'ip_address'):
                             existing_tv.update_connection_settings(ip_address, port)
+                            existing_tv.device_id = config.get("device_id", existing_tv.device_id)
                             updated_count += 1
                         else:
                             errors.append(f"Device {device_name} in {room} is not a TV")
                     else:
                         new_tv = TV(device_name, normalized_room, ip_address, port)
+                        new_tv.device_id = config.get("device_id")
+                        timing_profiles.attach(new_tv)
                         DEVICES[normalized_room][device_name] = new_tv
                         added_count += 1
                         
                 except Exception as e:
                     errors.append(f"Error configuring {device_name} in {room}: {str(e)}")
         
-        save_state()
+        state_ingestor.refresh()
+        mark_tv_config_changed()
+        save_state(full=True)
         
         result = f"TV Configuration loaded:\n"
         result += f"Added: {added_count} devices\n"
@@ -512,28 +817,135 @@ def load_tv_configs_from_file() -> str:
         
     except Exception as e:
         return f"Failed to load TV configurations: {str(e)}"
+
+@mcp.tool()
+def export_state_to_json() -> str:
+    """
+    Write the current device states and TV configurations to
+    device_states/devices.json and device_states/tv_config.json.
+    Useful as a backup or when running with the SQLite state backend.
+    """
+    try:
+        store.request_full_sync()
+        persister.mark_dirty()
+        persister.flush()
+        if hasattr(store, "export_json"):
+            store.export_json(STATE_DIR)
+        return f"Exported device state to {os.path.join(STATE_DIR, 'devices.json')} and {CONFIG_FILE}."
+    except Exception as e:
+        return f"Failed to export state: {str(e)}"
+
 @mcp.tool()
-def tv_search_and_play(room: str, device_name: str, query: str, app: str = "netflix") -> str:
+async def tv_search_and_play(room: str, device_name: str, query: str, app: str = "netflix", wait: bool = False, ctx: Context = None) -> str:
     """
     Search for and play content on TV streaming apps.
     Supports Netflix, YouTube, and other apps.
     Examples: "Young Sheldon", "Brooklyn Nine Nine", "comedy shows"
+    Runs as a background job and returns its id right away; pass wait=True
+    to return only once playback has started.
     """
     normalized_room = normalize_room_name(room)
     if normalized_room in DEVICES and device_name in DEVICES[normalized_room]:
         dev = DEVICES[normalized_room][device_name]
         if hasattr(dev, 'search_and_play'):
-            success = dev.search_and_play(query, app.lower())
-            if success:
+            async def flow():
+                played = await play_title(dev, query, app.lower())
+                if not played:
+                    raise JobFailed(tv_failure(dev, f"Failed to search and play '{query}' on {app}."))
                 save_state()
-                return f"Searching and playing '{query}' on {app.title()}..."
-            else:
-                return f"Failed to search and play '{query}' on {app}. Connection issue."
+                if played == "cached":
+                    return f"Playing '{query}' on {app.title()} (resolved from cache, no search needed)."
+                return f"Searched for and started '{query}' on {app.title()}."
+            return await run_as_job("tv_search_and_play", f"play '{query}' on {app.title()} in {room}", flow, wait, ctx)
         return f"Device {device_name} does not support search and play functionality."
     return f"Device {device_name} not found in {room}."
 
 @mcp.tool()
-def tv_search_content(room: str, device_name: str, query: str, app: str = "netflix") -> str:
+def get_tv_job(job_id: str) -> str:
+    """Show a background TV job's status, progress steps and outcome."""
+    job = jobs.get(job_id)
+    if job is None:
+        return f"Job {job_id} not found."
+    return json.dumps(job.snapshot(), indent=2)
+
+@mcp.tool()
+async def wait_tv_job(job_id: str, timeout: float = 30, ctx: Context = None) -> str:
+    """
+    Wait up to timeout seconds for a background TV job to finish and return
+    its outcome. Progress steps are streamed while waiting.
+    """
+    job = jobs.get(job_id)
+    if job is None:
+        return f"Job {job_id} not found."
+    await jobs.wait(job, timeout, on_step=progress_reporter(ctx))
+    return job_outcome(job)
+
+@mcp.tool()
+def cancel_tv_job(job_id: str) -> str:
+    """Cancel a background TV job; the TV command in progress is stopped."""
+    job = jobs.get(job_id)
+    if job is None:
+        return f"Job {job_id} not found."
+    if not jobs.cancel(job_id):
+        return f"Job {job_id} already {job.status}."
+    return f"Cancelling job {job_id}."
+
+@mcp.tool()
+def list_tv_jobs() -> str:
+    """List recent background TV jobs and their status."""
+    summary = [
+        {"id": job.id, "kind": job.kind, "description": job.description, "status": job.status}
+        for job in jobs.jobs()
+    ]
+    return json.dumps(summary, indent=2) if summary else "No TV jobs yet."
+
+@mcp.tool()
+def get_mqtt_stats() -> str:
+    """
+    Show the MQTT connection and publish counters: messages awaiting the
+    broker's ack, publish-to-ack latency, the queue of messages held while
+    the broker was unreachable, and how many device state reports were
+    received and applied, and how many state documents were published or
+    suppressed as unchanged.
+    """
+    return json.dumps(dict(
+        mqtt_bridge.stats(),
+        state_reports=state_ingestor.stats(),
+        state_documents=state_publisher.stats(),
+    ), indent=2)
+
+@mcp.tool()
+def get_content_cache_stats() -> str:
+    """
+    Show how often tv_search_and_play / play_netflix_show could play a title
+    straight from the content cache instead of searching for it.
+    """
+    return json.dumps(content_cache.stats(), indent=2)
+
+@mcp.tool()
+def get_tv_app_strategies(room: str, device_name: str) -> str:
+    """
+    Show, per app, the ways this TV has been driven to search results
+    (deep link, search key, menu navigation, ...) with their measured success
+    and latency; the cheapest working one is tried first.
+    """
+    normalized_room = normalize_room_name(room)
+    if normalized_room in DEVICES and device_name in DEVICES[normalized_room]:
+        dev = DEVICES[normalized_room][device_name]
+        if hasattr(dev, 'strategy_info'):
+            info = {
+                app: {
+                    flow: [s.name for s in driver.ranked(dev, play=flow == "play")]
+                    for flow in ("play", "search")
+                }
+                for app, driver in DRIVERS.items()
+            }
+            return json.dumps({"order": info, "stats": dev.strategy_info()}, indent=2)
+        return f"Device {device_name} is not a TV."
+    return f"Device {device_name} not found in {room}."
+
+@mcp.tool()
+async def tv_search_content(room: str, device_name: str, query: str, app: str = "netflix") -> str:
     """
     Search for content on streaming apps without automatically playing.
     This allows browsing search results before selecting what to play.
@@ -542,17 +954,17 @@ def tv_search_content(room: str, device_name: str, query: str, app: str = "netfl
     if normalized_room in DEVICES and device_name in DEVICES[normalized_room]:
         dev = DEVICES[normalized_room][device_name]
         if hasattr(dev, 'search_content'):
-            success = dev.search_content(query, app.lower())
+            success = await dev.search_content(query, app.lower())
             if success:
                 save_state()
                 return f"Searching for '{query}' on {app.title()}. Use TV remote to select what to play."
             else:
-                return f"Failed to search for '{query}' on {app}. Connection issue."
+                return tv_failure(dev, f"Failed to search for '{query}' on {app}.")
         return f"Device {device_name} does not support search functionality."
     return f"Device {device_name} not found in {room}."
 
 @mcp.tool()
-def tv_send_text(room: str, device_name: str, text: str) -> str:
+async def tv_send_text(room: str, device_name: str, text: str) -> str:
     """
     Send text input to TV (useful for search fields).
     This can be used when the TV is in a search interface.
@@ -561,17 +973,17 @@ def tv_send_text(room: str, device_name: str, text: str) -> str:
     if normalized_room in DEVICES and device_name in DEVICES[normalized_room]:
         dev = DEVICES[normalized_room][device_name]
         if hasattr(dev, 'send_text'):
-            success = dev.send_text(text)
+            success = await dev.send_text(text)
             if success:
                 save_state()
                 return f"Sent text '{text}' to TV."
             else:
-                return f"Failed to send text to TV. Connection issue."
+                return tv_failure(dev, f"Failed to send text to TV.")
         return f"Device {device_name} does not support text input."
     return f"Device {device_name} not found in {room}."
 
 @mcp.tool()
-def tv_press_key(room: str, device_name: str, key: str) -> str:
+async def tv_press_key(room: str, device_name: str, key: str) -> str:
     """
     Press specific keys on TV remote.
     Available keys: enter, back, home, up, down, left, right, menu, play, pause, search
@@ -580,19 +992,21 @@ def tv_press_key(room: str, device_name: str, key: str) -> str:
     if normalized_room in DEVICES and device_name in DEVICES[normalized_room]:
         dev = DEVICES[normalized_room][device_name]
         if hasattr(dev, 'press_key'):
-            success = dev.press_key(key.lower())
+            success = await dev.press_key(key.lower())
             if success:
                 save_state()
                 return f"Pressed '{key}' key on TV remote."
             else:
-                return f"Failed to press '{key}' key. Connection issue."
+                return tv_failure(dev, f"Failed to press '{key}' key.")
         return f"Device {device_name} does not support key press functionality."
     return f"Device {device_name} not found in {room}."
 
 @mcp.tool()
-def play_youtube_video(room: str, device_name: str, search_query: str) -> str:
+async def play_youtube_video(room: str, device_name: str, search_query: str, wait: bool = False, ctx: Context = None) -> str:
     """
     Search and play videos on YouTube TV with improved navigation.
+    Runs as a background job and returns its id right away; pass wait=True
+    to return only once the search is done.
     """
     normalized_room = normalize_room_name(room)
     if normalized_room in DEVICES and device_name in DEVICES[normalized_room]:
@@ -601,38 +1015,34 @@ def play_youtube_video(room: str, device_name: str, search_query: str) -> str:
         if not hasattr(dev, 'ip_address'):
             return f"Device {device_name} is not a TV device."
         
-        if not dev.check_connection():
+        if not await tv_is_connected(dev):
             return f"Cannot connect to TV {device_name}. Please check connection."
         
-        try:
+        async def flow():
             # improved YouTube search method
             if hasattr(dev, 'open_youtube_and_search'):
-                success = dev.open_youtube_and_search(search_query)
+                success = await dev.open_youtube_and_search(search_query)
+                save_state()
                 if success:
-                    save_state()
                     return f"Successfully searched for '{search_query}' on YouTube!"
-                else:
-                    # Fallback
-                    save_state()
-                    return f"YouTube is now open. The search for '{search_query}' may need manual selection due to YouTube TV interface limitations. Try:\n" \
-                           f"1. Use your remote to navigate to the search icon (🔍) in the left sidebar\n" \
-                           f"2. Type '{search_query}' using the on-screen keyboard\n" \
-                           f"3. Select a video to play"
-            else:
-                # basic method
-                youtube_success = dev.open_youtube()
-                if youtube_success:
-                    return f"YouTube opened. Please manually search for '{search_query}' using your TV remote."
-                else:
-                    return f"Failed to open YouTube. Make sure YouTube app is installed."
-                    
-        except Exception as e:
-            return f"Error playing YouTube video: {str(e)}"
+                # Fallback
+                raise JobFailed(
+                    f"YouTube is now open. The search for '{search_query}' may need manual selection due to YouTube TV interface limitations. Try:\n"
+                    f"1. Use your remote to navigate to the search icon (🔍) in the left sidebar\n"
+                    f"2. Type '{search_query}' using the on-screen keyboard\n"
+                    f"3. Select a video to play"
+                )
+            # basic method
+            if await dev.open_youtube():
+                return f"YouTube opened. Please manually search for '{search_query}' using your TV remote."
+            raise JobFailed(f"Failed to open YouTube. Make sure YouTube app is installed.")
+        
+        return await run_as_job("play_youtube_video", f"search '{search_query}' on YouTube in {room}", flow, wait, ctx)
     
     return f"Device {device_name} not found in {room}."
 
 @mcp.tool()
-def youtube_voice_search_workaround(room: str, device_name: str, search_query: str) -> str:
+async def youtube_voice_search_workaround(room: str, device_name: str, search_query: str) -> str:
     """
     Alternative YouTube search that uses voice search interface.
     This can work when regular text search fails.
@@ -645,12 +1055,12 @@ def youtube_voice_search_workaround(room: str, device_name: str, search_query: s
             return f"Device {device_name} is not a TV device."
         
         try:
-            if not dev.open_youtube():
+            if not await dev.open_youtube():
                 return f"Failed to open YouTube."
             
-            time.sleep(4)
+            await asyncio.sleep(dev.timing.pause(get_driver("youtube").package, APP_SETTLE_SECONDS))
             
-            dev._send_adb_command("input keyevent KEYCODE_SEARCH")
+            await dev.press_key("search")
             
             return f"Voice search activated on YouTube! Please say '{search_query}' into your TV remote or use the on-screen keyboard that should appear."
             
@@ -660,7 +1070,7 @@ def youtube_voice_search_workaround(room: str, device_name: str, search_query: s
     return f"Device {device_name} not found in {room}."
 
 @mcp.tool()
-def youtube_navigate_and_play(room: str, device_name: str, direction: str = "down", steps: int = 1) -> str:
+async def youtube_navigate_and_play(room: str, device_name: str, direction: str = "down", steps: int = 1) -> str:
     """
     Navigate YouTube interface and play content.
     Directions: up, down, left, right, enter, back
@@ -688,11 +1098,13 @@ def youtube_navigate_and_play(room: str, device_name: str, direction: str = "dow
             if direction.lower() not in direction_map:
                 return f"Invalid direction. Use: {list(direction_map.keys())}"
             
-            success_count = 0
+            # One round trip for the whole run, paced on the TV itself
+            sequence = []
             for i in range(steps):
-                if dev._send_adb_command(f"input keyevent {direction_map[direction.lower()]}"):
-                    success_count += 1
-                    time.sleep(0.5)  # delay between commands
+                if i:
+                    sequence.append(0.5)
+                sequence.append(direction_map[direction.lower()])
+            success_count = steps if await dev.send_key_sequence(sequence) else 0
             
             return f"Successfully sent {success_count}/{steps} '{direction}' commands to YouTube."
             
@@ -702,10 +1114,12 @@ def youtube_navigate_and_play(room: str, device_name: str, direction: str = "dow
     return f"Device {device_name} not found in {room}."
 
 @mcp.tool()
-def play_netflix_show(room: str, device_name: str, show_name: str) -> str:
+async def play_netflix_show(room: str, device_name: str, show_name: str, wait: bool = False, ctx: Context = None) -> str:
     """
     Play a specific show or movie on Netflix.
     This function will open Netflix and attempt to search and play the content.
+    Runs as a background job and returns its id right away; pass wait=True
+    to return only once playback has started.
     """
     normalized_room = normalize_room_name(room)
     
@@ -717,7 +1131,7 @@ def play_netflix_show(room: str, device_name: str, show_name: str) -> str:
     if not hasattr(dev, 'ip_address'):
         return f"Device {device_name} is not a TV device."
     
-    if not dev.check_connection():
+    if not await tv_is_connected(dev):
         return f"Cannot connect to TV {device_name}. Please check:\n" \
                f"• TV is powered on\n" \
                f"• Developer options enabled\n" \
@@ -725,38 +1139,30 @@ def play_netflix_show(room: str, device_name: str, show_name: str) -> str:
                f"• IP address is correct: {dev.ip_address}:{dev.port}\n" \
                f"• TV and server are on same network"
     
-    try:
+    async def flow():
         print(f"Attempting to play '{show_name}' on Netflix...")
         
-        
-        print("Opening Netflix...")
-        netflix_success = dev.open_netflix()
-        if not netflix_success:
-            return f"Failed to open Netflix on {device_name}. Make sure Netflix app is installed."
-        
-        # Search and play
-        print(f"Searching for '{show_name}'...")
+        # Opens Netflix itself; titles played before skip the search entirely
         if hasattr(dev, 'search_and_play'):
-            search_success = dev.search_and_play(show_name, "netflix")
+            search_success = await play_title(dev, show_name, "netflix")
+            save_state()
             if search_success:
-                save_state()
                 return f"Successfully initiated playback of '{show_name}' on Netflix! The show should start playing shortly."
-            else:
-                # Fallback
-                save_state()
-                return f"Netflix is now open on {device_name}. I attempted to search for '{show_name}' but it may need manual selection. Try using your TV remote to:\n" \
-                       f"1. Navigate to the search icon (🔍)\n" \
-                       f"2. Type '{show_name}'\n" \
-                       f"3. Select the show to play"
-        else:
-            save_state() 
-            return f"Netflix opened on {device_name}. Your TV doesn't support automatic search yet. Please manually search for '{show_name}' using your remote."
-            
-    except Exception as e:
-        return f"Unexpected error while trying to play '{show_name}': {str(e)}"
+            # Fallback
+            raise JobFailed(
+                f"Netflix is now open on {device_name}. I attempted to search for '{show_name}' but it may need manual selection. Try using your TV remote to:\n"
+                f"1. Navigate to the search icon (🔍)\n"
+                f"2. Type '{show_name}'\n"
+                f"3. Select the show to play"
+            )
+        await dev.open_netflix()
+        save_state() 
+        return f"Netflix opened on {device_name}. Your TV doesn't support automatic search yet. Please manually search for '{show_name}' using your remote."
+    
+    return await run_as_job("play_netflix_show", f"play '{show_name}' on Netflix in {room}", flow, wait, ctx)
 
 @mcp.tool()
-def diagnose_tv_connection(room: str, device_name: str) -> str:
+async def diagnose_tv_connection(room: str, device_name: str) -> str:
     """
     Run diagnostics on TV connection to help troubleshoot issues.
     """
@@ -773,11 +1179,14 @@ def diagnose_tv_connection(room: str, device_name: str) -> str:
     results = []
     results.append(f"Diagnosing TV: {device_name} in {room}")
     results.append(f"IP Address: {dev.ip_address}:{dev.port}")
+    results.append(f"Circuit breaker: {dev.breaker.state}")
     
     try:
-        ping_result = subprocess.run(f"ping -c 1 -W 3 {dev.ip_address}", 
-                                   shell=True, capture_output=True, timeout=5)
-        if ping_result.returncode == 0:
+        ping = await asyncio.create_subprocess_exec(
+            "ping", "-c", "1", "-W", "3", dev.ip_address,
+            stdout=asyncio.subprocess.DEVNULL, stderr=asyncio.subprocess.DEVNULL
+        )
+        if await asyncio.wait_for(ping.wait(), 5) == 0:
             results.append("Network connectivity: OK")
         else:
             results.append("Network connectivity: FAILED - TV not reachable")
@@ -785,25 +1194,22 @@ def diagnose_tv_connection(room: str, device_name: str) -> str:
     except:
         results.append("Network connectivity: Could not test")
     
-    try:
-        adb_result = subprocess.run(f"adb connect {dev.ip_address}:{dev.port}", 
-                                  shell=True, capture_output=True, timeout=10)
-        if "connected" in adb_result.stdout.decode().lower():
-            results.append("ADB connection: OK") 
-        else:
-            results.append(f"ADB connection: FAILED - {adb_result.stdout.decode().strip()}")
-    except:
-        results.append("ADB connection: ERROR - ADB not installed or accessible")
+    connect_message = await dev.connect()
+    if connect_message.startswith("failed: "):
+        results.append(f"ADB connection: ERROR - ADB not installed or accessible ({connect_message[len('failed: '):]})")
+    elif "connected" in connect_message.lower():
+        results.append("ADB connection: OK")
+    else:
+        results.append(f"ADB connection: FAILED - {connect_message}")
     
-    if dev.check_connection():
+    if await dev.check_connection():
         results.append("Device responsiveness: OK")
     else:
         results.append("Device responsiveness: FAILED")
     
     try:
-        netflix_test = subprocess.run(f"adb -s {dev.ip_address}:{dev.port} shell pm list packages | grep netflix", 
-                                    shell=True, capture_output=True, timeout=10)
-        if netflix_test.returncode == 0 and netflix_test.stdout:
+        returncode, packages = await dev._transport.run("pm list packages | grep netflix", timeout=10)
+        if returncode == 0 and packages.strip():
             results.append("Netflix app: Installed")
         else:
             results.append("Netflix app: Not found or not accessible")
@@ -815,7 +1221,18 @@ def diagnose_tv_connection(room: str, device_name: str) -> str:
 # --- Run MCP Server ---
 async def main():
     print(f"Starting Smart Home MCP server on http://0.0.0.0:8002")
-    await mcp.run_async("streamable-http", host="0.0.0.0", port=8002)
+    health_monitor.start()
+    discovery_task = asyncio.create_task(discovery_loop())
+    sync_task = asyncio.create_task(shared_state_loop()) if STATE_BACKEND == "sqlite" else None
+    try:
+        await mcp.run_async("streamable-http", host="0.0.0.0", port=8002)
+    finally:
+        discovery_task.cancel()
+        if sync_task is not None:
+            sync_task.cancel()
+        await jobs.stop()
+        await health_monitor.stop()
+        persister.stop()
 
 if __name__ == "__main__":
     
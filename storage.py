@@ -0,0 +1,305 @@
+# storage.py
+import os
+import json
+import time
+import sqlite3
+import threading
+from persistence import StateJournal, write_json_atomic
+
+
+class JsonStateStore:
+    """
+    Stores device state as devices.json (snapshot) + devices.journal,
+    and TV connection settings as tv_config.json.
+    """
+
+    def __init__(self, state_dir, snapshot_fn, compact_every: int = 1000):
+        self.devices_file = os.path.join(state_dir, "devices.json")
+        self.tv_config_file = os.path.join(state_dir, "tv_config.json")
+        self.journal = StateJournal(
+            self.devices_file,
+            os.path.join(state_dir, "devices.journal"),
+            snapshot_fn,
+            compact_every=compact_every,
+        )
+
+    def record(self, device, key, value):
+        self.journal.record(device.room, device.name, key, value)
+
+    def request_full_sync(self):
+        self.journal.request_compaction()
+
+    def forget_device(self, room, name):
+        # The next snapshot simply no longer contains the device
+        self.journal.request_compaction()
+
+    def flush(self):
+        self.journal.flush()
+
+    def load(self) -> dict:
+        return self.journal.load()
+
+    def load_tv_config(self) -> dict:
+        return read_tv_config_file(self.tv_config_file)
+
+    def save_tv_config(self, tv_configs):
+        write_json_atomic(self.tv_config_file, tv_configs)
+
+    def close(self):
+        pass
+
+
+class SqliteStateStore:
+    """
+    Stores one row per device in SQLite (WAL mode), so every mutation is a
+    single-row UPSERT of the changed key (json_set). Several server processes
+    can share one database: each row carries a sequence number bumped on
+    every write, and flush() applies the rows other processes changed since
+    the last flush to the devices this process knows. TV connection settings
+    are written per TV, so processes never erase each other's TVs.
+    devices.json / tv_config.json remain available through export_json().
+    """
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS devices (
+            room TEXT NOT NULL,
+            name TEXT NOT NULL,
+            type TEXT NOT NULL,
+            state TEXT NOT NULL DEFAULT '{}',
+            updated_at REAL NOT NULL,
+            seq INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (room, name)
+        );
+        CREATE TABLE IF NOT EXISTS tv_config (
+            room TEXT NOT NULL,
+            name TEXT NOT NULL,
+            ip_address TEXT NOT NULL,
+            port INTEGER NOT NULL,
+            device_id TEXT,
+            PRIMARY KEY (room, name)
+        );
+    """
+
+    # Lookups by room use the primary key; these cover type and change polling
+    INDEXES = """
+        CREATE INDEX IF NOT EXISTS idx_devices_type ON devices (type);
+        CREATE INDEX IF NOT EXISTS idx_devices_seq ON devices (seq);
+    """
+
+    # Writers are serialized by SQLite, so this is unique and increasing
+    NEXT_SEQ = "(SELECT COALESCE(MAX(seq), 0) + 1 FROM devices)"
+
+    # One statement per mutation; sqlite3 caches the prepared statement
+    UPSERT_KEY = f"""
+        INSERT INTO devices (room, name, type, state, updated_at, seq)
+        VALUES (?, ?, ?, ?, ?, {NEXT_SEQ})
+        ON CONFLICT (room, name) DO UPDATE SET
+            state = json_set(devices.state, ?, json(?)),
+            updated_at = excluded.updated_at,
+            seq = {NEXT_SEQ}
+    """
+
+    # New devices only: an existing row may hold another process's newer values
+    INSERT_DEVICE = f"""
+        INSERT INTO devices (room, name, type, state, updated_at, seq)
+        VALUES (?, ?, ?, ?, ?, {NEXT_SEQ})
+        ON CONFLICT (room, name) DO NOTHING
+    """
+
+    UPSERT_TV = """
+        INSERT INTO tv_config (room, name, ip_address, port, device_id)
+        VALUES (?, ?, ?, ?, ?)
+        ON CONFLICT (room, name) DO UPDATE SET
+            ip_address = excluded.ip_address,
+            port = excluded.port,
+            device_id = excluded.device_id
+    """
+
+    def __init__(self, db_path, devices, import_dir=None):
+        self.db_path = db_path
+        self.devices = devices
+        self._lock = threading.Lock()
+        self._pending = []
+        self._full_sync_requested = False
+        # Highest row sequence number applied to self.devices
+        self._seen = 0
+        # TV settings as last written or loaded by this process
+        self._tv_configs = {}
+        self._conn = sqlite3.connect(db_path, check_same_thread=False, timeout=10)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(self.SCHEMA)
+        columns = [row[1] for row in self._conn.execute("PRAGMA table_info(tv_config)")]
+        if "device_id" not in columns:
+            # Databases created before TV rediscovery
+            self._conn.execute("ALTER TABLE tv_config ADD COLUMN device_id TEXT")
+        columns = [row[1] for row in self._conn.execute("PRAGMA table_info(devices)")]
+        if "seq" not in columns:
+            # Databases created before processes could share them
+            self._conn.execute("ALTER TABLE devices ADD COLUMN seq INTEGER NOT NULL DEFAULT 0")
+        self._conn.executescript(self.INDEXES)
+        if import_dir is not None:
+            self._import_json_if_empty(import_dir)
+
+    def _import_json_if_empty(self, state_dir):
+        """Seed an empty database from existing devices.json / tv_config.json"""
+        if self._conn.execute("SELECT 1 FROM devices LIMIT 1").fetchone():
+            return
+        now = time.time()
+        snapshot = JsonStateStore(state_dir, None).load()
+        rows = [
+            (room, name, data.get("type", "unknown"), json.dumps(data.get("state", {})), now)
+            for room, devices in snapshot.items()
+            for name, data in devices.items()
+        ]
+        tv_configs = read_tv_config_file(os.path.join(state_dir, "tv_config.json"))
+        with self._conn:
+            self._conn.executemany(self.INSERT_DEVICE, rows)
+            self._conn.executemany(self.UPSERT_TV, _tv_rows(_tv_configs_by_key(tv_configs)))
+        if rows or tv_configs:
+            print(f"Imported {len(rows)} devices from JSON state into {self.db_path}")
+
+    def record(self, device, key, value):
+        # A new row starts from the device's whole state; an existing one only gets key
+        row = json.dumps(device.state)
+        path = f'$."{key}"'
+        with self._lock:
+            self._pending.append(
+                (device.room, device.name, device.type, row, time.time(), path, json.dumps(value))
+            )
+
+    def request_full_sync(self):
+        with self._lock:
+            self._full_sync_requested = True
+
+    def forget_device(self, room, name):
+        with self._lock, self._conn:
+            # Pending UPSERTs would otherwise recreate the row on the next flush
+            self._pending = [p for p in self._pending if p[0] != room or p[1] != name]
+            self._conn.execute("DELETE FROM devices WHERE room = ? AND name = ?", (room, name))
+
+    def flush(self):
+        """Write recorded changes, then apply rows other processes changed since the last flush"""
+        with self._lock:
+            pending, self._pending = self._pending, []
+            full = self._full_sync_requested
+            self._full_sync_requested = False
+
+            rows = []
+            if full:
+                # Gives devices added since startup a row; existing rows are
+                # kept up to date key by key
+                now = time.time()
+                rows = [
+                    (room, name, dev.type, json.dumps(dev.state), now)
+                    for room, devices in list(self.devices.items())
+                    for name, dev in list(devices.items())
+                ]
+            with self._conn:
+                if pending:
+                    self._conn.executemany(self.UPSERT_KEY, pending)
+                if rows:
+                    self._conn.executemany(self.INSERT_DEVICE, rows)
+            # Includes this process's own rows: after the write above, the
+            # database holds every value recorded here, plus the others' keys
+            cursor = self._conn.execute(
+                "SELECT room, name, state, seq FROM devices WHERE seq > ? ORDER BY seq", (self._seen,)
+            )
+            for room, name, encoded, seq in cursor:
+                self._seen = seq
+                dev = self.devices.get(room, {}).get(name)
+                if dev is not None:
+                    dev.restore_state(json.loads(encoded))
+
+    def find(self, room=None, device_type=None) -> dict:
+        """Stored devices, optionally only those in room and/or of device_type (indexed)"""
+        query = "SELECT room, name, type, state FROM devices"
+        conditions, params = [], []
+        if room is not None:
+            conditions.append("room = ?")
+            params.append(room)
+        if device_type is not None:
+            conditions.append("type = ?")
+            params.append(device_type)
+        if conditions:
+            query += " WHERE " + " AND ".join(conditions)
+        state = {}
+        with self._lock:
+            for room, name, device_type, encoded in self._conn.execute(query, params):
+                state.setdefault(room, {})[name] = {
+                    "name": name,
+                    "type": device_type,
+                    "room": room,
+                    "state": json.loads(encoded),
+                }
+        return state
+
+    def load(self) -> dict:
+        with self._lock:
+            # Everything up to here is restored by the caller; flush() applies later changes
+            self._seen = self._conn.execute("SELECT COALESCE(MAX(seq), 0) FROM devices").fetchone()[0]
+        return self.find()
+
+    def load_tv_config(self) -> dict:
+        """Stored TV settings, which save_tv_config() then treats as this process's TVs"""
+        configs = self._read_tv_config()
+        with self._lock:
+            self._tv_configs = _tv_configs_by_key(configs)
+        return configs
+
+    def _read_tv_config(self) -> dict:
+        configs = {}
+        with self._lock:
+            cursor = self._conn.execute("SELECT room, name, ip_address, port, device_id FROM tv_config")
+            for room, name, ip_address, port, device_id in cursor:
+                config = {"ip_address": ip_address, "port": port}
+                if device_id:
+                    config["device_id"] = device_id
+                configs.setdefault(room, {})[name] = config
+        return configs
+
+    def save_tv_config(self, tv_configs):
+        """
+        Write the TVs whose settings changed since this process last saved or
+        loaded them, and delete the ones it removed. TVs only another process
+        knows about are left alone.
+        """
+        configs = _tv_configs_by_key(tv_configs)
+        with self._lock, self._conn:
+            changed = {key: config for key, config in configs.items() if self._tv_configs.get(key) != config}
+            removed = [key for key in self._tv_configs if key not in configs]
+            self._conn.executemany(self.UPSERT_TV, _tv_rows(changed))
+            self._conn.executemany("DELETE FROM tv_config WHERE room = ? AND name = ?", removed)
+            self._tv_configs = {key: dict(config) for key, config in configs.items()}
+
+    def export_json(self, state_dir):
+        """Write the stored state out as devices.json and tv_config.json"""
+        write_json_atomic(os.path.join(state_dir, "devices.json"), self.find())
+        write_json_atomic(os.path.join(state_dir, "tv_config.json"), self._read_tv_config())
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+def read_tv_config_file(path) -> dict:
+    """Load TV configurations from a tv_config.json-style file if it exists"""
+    if os.path.exists(path):
+        try:
+            with open(path, "r") as f:
+                return json.load(f)
+        except Exception as e:
+            print(f"Warning: Could not load TV config: {e}")
+    return {}
+
+
+def _tv_configs_by_key(tv_configs) -> dict:
+    """{room: {name: config}} as {(room, name): config}"""
+    return {(room, name): config for room, devices in tv_configs.items() for name, config in devices.items()}
+
+
+def _tv_rows(configs) -> list:
+    return [
+        (room, name, config["ip_address"], config.get("port", 5555), config.get("device_id"))
+        for (room, name), config in configs.items()
+    ]
@@ -0,0 +1,141 @@
+# timing.py
+import os
+import json
+import threading
+from collections import deque
+from persistence import write_json_atomic
+
+# Percentile of a TV's measured latencies used as its wait budget, and how
+# many measurements are needed before they replace the defaults
+TIMING_PERCENTILE = float(os.environ.get("TV_TIMING_PERCENTILE", "90"))
+TIMING_MIN_SAMPLES = int(os.environ.get("TV_TIMING_MIN_SAMPLES", "3"))
+
+# Measurements kept per metric (older ones are dropped)
+TIMING_WINDOW = 50
+
+# App launch time the fixed pauses in the app flows were tuned for; a TV
+# launching an app faster gets proportionally shorter pauses in that app
+REFERENCE_LAUNCH_SECONDS = 2.0
+
+# Learned waits stay within these multiples of their defaults
+MIN_SCALE = 0.25
+MAX_SCALE = 2.0
+
+
+def percentile(samples, q: float) -> float:
+    """Nearest-rank q-th percentile of a non-empty sequence"""
+    ordered = sorted(samples)
+    rank = max(1, -(-len(ordered) * q // 100))
+    return ordered[int(rank) - 1]
+
+
+class TimingProfile:
+    """
+    Measured latencies of one TV, by metric ("launch:<package>" is the
+    activity launch time reported by `am start -W`, "focus:<package>" the
+    time until the app had window focus).
+
+    budget() turns a metric into a timeout for polling it; pause() scales a
+    fixed pause inside an app by how fast the TV launches that app.
+    """
+
+    def __init__(self, samples=None):
+        self._samples = {
+            metric: deque(values, maxlen=TIMING_WINDOW) for metric, values in (samples or {}).items()
+        }
+        self._lock = threading.Lock()
+        self.dirty = False
+
+    def record(self, metric: str, seconds: float):
+        with self._lock:
+            self._samples.setdefault(metric, deque(maxlen=TIMING_WINDOW)).append(round(seconds, 3))
+            self.dirty = True
+
+    def learned(self, metric: str, q: float = TIMING_PERCENTILE):
+        """q-th percentile of metric, or None until TIMING_MIN_SAMPLES were recorded"""
+        with self._lock:
+            samples = list(self._samples.get(metric, ()))
+        if len(samples) < TIMING_MIN_SAMPLES:
+            return None
+        return percentile(samples, q)
+
+    def budget(self, metric: str, default: float, margin: float = 2.0) -> float:
+        """How long to wait for metric: its learned percentile times margin, else default"""
+        learned = self.learned(metric)
+        if learned is None:
+            return default
+        return min(max(learned * margin, default * MIN_SCALE), default * MAX_SCALE)
+
+    def speed_factor(self, package: str) -> float:
+        learned = self.learned(f"launch:{package}")
+        if learned is None:
+            return 1.0
+        return min(max(learned / REFERENCE_LAUNCH_SECONDS, MIN_SCALE), MAX_SCALE)
+
+    def pause(self, package: str, seconds: float) -> float:
+        """A fixed pause of seconds inside package, scaled to this TV's speed"""
+        return round(seconds * self.speed_factor(package), 2)
+
+    def samples(self) -> dict:
+        with self._lock:
+            return {metric: list(values) for metric, values in self._samples.items()}
+
+    def snapshot(self) -> dict:
+        info = {}
+        for metric, values in sorted(self.samples().items()):
+            info[metric] = {
+                "samples": len(values),
+                "p50": percentile(values, 50),
+                f"p{TIMING_PERCENTILE:g}": percentile(values, TIMING_PERCENTILE),
+            }
+        return info
+
+
+class TimingProfiles:
+    """
+    TimingProfile of every TV, keyed by "room/name" and kept in path as JSON.
+    attach() gives a TV its saved profile; save() writes profiles that changed.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._profiles = {}
+        self._lock = threading.Lock()
+        # Set when a profile was dropped, so the file is rewritten without it
+        self._dirty = False
+
+    def attach(self, tv):
+        key = f"{tv.room}/{tv.name}"
+        with self._lock:
+            profile = self._profiles.setdefault(key, TimingProfile())
+        tv.timing = profile
+        return profile
+
+    def forget(self, tv):
+        with self._lock:
+            if self._profiles.pop(f"{tv.room}/{tv.name}", None) is not None:
+                self._dirty = True
+
+    def save(self):
+        """Write all profiles to disk if any changed since the last save"""
+        with self._lock:
+            profiles = dict(self._profiles)
+            if not self._dirty and not any(p.dirty for p in profiles.values()):
+                return
+            self._dirty = False
+        for profile in profiles.values():
+            profile.dirty = False
+        write_json_atomic(self.path, {key: profile.samples() for key, profile in profiles.items()})
+
+    def load(self):
+        if not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, "r") as f:
+                saved = json.load(f)
+        except Exception as e:
+            print(f"Warning: Could not load TV timing profiles: {e}")
+            return
+        with self._lock:
+            for key, samples in saved.items():
+                self._profiles[key] = TimingProfile(samples)